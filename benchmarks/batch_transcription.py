@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Compare serial and batched transcription throughput.
+
+Usage: python -m benchmarks.batch_transcription voice1.ogg voice2.ogg ... [--repeat 2] [--batch-size 8]
+
+Each clip is transcribed once per repeat, first one at a time with
+model.transcribe (the default path), then in batches with transcribe_batch
+(the TRANSCRIPTION_BATCHING path). Use real voice notes: silence is skipped
+by the batched path and would flatter it.
+"""
+import sys
+import time
+import json
+import argparse
+
+from config import WHISPER_MODEL, TRANSCRIPTION_BATCH_SIZE
+from services.whisper_service import get_model, transcribe_batch, decode_audio, SAMPLE_RATE
+
+def run_serial(model_name, clips):
+    """Transcribe clips one at a time, returning the elapsed seconds."""
+    model = get_model(model_name)
+    start = time.perf_counter()
+    for clip in clips:
+        segments, info = model.transcribe(clip)
+        " ".join(segment.text for segment in segments)
+    return time.perf_counter() - start
+
+def run_batched(model_name, clips, batch_size):
+    """Transcribe clips batch_size at a time, returning the elapsed seconds."""
+    start = time.perf_counter()
+    for i in range(0, len(clips), batch_size):
+        transcribe_batch(model_name, clips[i:i + batch_size], batch_size=batch_size)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("clips", nargs="+", help="audio files to transcribe")
+    parser.add_argument("--model", default=WHISPER_MODEL)
+    parser.add_argument("--repeat", type=int, default=1, help="times to include each clip")
+    parser.add_argument("--batch-size", type=int, default=TRANSCRIPTION_BATCH_SIZE)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    clips = args.clips * args.repeat
+    audio_seconds = sum(len(decode_audio(clip, sampling_rate=SAMPLE_RATE)) for clip in clips) / SAMPLE_RATE
+
+    # Load the model and warm it up outside the timed runs
+    run_serial(args.model, clips[:1])
+
+    results = {
+        "model": args.model,
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 1),
+        "batch_size": args.batch_size,
+    }
+    for name, elapsed in (
+        ("serial", run_serial(args.model, clips)),
+        ("batched", run_batched(args.model, clips, args.batch_size)),
+    ):
+        results[name] = {
+            "seconds": round(elapsed, 2),
+            "clips_per_second": round(len(clips) / elapsed, 3),
+            "realtime_factor": round(elapsed / audio_seconds, 3),
+        }
+        print(f"{name:>8}: {elapsed:7.2f}s  {len(clips) / elapsed:6.2f} clips/s  RTF {elapsed / audio_seconds:.3f}")
+
+    results["speedup"] = round(results["serial"]["seconds"] / results["batched"]["seconds"], 2)
+    print(f" speedup: {results['speedup']}x over {len(clips)} clips ({audio_seconds:.0f}s of audio)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
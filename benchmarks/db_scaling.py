@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Time the db/models.py functions at increasing journal sizes and flag super-linear growth.
+
+Grows one synthetic journal (see benchmarks/journal_data.py) through each
+scale and times every function for a heavy user and a typical one. Growth
+between scales is reported as an exponent: 0 means the time doesn't depend on
+the table size, 1 means it grows linearly (a scan, or a result that grows with
+the data, like a week of a heavy user's entries), and above 1 is flagged as
+super-linear.
+
+Usage: python -m benchmarks.db_scaling [--scales 10000 100000 1000000] [--db journal-bench.db] [--output db-results.json]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.journal_data import generate, make_transcription, make_reflection, FEELINGS
+from db import database
+from db import models
+
+# Growth exponents above this are flagged
+SUPER_LINEAR_EXPONENT = 1.1
+
+# /search texts: single words, a phrase-like pair and a prefix, all common in the synthetic journal
+SEARCH_TEXTS = FEELINGS + ["project deadline", "lisb*", "sleep*"]
+
+def time_calls(fn, args_list):
+    """Call fn once per argument tuple and return each call's duration in seconds."""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def summarize(samples):
+    """Get the median and p95 of some durations, in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(ordered[len(ordered) // 2] * 1000, 4),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 4),
+    }
+
+def benchmark_user(user_id, repeats, rng):
+    """Time each models function for one user."""
+    results = {}
+    month_ago = datetime.now() - timedelta(days=30)
+
+    # Stored entries are deleted again at the end, so every scale starts from the same data
+    stored = []
+
+    def store():
+        stored.append(models.store_message(user_id, make_transcription(rng), make_reflection(rng), 60.0, "bench"))
+
+    results["store_message"] = time_calls(store, [()] * repeats)
+    results["get_recent_messages"] = time_calls(models.get_recent_messages, [(user_id,)] * repeats)
+    results["get_weekly_messages"] = time_calls(models.get_weekly_messages, [(user_id,)] * repeats)
+    results["get_random_message"] = time_calls(models.get_random_message, [(user_id,)] * repeats)
+    results["get_random_message (month)"] = time_calls(models.get_random_message, [(user_id, month_ago)] * repeats)
+
+    # Look up a mix of old entries and the ones just stored
+    reference_ids = [row[0] for row in models.get_recent_messages(user_id, limit=repeats)]
+    results["get_message_by_reference"] = time_calls(
+        models.get_message_by_reference, [(user_id, rng.choice(reference_ids)) for _ in range(repeats)]
+    )
+    results["search_messages"] = time_calls(
+        models.search_messages, [(user_id, rng.choice(SEARCH_TEXTS)) for _ in range(repeats)]
+    )
+    results["delete_message"] = time_calls(models.delete_message, [(user_id, ref_id) for ref_id in stored])
+
+    return {name: summarize(samples) for name, samples in results.items()}
+
+def user_sizes(path, user_ids):
+    conn = sqlite3.connect(path)
+    sizes = {
+        user_id: conn.execute("SELECT COUNT(*) FROM messages WHERE user_id = ?", (user_id,)).fetchone()[0]
+        for user_id in user_ids
+    }
+    conn.close()
+    return sizes
+
+def growth_exponent(smaller, larger, size_ratio):
+    """How the time grew relative to the data: log(time ratio) / log(size ratio)."""
+    if smaller <= 0 or larger <= 0:
+        return None
+    return math.log(larger / smaller) / math.log(size_ratio)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000], help="total messages at each step")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=200, help="calls per function per user")
+    parser.add_argument("--db", default="journal-bench.db", help="database to grow (reused between runs)")
+    parser.add_argument("--output", default="db-results.json")
+    args = parser.parse_args()
+
+    # Point the bot's connections at the benchmark database
+    database.DB_PATH = args.db
+
+    # The heaviest journaler and a typical one
+    sample_users = {"heavy": 1, "typical": max(1, args.users // 10)}
+
+    scales = []
+    for scale in sorted(args.scales):
+        conn = sqlite3.connect(args.db)
+        start = time.perf_counter()
+        added = generate(conn, scale, args.users)
+        conn.close()
+        print(f"{scale} messages (added {added} in {time.perf_counter() - start:.0f}s)")
+
+        rng = random.Random(scale)
+        sizes = user_sizes(args.db, sample_users.values())
+        timings = {}
+        for kind, user_id in sample_users.items():
+            timings[kind] = benchmark_user(user_id, args.repeats, rng)
+            for name, summary in timings[kind].items():
+                print(f"  {kind:>7} ({sizes[user_id]:>6} entries) {name:<28} median {summary['median_ms']:.3f}ms  p95 {summary['p95_ms']:.3f}ms")
+        scales.append({"messages": scale, "user_entries": {kind: sizes[user_id] for kind, user_id in sample_users.items()}, "timings": timings})
+
+    # Compare each scale with the one before it
+    flagged = []
+    for smaller, larger in zip(scales, scales[1:]):
+        size_ratio = larger["messages"] / smaller["messages"]
+        growth = {}
+        for kind in sample_users:
+            for name, summary in larger["timings"][kind].items():
+                exponent = growth_exponent(smaller["timings"][kind][name]["median_ms"], summary["median_ms"], size_ratio)
+                growth[f"{kind}: {name}"] = None if exponent is None else round(exponent, 2)
+                if exponent is not None and exponent > SUPER_LINEAR_EXPONENT:
+                    flagged.append(f"{kind}: {name} from {smaller['messages']} to {larger['messages']} (exponent {exponent:.2f})")
+        larger["growth_exponent"] = growth
+
+    if flagged:
+        print("\nSuper-linear growth:")
+        for line in flagged:
+            print(f"  {line}")
+    else:
+        print("\nNo super-linear growth")
+
+    with open(args.output, "w") as f:
+        json.dump({"users": args.users, "repeats": args.repeats, "scales": scales, "super_linear": flagged}, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""A local stand-in for the Anthropic Messages API with configurable latency.
+
+Serves POST /v1/messages (plain and streamed as server-sent events),
+POST /v1/messages/count_tokens and the Message Batches endpoints with canned
+replies, so the bot's Claude calls can be benchmarked without network noise
+or API costs. Point the SDK at it with ANTHROPIC_BASE_URL.
+
+Usage: python -m benchmarks.fake_anthropic [--port 8765] [--first-token 0.5] [--tokens-per-second 80] [--batch-latency 2]
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Canned reply, repeated to reach the requested length
+REPLY_WORDS = (
+    "It sounds like today asked a lot of you, and you still found time to notice how you felt about it. "
+    "One thing worth considering is whether the pressure you describe comes from the situation itself "
+    "or from the expectations you carry into it. What would change if you gave yourself the same "
+    "patience you would offer a friend in your position?"
+).split()
+
+CHARS_PER_TOKEN = 4
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    """Answer Messages API requests with canned text after the server's configured delays."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        input_tokens = count_input_tokens(body)
+        path = self.path.split("?")[0]
+
+        if path == "/v1/messages/batches":
+            self.send_json(self.server.create_batch(body.get("requests", [])))
+            return
+        if path.startswith("/v1/messages/batches/") and path.endswith("/cancel"):
+            self.send_batch(path.split("/")[4], cancel=True)
+            return
+        if self.path.startswith("/v1/messages/count_tokens"):
+            self.send_json({"input_tokens": input_tokens})
+            return
+        if not self.path.startswith("/v1/messages"):
+            self.send_error(404)
+            return
+
+        self.server.record_request()
+        words = reply_words(min(body.get("max_tokens", 100), self.server.reply_tokens))
+        time.sleep(self.server.first_token_latency)
+
+        if body.get("stream"):
+            self.stream_reply(body, words, input_tokens)
+        else:
+            time.sleep(len(words) / self.server.tokens_per_second)
+            self.send_json(make_message(body, " ".join(words), input_tokens, len(words)))
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].split("/")
+        # /v1/messages/batches/<id> and /v1/messages/batches/<id>/results
+        if parts[1:4] != ["v1", "messages", "batches"] or len(parts) not in (5, 6):
+            self.send_error(404)
+        elif len(parts) == 5:
+            self.send_batch(parts[4])
+        elif parts[5] == "results":
+            self.send_batch_results(parts[4])
+        else:
+            self.send_error(404)
+
+    def send_batch(self, batch_id, cancel=False):
+        if batch_id not in self.server.batches:
+            self.send_error(404)
+            return
+        if cancel:
+            self.server.batches[batch_id]["canceled"] = True
+        self.send_json(self.server.batch_status(batch_id))
+
+    def send_batch_results(self, batch_id):
+        lines = self.server.batch_results(batch_id)
+        if lines is None:
+            self.send_error(404)
+            return
+        data = "".join(json.dumps(line) + "\n" for line in lines).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/binary")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_event(self, event, payload):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode())
+        self.wfile.flush()
+
+    def stream_reply(self, body, words, input_tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        message = make_message(body, "", input_tokens, 1)
+        message["content"] = []
+        message["stop_reason"] = None
+        self.send_event("message_start", {"type": "message_start", "message": message})
+        self.send_event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        for i, word in enumerate(words):
+            self.send_event("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": word if i == 0 else " " + word}
+            })
+            time.sleep(1 / self.server.tokens_per_second)
+        self.send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self.send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": len(words)}
+        })
+        self.send_event("message_stop", {"type": "message_stop"})
+
+    def log_message(self, format, *args):
+        pass
+
+def count_input_tokens(body):
+    """Roughly count the input tokens of a Messages API request."""
+    return max(1, len(json.dumps(body.get("messages", []))) // CHARS_PER_TOKEN)
+
+def reply_words(count):
+    """Get count words of canned reply text."""
+    return [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(max(1, count))]
+
+def make_message(body, text, input_tokens, output_tokens):
+    """Build a Messages API response body."""
+    return {
+        "id": f"msg_fake_{time.monotonic_ns()}",
+        "type": "message",
+        "role": "assistant",
+        "model": body.get("model", "fake"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    }
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    """The fake API, served from a background thread.
+
+    first_token_latency is the delay before any output, tokens_per_second
+    paces the words after it, and reply_tokens caps the reply length.
+    Message batches end batch_latency seconds after they are submitted, with
+    each request failing at random with probability batch_error_rate.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, first_token_latency=0.5, tokens_per_second=80, reply_tokens=150,
+                 batch_latency=2.0, batch_error_rate=0.0, handler=FakeAnthropicHandler):
+        super().__init__((host, port), handler)
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.batch_latency = batch_latency
+        self.batch_error_rate = batch_error_rate
+        self.requests = 0
+        self.batch_requests = 0
+        self.batches = {}
+        self._requests_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record_request(self):
+        with self._requests_lock:
+            self.requests += 1
+
+    def create_batch(self, requests):
+        batch_id = f"msgbatch_fake_{uuid.uuid4().hex[:16]}"
+        with self._requests_lock:
+            self.batch_requests += len(requests)
+            self.batches[batch_id] = {
+                "requests": requests,
+                "submitted": time.monotonic(),
+                "created_at": datetime.now(timezone.utc),
+                "canceled": False,
+            }
+        return self.batch_status(batch_id)
+
+    def batch_status(self, batch_id):
+        """Build the Message Batch object for a batch as it stands now."""
+        batch = self.batches[batch_id]
+        count = len(batch["requests"])
+        ended = batch["canceled"] or time.monotonic() - batch["submitted"] >= self.batch_latency
+        created_at = batch["created_at"]
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended and not batch["canceled"] else 0,
+                "errored": 0,
+                "canceled": count if batch["canceled"] else 0,
+                "expired": 0,
+            },
+            "created_at": created_at.isoformat(),
+            "expires_at": (created_at + timedelta(days=1)).isoformat(),
+            "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def batch_results(self, batch_id):
+        """Build the result line of every request in a finished batch, or None if it isn't finished."""
+        if batch_id not in self.batches or self.batch_status(batch_id)["processing_status"] != "ended":
+            return None
+        batch = self.batches[batch_id]
+        lines = []
+        for request in batch["requests"]:
+            params = request["params"]
+            if batch["canceled"]:
+                result = {"type": "canceled"}
+            elif random.random() < self.batch_error_rate:
+                result = {"type": "errored", "error": {
+                    "type": "error", "error": {"type": "api_error", "message": "Fake batch request failure"}
+                }}
+            else:
+                words = reply_words(min(params.get("max_tokens", 100), self.reply_tokens))
+                result = {"type": "succeeded", "message": make_message(
+                    params, " ".join(words), count_input_tokens(params), len(words)
+                )}
+            lines.append({"custom_id": request["custom_id"], "result": result})
+        return lines
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-anthropic", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--reply-tokens", type=int, default=150)
+    parser.add_argument("--batch-latency", type=float, default=2.0, help="seconds before a message batch ends")
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(
+        port=args.port,
+        first_token_latency=args.first_token,
+        tokens_per_second=args.tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        batch_latency=args.batch_latency
+    )
+    print(f"Fake Anthropic API on {server.base_url} (set ANTHROPIC_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
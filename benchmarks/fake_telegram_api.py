@@ -0,0 +1,117 @@
+"""A local stand-in for the Telegram Bot API, enough for the bot to start and reply.
+
+Answers getMe, setWebhook, deleteWebhook, sendMessage, editMessageText,
+answerCallbackQuery and getFile, serves files added with add_file for
+download, and records when each message arrives so benchmarks can tell when
+a handler replied. Point python-telegram-bot at it with
+ApplicationBuilder.base_url(server.base_url).base_file_url(server.base_file_url).
+"""
+import json
+import time
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Journal", "username": "journal_bench_bot"}
+
+class FakeTelegramAPIHandler(BaseHTTPRequestHandler):
+    """Answer Bot API calls with plausible results."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            params = json.loads(body or b"{}")
+        else:
+            params = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+        time.sleep(self.server.latency)
+        method = self.path.rsplit("/", 1)[-1]
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            result = self.server.record_message(method, params)
+        elif method == "getFile":
+            result = self.server.file_info(params["file_id"])
+        else:
+            result = True
+        self.send_json({"ok": True, "result": result})
+
+    def do_GET(self):
+        # File downloads: /file/bot<token>/<file_path>
+        time.sleep(self.server.latency)
+        data = self.server.files.get(self.path.rsplit("/", 1)[-1])
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeTelegramAPIServer(ThreadingHTTPServer):
+    """The fake API, served from a background thread.
+
+    messages lists (arrival time from time.perf_counter(), method, chat_id, text)
+    for every message sent or edited. Every call and download takes latency seconds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, handler=FakeTelegramAPIHandler, latency=0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.messages = []
+        self.files = {}
+        self._lock = threading.Lock()
+        self._message_ids = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    @property
+    def base_file_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/file/bot"
+
+    def add_file(self, file_id, data):
+        """Make data downloadable as file_id."""
+        self.files[file_id] = data
+
+    def file_info(self, file_id):
+        return {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.files[file_id]), "file_path": file_id}
+
+    def record_message(self, method, params):
+        chat_id = int(params.get("chat_id", 0))
+        with self._lock:
+            self._message_ids += 1
+            message_id = int(params.get("message_id", self._message_ids))
+            self.messages.append((time.perf_counter(), method, chat_id, params.get("text", "")))
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="fake-telegram-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
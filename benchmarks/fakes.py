@@ -0,0 +1,38 @@
+"""Synthetic voice notes for the benchmarks."""
+import io
+import math
+import wave
+import array
+import random
+
+SAMPLE_RATE = 16000
+
+def make_clip(seconds, seed=0):
+    """Make a WAV voice note: bursts of voiced noise separated by pauses, like speech."""
+    rng = random.Random(seed)
+    samples = array.array("h")
+    while len(samples) < seconds * SAMPLE_RATE:
+        # A "phrase" of 1-4 seconds of harmonics around a speaking pitch, then a pause
+        pitch = rng.uniform(100, 220)
+        for n in range(int(rng.uniform(1, 4) * SAMPLE_RATE)):
+            t = n / SAMPLE_RATE
+            envelope = 0.5 + 0.5 * math.sin(2 * math.pi * 4 * t)
+            value = sum(math.sin(2 * math.pi * pitch * k * t) / k for k in (1, 2, 3))
+            samples.append(int(6000 * envelope * value + rng.gauss(0, 300)))
+        samples.extend([0] * int(rng.uniform(0.3, 1.2) * SAMPLE_RATE))
+    del samples[seconds * SAMPLE_RATE:]
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+def clip_seconds(audio):
+    """Get the length of a WAV clip from its bytes, path or file object."""
+    if isinstance(audio, bytes):
+        audio = io.BytesIO(audio)
+    with wave.open(audio, "rb") as f:
+        return f.getnframes() / f.getframerate()
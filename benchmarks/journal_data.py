@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Fill a database with a synthetic journal for benchmarking.
+
+Entries are spread over several years across many users, with a few heavy
+journalers and a long tail of occasional ones. Transcriptions and reflections
+are assembled from journal-like phrases, so full-text search and page sizes
+behave like real data.
+
+Usage: python -m benchmarks.journal_data journal.db --messages 1000000 [--users 5000]
+
+Running it again on the same file adds messages until it holds --messages.
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import itertools
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from db.migrations import run_migrations
+
+OPENINGS = [
+    "So today was", "I woke up feeling", "I keep thinking about", "Work has been", "This morning I noticed",
+    "I had a long conversation with", "Honestly I'm not sure why", "Something that surprised me was",
+    "I went for a run and", "Tonight I want to remember",
+]
+SUBJECTS = [
+    "my sister", "the project deadline", "my manager", "the new apartment", "my sleep", "the kids", "my health",
+    "the trip to Lisbon", "money", "my friend Sam", "the garden", "my anxiety", "the team offsite", "my father",
+]
+FEELINGS = [
+    "anxious", "calm", "frustrated", "grateful", "tired", "hopeful", "overwhelmed", "proud", "restless", "content",
+]
+CLAUSES = [
+    "and I don't really know what to do about it", "which made me feel {feeling}", "but I handled it better than last time",
+    "and it reminded me of {subject}", "even though I had planned to rest", "and I think I need to talk to {subject}",
+    "which is something I want to keep doing", "so I made a list of what matters this week",
+]
+REFLECTIONS = [
+    "It sounds like {subject} is taking up a lot of space for you right now, and you're feeling {feeling}.",
+    "One thing you might not have considered is how much of this pressure comes from your own expectations.",
+    "What would it look like to give yourself the same patience you would give a friend?",
+    "You mentioned feeling {feeling}; it could help to notice when that feeling first shows up in your day.",
+    "What is one small step you could take tomorrow that your future self would thank you for?",
+]
+
+BATCH_SIZE = 10000
+
+def make_sentence(rng):
+    clause = rng.choice(CLAUSES).format(feeling=rng.choice(FEELINGS), subject=rng.choice(SUBJECTS))
+    return f"{rng.choice(OPENINGS)} {rng.choice(SUBJECTS)} {clause}."
+
+def make_transcription(rng):
+    """A voice note of roughly 15 seconds to 5 minutes."""
+    return " ".join(make_sentence(rng) for _ in range(int(rng.lognormvariate(2, 0.8)) + 1))
+
+def make_reflection(rng):
+    parts = rng.sample(REFLECTIONS, 3)
+    return " ".join(part.format(feeling=rng.choice(FEELINGS), subject=rng.choice(SUBJECTS)) for part in parts)
+
+def user_weights(users):
+    """Zipf-like activity: a few users write most of the entries."""
+    return [1 / (rank ** 0.8) for rank in range(1, users + 1)]
+
+def generate(conn, messages, users, years=3, seed=0):
+    """Add synthetic messages until the database holds the given number.
+
+    Returns:
+        int: how many messages were added
+    """
+    run_migrations(conn)
+    existing = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    next_number = conn.execute("SELECT value FROM sequences WHERE name = 'reference_id'").fetchone()[0] + 1
+    to_add = max(0, messages - existing)
+
+    rng = random.Random(seed + existing)
+    user_ids = list(range(1, users + 1))
+    cum_weights = list(itertools.accumulate(user_weights(users)))
+    now = datetime.now()
+    span_seconds = int(timedelta(days=365 * years).total_seconds())
+
+    def rows(count, start_number):
+        for i in range(count):
+            created_at = now - timedelta(seconds=rng.randrange(span_seconds))
+            transcription = make_transcription(rng)
+            yield (
+                f"MSG{start_number + i}",
+                rng.choices(user_ids, cum_weights=cum_weights)[0],
+                transcription,
+                make_reflection(rng),
+                created_at.strftime('%Y-%m-%d %H:%M:%S'),
+                round(len(transcription) / 15, 1),
+                f"synthetic_{start_number + i}",
+            )
+
+    added = 0
+    while added < to_add:
+        count = min(BATCH_SIZE, to_add - added)
+        with conn:
+            conn.executemany('''
+            INSERT INTO messages (reference_id, user_id, transcription, claude_response, created_at, audio_length, voice_file_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows(count, next_number + added))
+            conn.execute("UPDATE sequences SET value = ? WHERE name = 'reference_id'", (next_number + added + count - 1,))
+        added += count
+
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="database file to fill (created if missing)")
+    parser.add_argument("--messages", type=int, default=1000000, help="total messages the database should hold")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=3, help="how far back entries go")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    start = time.perf_counter()
+    added = generate(conn, args.messages, args.users, args.years, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Added {added} messages in {elapsed:.1f} seconds ({added / max(elapsed, 1e-9):.0f}/s)")
+    conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""End-to-end benchmark of the voice pipeline and reviews under concurrent users.
+
+Starts the bot's Application with its real handlers against a local fake
+Telegram Bot API (benchmarks/fake_telegram_api.py) and a local fake
+Anthropic API, and feeds it voice notes of several lengths and /review_week
+through its update queue, the way polling does. Updates are dispatched with
+CONCURRENT_UPDATES as in production. Each concurrency level reports
+throughput, p50/p95/p99 latency per note (from the update entering the
+queue until its handler finished), per review and per pipeline stage, and
+peak RSS. Results are saved as JSON; pass --compare with an earlier results
+file to see what changed.
+
+Usage:
+    python -m benchmarks.pipeline [--users 1 10 50] [--notes-per-user 2] [--output results.json]
+    python -m benchmarks.pipeline --whisper-rtf 0.3   # Time everything but Whisper itself
+
+Runs in a scratch directory with its own database. Queue limits, worker
+counts and other settings come from the environment as usual, so set e.g.
+TRANSCRIPTION_WORKERS to compare configurations.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import resource
+import itertools
+import threading
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from telegram import Update
+from telegram.ext import SimpleUpdateProcessor
+
+from benchmarks.fakes import make_clip, clip_seconds, SAMPLE_RATE
+from benchmarks.fake_anthropic import FakeAnthropicServer
+from benchmarks.fake_telegram_api import FakeTelegramAPIServer
+
+# Final status texts that mean a note was not answered
+FAILURE_PREFIXES = ("Sorry, an error occurred", "I'm busy")
+
+class PeakRSS:
+    """Track the process's peak resident set size while the block runs."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def current_kb(self):
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        # Not Linux: fall back to the lifetime peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+def percentiles(values):
+    """Get p50/p95/p99 of a list of seconds, or Nones if it is empty."""
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3) if ordered else None
+
+    return {"count": len(ordered), "p50": percentile(0.5), "p95": percentile(0.95), "p99": percentile(0.99)}
+
+class FakeWhisperModel:
+    """Takes rtf seconds per second of audio and returns placeholder text."""
+
+    def __init__(self, rtf):
+        self.rtf = rtf
+
+    def transcribe(self, audio, **kwargs):
+        if hasattr(audio, "__len__") and not isinstance(audio, (str, bytes)):
+            seconds = len(audio) / SAMPLE_RATE
+        else:
+            seconds = clip_seconds(audio)
+        time.sleep(seconds * self.rtf)
+        segment = SimpleNamespace(text=f"Placeholder transcription of {seconds:.0f} seconds of audio.", start=0.0, end=seconds)
+        return iter([segment]), SimpleNamespace(duration=seconds)
+
+class TrackedUpdateProcessor(SimpleUpdateProcessor):
+    """Dispatch updates like SimpleUpdateProcessor, resolving a future when each one's handlers finish."""
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self.finished = {}
+
+    async def do_process_update(self, update, coroutine):
+        try:
+            await coroutine
+        finally:
+            future = self.finished.pop(update.update_id, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+
+# Unique IDs for updates, messages and files across all simulated chats
+update_ids = itertools.count(1)
+
+def make_update_data(user_id, text=None, voice_file_id=None, duration=0):
+    """Build the JSON of an update carrying a command or a voice note from user_id, as Telegram sends it."""
+    number = next(update_ids)
+    message = {
+        "message_id": number,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+    }
+    if voice_file_id is not None:
+        message["voice"] = {"file_id": voice_file_id, "file_unique_id": voice_file_id, "duration": duration}
+    else:
+        message["text"] = text
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": number, "message": message}
+
+async def send_update(application, data):
+    """Put an update on the application's queue and wait until its handlers have finished."""
+    future = asyncio.get_running_loop().create_future()
+    application.update_processor.finished[data["update_id"]] = future
+    start = time.perf_counter()
+    await application.update_queue.put(Update.de_json(data, application.bot))
+    await future
+    return time.perf_counter() - start
+
+async def simulate_user(application, api, user_id, clips, notes, timings, rng):
+    """Send notes one after another like a single user, then ask for a weekly review."""
+    for _ in range(notes):
+        seconds, clip = rng.choice(clips)
+        file_id = f"voice_{next(update_ids)}"
+        api.add_file(file_id, clip)
+        data = make_update_data(user_id, voice_file_id=file_id, duration=seconds)
+        timings["voice_note"].append(await send_update(application, data))
+
+    timings["review"].append(await send_update(application, make_update_data(user_id, text="/review_week")))
+
+async def run_level(application, api, users, args, clips, server):
+    """Run one concurrency level and summarize it."""
+    from utils.metrics import metrics, get_stage_summary
+
+    metrics.reset()
+    requests_before = server.requests
+    messages_before = len(api.messages)
+    timings = {"voice_note": [], "review": []}
+    rng = random.Random(users)
+
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(application, api, users * 1000 + i, clips, args.notes_per_user, timings, rng)
+            for i in range(users)
+        ))
+        elapsed = time.perf_counter() - start
+
+    notes = users * args.notes_per_user
+    failures = sum(1 for _, _, _, text in api.messages[messages_before:] if text.startswith(FAILURE_PREFIXES))
+    real_time_factor = metrics.summary("transcription_real_time_factor")
+    return {
+        "users": users,
+        "notes": notes,
+        "seconds": round(elapsed, 2),
+        "notes_per_second": round(notes / elapsed, 3),
+        "failures": failures,
+        "claude_requests": server.requests - requests_before,
+        "voice_note": percentiles(timings["voice_note"]),
+        "review": percentiles(timings["review"]),
+        "stages": get_stage_summary(),
+        "real_time_factor": real_time_factor,
+        "peak_rss_mb": round(rss.peak_kb / 1024, 1),
+    }
+
+def print_level(level, previous=None):
+    """Print one level's headline numbers, with the change from an earlier run if given."""
+    def delta(key, field):
+        if not previous or previous[key].get(field) is None or level[key].get(field) is None:
+            return ""
+        change = level[key][field] - previous[key][field]
+        return f" ({change:+.2f})"
+
+    note, review = level["voice_note"], level["review"]
+    print(
+        f"{level['users']:>3} users: {level['notes_per_second']:.2f} notes/s, "
+        f"note p50 {note['p50']}s{delta('voice_note', 'p50')} p95 {note['p95']}s{delta('voice_note', 'p95')} "
+        f"p99 {note['p99']}s, review p50 {review['p50']}s{delta('review', 'p50')}, "
+        f"{level['failures']} failed, peak RSS {level['peak_rss_mb']} MB"
+    )
+    for stage, summary in level["stages"].items():
+        p50, p95, p99 = (summary[key] for key in ("p50", "p95", "p99"))
+        print(f"       {stage:>14}: p50 {p50 or 0:.3f}s p95 {p95 or 0:.3f}s p99 {p99 or 0:.3f}s ({summary['errors']} errors)")
+
+async def run(args, clips, server, api):
+    # Imported late: config is read at import time, after main() has set up the environment
+    from telegram.ext import Application
+    from config import CONCURRENT_UPDATES, TELEGRAM_RATE_LIMIT
+    from db.database import init_db
+    from bot.handlers import setup_handlers
+    from utils.send_scheduler import SendScheduler
+
+    init_db()
+
+    # Built like main() builds it, against the fake API
+    builder = (
+        Application.builder().token("123456:bench").base_url(api.base_url).base_file_url(api.base_file_url)
+        .concurrent_updates(TrackedUpdateProcessor(CONCURRENT_UPDATES))
+    )
+    if TELEGRAM_RATE_LIMIT:
+        builder = builder.rate_limiter(SendScheduler())
+    application = builder.build()
+    setup_handlers(application)
+
+    levels = []
+    async with application:
+        await application.start()
+        for users in args.users:
+            levels.append(await run_level(application, api, users, args, clips, server))
+        await application.stop()
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50], help="concurrency levels to run")
+    parser.add_argument("--notes-per-user", type=int, default=2)
+    parser.add_argument("--clip-seconds", type=int, nargs="+", default=[5, 15, 45, 120], help="synthetic clip lengths")
+    parser.add_argument("--whisper-rtf", type=float, help="replace Whisper with a sleep of this many seconds per audio second")
+    parser.add_argument("--claude-first-token", type=float, default=0.5, help="fake Anthropic seconds before the first token")
+    parser.add_argument("--claude-tokens-per-second", type=float, default=80)
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per fake Telegram API call")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {level["users"]: level for level in json.load(f)["levels"]}
+
+    server = FakeAnthropicServer(
+        first_token_latency=args.claude_first_token,
+        tokens_per_second=args.claude_tokens_per_second
+    ).start()
+    api = FakeTelegramAPIServer(latency=args.telegram_latency).start()
+
+    # Everything the bot writes goes to a scratch directory, and config must see these before it is imported
+    os.chdir(tempfile.mkdtemp(prefix="journal-bench-"))
+    os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+    os.environ["ANTHROPIC_API_KEY"] = "fake"
+    os.environ["AUTHORIZED_USER_IDS"] = ""
+    # Synthetic clips repeat, so matching on audio would skip Whisper
+    os.environ["TRANSCRIPTION_CACHE_HASH_AUDIO"] = "false"
+
+    if args.whisper_rtf is not None:
+        from services import whisper_service
+        fake_model = FakeWhisperModel(args.whisper_rtf)
+        whisper_service.get_model = lambda model_name=None: fake_model
+
+    clips = [(seconds, make_clip(seconds, seed=seconds)) for seconds in args.clip_seconds]
+    print(f"Running in {os.getcwd()} with clips of {args.clip_seconds} seconds")
+
+    levels = asyncio.run(run(args, clips, server, api))
+    server.stop()
+    api.stop()
+
+    for level in levels:
+        print_level(level, previous.get(level["users"]))
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "levels": levels,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
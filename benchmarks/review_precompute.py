@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Compare /review_week and /review_today answered live with answered from precomputed reviews.
+
+Fills a scratch database with a week of synthetic entries for many users,
+some of them from today, and runs against the local fake Anthropic API
+(benchmarks/fake_anthropic.py), including its Message Batches endpoints.
+It times reviews generated live for a sample of users, precomputes the rest
+through batches, then times every user's reviews again and counts how many
+live Claude requests they needed (none, when nothing changed). Finally some
+users get a new entry, to check that only their reviews go live again.
+
+Usage: python -m benchmarks.review_precompute [--users 200] [--entries 6] [--output review-results.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+from benchmarks.journal_data import make_transcription, make_reflection
+from benchmarks.pipeline import percentiles
+
+# Users whose reviews are generated live before precomputing, for comparison
+LIVE_SAMPLE = 5
+
+# Users who get a new entry after precomputing
+CHANGED_USERS = 5
+
+def seed_entries(conn, users, entries, rng):
+    """Give every user entries spread over the past six days, and half of them one from today."""
+    now = datetime.now()
+    start_of_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    rows = []
+    for user_id in range(1, users + 1):
+        times = [now - timedelta(days=rng.uniform(1, 6)) for _ in range(entries)]
+        if user_id % 2:
+            times.append(start_of_today + (now - start_of_today) * rng.random())
+        for created_at in times:
+            rows.append((user_id, make_transcription(rng), make_reflection(rng), created_at.strftime('%Y-%m-%d %H:%M:%S')))
+
+    with conn:
+        start = conn.execute("SELECT value FROM sequences WHERE name = 'reference_id'").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO messages (reference_id, user_id, transcription, claude_response, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(f"MSG{start + i + 1}", *row) for i, row in enumerate(rows)]
+        )
+        conn.execute("UPDATE sequences SET value = ? WHERE name = 'reference_id'", (start + len(rows),))
+    return len(rows)
+
+async def time_reviews(user_ids, server):
+    """Time get_review for each user's week and, if they have entries from today, their day.
+
+    Returns:
+        tuple: (seconds per review, live Claude requests made)
+    """
+    from db.repository import get_today_messages, get_weekly_messages
+    from services.review_service import get_review, TODAY, PAST_WEEK
+
+    requests_before = server.requests
+    samples = []
+    for user_id in user_ids:
+        for time_period, get_messages in ((PAST_WEEK, get_weekly_messages), (TODAY, get_today_messages)):
+            messages = await get_messages(user_id)
+            if not messages:
+                continue
+            start = time.perf_counter()
+            await get_review(user_id, messages, time_period)
+            samples.append(time.perf_counter() - start)
+    return samples, server.requests - requests_before
+
+async def run(args, server):
+    from db.database import init_db, get_connection
+    from db.repository import store_message
+    from services import claude_service
+    from services.review_service import precompute_reviews
+
+    # Don't wait the production 30 seconds between batch status checks
+    claude_service.REVIEW_BATCH_POLL_INTERVAL = 0.2
+
+    init_db()
+    rng = random.Random(args.seed)
+    entries = seed_entries(get_connection(), args.users, args.entries, rng)
+    print(f"Seeded {entries} entries for {args.users} users")
+
+    user_ids = list(range(1, args.users + 1))
+    live_users = user_ids[:LIVE_SAMPLE]
+    live, live_requests = await time_reviews(live_users, server)
+    print(f"Live: {len(live)} reviews, {live_requests} Claude requests")
+
+    start = time.perf_counter()
+    batch_requests_before = server.batch_requests
+    precomputed_count = await precompute_reviews()
+    precompute_seconds = time.perf_counter() - start
+    batch_requests = server.batch_requests - batch_requests_before
+    print(f"Precomputed {precomputed_count} reviews in {precompute_seconds:.1f}s ({batch_requests} batch requests)")
+
+    precomputed, precomputed_requests = await time_reviews(user_ids, server)
+    print(f"After precomputing: {len(precomputed)} reviews, {precomputed_requests} live Claude requests")
+
+    # A new entry makes just that user's reviews go live again
+    changed_users = user_ids[::max(1, len(user_ids) // CHANGED_USERS)][:CHANGED_USERS]
+    for user_id in changed_users:
+        await store_message(user_id, make_transcription(rng), make_reflection(rng))
+    changed, changed_requests = await time_reviews(changed_users, server)
+    unchanged, unchanged_requests = await time_reviews([u for u in user_ids if u not in changed_users], server)
+
+    return {
+        "users": args.users,
+        "entries": entries,
+        "batch_latency_seconds": args.batch_latency,
+        "live": {**percentiles(live), "claude_requests": live_requests},
+        "precompute": {
+            "seconds": round(precompute_seconds, 2),
+            "reviews_stored": precomputed_count,
+            "batch_requests": batch_requests,
+        },
+        "precomputed": {**percentiles(precomputed), "claude_requests": precomputed_requests},
+        "after_new_entry": {
+            "changed_users": len(changed_users),
+            "changed": {**percentiles(changed), "claude_requests": changed_requests},
+            "unchanged": {**percentiles(unchanged), "claude_requests": unchanged_requests},
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--entries", type=int, default=6, help="entries per user over the past week")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="seconds the fake API takes per batch")
+    parser.add_argument("--first-token", type=float, default=0.5, help="seconds before the fake API's first token")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="review-results.json")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    server = FakeAnthropicServer(first_token_latency=args.first_token, batch_latency=args.batch_latency).start()
+
+    # Everything the bot writes goes to a scratch directory, and config must see these before it is imported
+    os.chdir(tempfile.mkdtemp(prefix="journal-reviews-"))
+    os.environ["ANTHROPIC_API_KEY"] = "fake"
+    os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+
+    results = asyncio.run(run(args, server))
+    server.stop()
+
+    for name in ("live", "precomputed"):
+        summary = results[name]
+        print(
+            f"  {name:>11}: p50 {summary['p50']}s p95 {summary['p95']}s "
+            f"({summary['count']} reviews, {summary['claude_requests']} live Claude requests)"
+        )
+    after = results["after_new_entry"]
+    print(
+        f"After a new entry for {after['changed_users']} users: {after['changed']['claude_requests']} live requests "
+        f"for them, {after['unchanged']['claude_requests']} for everyone else"
+    )
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+    return 0 if results["precomputed"]["claude_requests"] == 0 and after["unchanged"]["claude_requests"] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Compare awaiting every status edit with showing statuses through StatusEditor.
+
+Several chats each get a quick run of progress statuses, like a streamed
+reflection or a transcription's progress, followed by a final result. The
+edits go through the bot's SendScheduler to a local fake Telegram Bot API
+(benchmarks/fake_telegram_api.py), so they are paced like real ones. For
+each way of editing it reports how long the statuses held up the code
+showing them, how long until every result arrived, how many edits reached
+Telegram and whether each chat ended on its result.
+
+Usage: python -m benchmarks.status_edits [--chats 10] [--statuses 20] [--output status-edits-results.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.fake_telegram_api import FakeTelegramAPIServer
+from benchmarks.pipeline import percentiles
+
+FIRST_CHAT_ID = 20000
+RESULT = "Here is your reflection."
+
+async def awaited(message, texts, interval):
+    """Edit the message with each status in turn, waiting for every edit like the bot used to."""
+    from telegram.error import BadRequest
+
+    for text in texts:
+        try:
+            await message.edit_text(text)
+        except BadRequest:
+            pass
+        await asyncio.sleep(interval)
+    return message
+
+async def background(message, texts, interval):
+    """Show each status through a StatusEditor without waiting for Telegram."""
+    from utils.telegram import StatusEditor
+
+    status = StatusEditor(message)
+    for text in texts:
+        status.show(text)
+        await asyncio.sleep(interval)
+    return status
+
+async def run_chat(edit, bot, chat_id, args, timings):
+    from utils.telegram import StatusMessage
+
+    texts = [f"Working... {number} of {args.statuses}" for number in range(1, args.statuses + 1)]
+    start = time.perf_counter()
+    message = await edit(StatusMessage(bot, chat_id, 1), texts, args.interval)
+    timings["statuses"].append(time.perf_counter() - start)
+    await message.edit_text(RESULT)
+    timings["result"].append(time.perf_counter() - start)
+
+async def run_mode(name, edit, args, api):
+    from telegram.ext import Application
+    from utils.metrics import metrics
+    from utils.send_scheduler import SendScheduler
+
+    metrics.reset()
+    messages_before = len(api.messages)
+    application = Application.builder().token("123456:bench").base_url(api.base_url).rate_limiter(SendScheduler()).build()
+    timings = {"statuses": [], "result": []}
+    chat_ids = [FIRST_CHAT_ID + number for number in range(args.chats)]
+
+    async with application:
+        start = time.perf_counter()
+        await asyncio.gather(*(run_chat(edit, application.bot, chat_id, args, timings) for chat_id in chat_ids))
+        elapsed = time.perf_counter() - start
+
+    edits = [message for message in api.messages[messages_before:] if message[1] == "editMessageText"]
+    last_text = {}
+    for _, _, chat_id, text in edits:
+        last_text[chat_id] = text
+    requested = args.chats * (args.statuses + 1)
+    return {
+        "mode": name,
+        "seconds": round(elapsed, 2),
+        "edits_requested": requested,
+        "edits_sent": len(edits),
+        "edits_collapsed": requested - len(edits),
+        "collapsed_by_status_editor": sum(metrics.counters("telegram_edits_coalesced_total", None).values()),
+        "ended_on_result": sum(1 for chat_id in chat_ids if last_text.get(chat_id) == RESULT),
+        "statuses": percentiles(timings["statuses"]),
+        "result": percentiles(timings["result"]),
+    }
+
+async def run(args, api):
+    return [
+        await run_mode("awaited", awaited, args, api),
+        await run_mode("background", background, args, api),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--statuses", type=int, default=20, help="progress statuses shown in each chat")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between statuses")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="seconds per fake Telegram API call")
+    parser.add_argument("--output", default="status-edits-results.json")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    api = FakeTelegramAPIServer(latency=args.telegram_latency).start()
+
+    # Everything the bot writes goes to a scratch directory, and config must see it before it is imported
+    os.chdir(tempfile.mkdtemp(prefix="journal-status-edits-"))
+
+    modes = asyncio.run(run(args, api))
+    api.stop()
+
+    for mode in modes:
+        print(
+            f"{mode['mode']:>10}: statuses held up the caller p50 {mode['statuses']['p50']}s, "
+            f"result after p50 {mode['result']['p50']}s p95 {mode['result']['p95']}s; "
+            f"{mode['edits_sent']} of {mode['edits_requested']} edits sent, "
+            f"{mode['ended_on_result']} of {args.chats} chats ended on the result"
+        )
+
+    with open(output, "w") as f:
+        json.dump({"settings": {key: value for key, value in vars(args).items() if key != "output"}, "modes": modes}, f, indent=2)
+    print(f"Saved results to {output}")
+
+    background_mode = modes[-1]
+    return 0 if background_mode["edits_collapsed"] and background_mode["ended_on_result"] == args.chats else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Microbenchmark of utils/text.iter_chunks against the list-building splitter it replaced.
+
+Splits multi-megabyte texts of a few shapes (one long run of sentences, many
+paragraphs, and text with no spaces at all) and reports the total time, the
+time until the first chunk is ready to send, and whether any chunk came out
+empty or over the limit.
+
+Usage: python -m benchmarks.text_chunking [--sizes 1 4 16] [--max-length 4096]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from utils.text import iter_chunks, TELEGRAM_MAX_MESSAGE_LENGTH
+from benchmarks.journal_data import make_sentence
+
+def legacy_split_text(text, max_length=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """The splitter utils/text.py used before iter_chunks, kept here for comparison."""
+    if len(text) <= max_length:
+        return [text]
+    
+    chunks = []
+    current_chunk = ""
+    
+    # Split by paragraphs first
+    paragraphs = text.split("\n\n")
+    
+    for paragraph in paragraphs:
+        # If adding this paragraph would exceed the limit
+        if len(current_chunk) + len(paragraph) + 2 > max_length:
+            # If the current chunk is not empty, add it to chunks
+            if current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = ""
+            
+            # If the paragraph itself is too long, split it further
+            if len(paragraph) > max_length:
+                # Split by sentences
+                sentences = paragraph.replace(". ", ".\n").split("\n")
+                
+                for sentence in sentences:
+                    if len(current_chunk) + len(sentence) + 2 > max_length:
+                        if current_chunk:
+                            chunks.append(current_chunk)
+                            current_chunk = ""
+                        
+                        # If the sentence is still too long, split it by words
+                        if len(sentence) > max_length:
+                            words = sentence.split(" ")
+                            for word in words:
+                                if len(current_chunk) + len(word) + 1 > max_length:
+                                    chunks.append(current_chunk)
+                                    current_chunk = word + " "
+                                else:
+                                    current_chunk += word + " "
+                        else:
+                            current_chunk = sentence + " "
+                    else:
+                        if current_chunk and not current_chunk.endswith(" "):
+                            current_chunk += " "
+                        current_chunk += sentence + " "
+            else:
+                current_chunk = paragraph
+        else:
+            # Add paragraph separator if needed
+            if current_chunk and not current_chunk.endswith("\n\n"):
+                current_chunk += "\n\n"
+            current_chunk += paragraph
+    
+    # Add the last chunk if not empty
+    if current_chunk:
+        chunks.append(current_chunk)
+    
+    return chunks 
+
+def make_text(shape, size, rng):
+    """Build about size characters of text of the given shape."""
+    if shape == "no spaces":
+        return "".join(rng.choice("abcdefghij") for _ in range(size))
+
+    parts = []
+    length = 0
+    while length < size:
+        if shape == "paragraphs":
+            part = " ".join(make_sentence(rng) for _ in range(rng.randint(1, 8))) + "\n\n"
+        else:
+            part = make_sentence(rng) + " "
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+def run(split, text, max_length):
+    """Split text, timing the first chunk and the whole run."""
+    start = time.perf_counter()
+    first = None
+    chunks = []
+    for chunk in split(text, max_length):
+        if first is None:
+            first = time.perf_counter() - start
+        chunks.append(chunk)
+    total = time.perf_counter() - start
+
+    return {
+        "seconds": total,
+        "first_chunk_seconds": first or total,
+        "chunks": len(chunks),
+        "empty": sum(1 for chunk in chunks if not chunk.strip()),
+        "over_limit": sum(1 for chunk in chunks if len(chunk) > max_length),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="text sizes in MB")
+    parser.add_argument("--max-length", type=int, default=TELEGRAM_MAX_MESSAGE_LENGTH)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for shape in ("sentences", "paragraphs", "no spaces"):
+        for size_mb in args.sizes:
+            text = make_text(shape, int(size_mb * 1024 * 1024), rng)
+            for name, split in (("legacy", legacy_split_text), ("iter_chunks", iter_chunks)):
+                result = run(split, text, args.max_length)
+                print(
+                    f"{shape:>10} {size_mb:>5g} MB {name:>11}: {result['seconds'] * 1000:8.1f} ms total, "
+                    f"first chunk after {result['first_chunk_seconds'] * 1000:8.3f} ms, {result['chunks']} chunks, "
+                    f"{result['empty']} empty, {result['over_limit']} over the limit"
+                )
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Measure per-update dispatch latency of webhook mode on a local server.
+
+Starts the bot in webhook mode against a fake Telegram Bot API and POSTs
+recorded updates (benchmarks/fixtures/webhook_updates.json) to it, each from
+a different chat. For every update it reports how long the webhook took to
+acknowledge the POST and how long until the handler's reply reached the
+fake API. It also checks that a request with the wrong secret token is
+rejected, and times the graceful shutdown.
+
+Usage: python -m benchmarks.webhook_latency [--updates 500] [--concurrency 20] [--output webhook-results.json]
+"""
+import os
+import sys
+import copy
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import httpx
+
+from benchmarks.fake_telegram_api import FakeTelegramAPIServer
+from benchmarks.pipeline import percentiles
+
+FIXTURES = os.path.join(REPO_ROOT, "benchmarks", "fixtures", "webhook_updates.json")
+SECRET_TOKEN = "bench-secret"
+URL_PATH = "telegram"
+
+# Chat IDs of the posted updates start here, one per update
+FIRST_CHAT_ID = 10000
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def make_update(fixture, number):
+    """Copy a recorded update as if it came from its own chat."""
+    update = copy.deepcopy(fixture)
+    update["update_id"] = number + 1
+    message = update["message"]
+    message["message_id"] = number + 1
+    message["from"]["id"] = message["chat"]["id"] = FIRST_CHAT_ID + number
+    return update
+
+async def wait_for_server(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"Webhook server didn't start on port {port}")
+
+async def wait_for_replies(api, chat_ids, timeout):
+    """Wait until every chat has had a reply, returning each chat's first reply time."""
+    deadline = time.monotonic() + timeout
+    while True:
+        first_reply = {}
+        for arrived_at, _, chat_id, _ in list(api.messages):
+            first_reply.setdefault(chat_id, arrived_at)
+        if chat_ids <= first_reply.keys() or time.monotonic() > deadline:
+            return first_reply
+        await asyncio.sleep(0.05)
+
+async def run(args, api):
+    # Imported late: config is read at import time, after main() has set up the environment
+    from telegram.ext import Application
+    from config import CONCURRENT_UPDATES
+    from db.database import init_db
+    from bot.handlers import setup_handlers
+    from bot.webhook import serve_webhook
+
+    init_db()
+    application = (
+        Application.builder().token("123456:bench").base_url(api.base_url)
+        .concurrent_updates(CONCURRENT_UPDATES).build()
+    )
+    setup_handlers(application)
+
+    port = free_port()
+    stop = asyncio.Event()
+    server = asyncio.create_task(serve_webhook(
+        application, webhook_url="https://bot.example.com", listen="127.0.0.1", port=port,
+        url_path=URL_PATH, secret_token=SECRET_TOKEN, stop=stop
+    ))
+    await wait_for_server(port)
+    url = f"http://127.0.0.1:{port}/{URL_PATH}"
+
+    with open(args.fixtures) as f:
+        fixtures = json.load(f)
+
+    posted_at = {}
+    acked = []
+    commands = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(timeout=30) as client:
+        async def post(number):
+            update = make_update(fixtures[number % len(fixtures)], number)
+            chat_id = update["message"]["chat"]["id"]
+            commands[chat_id] = update["message"]["text"].split()[0]
+            async with semaphore:
+                start = time.perf_counter()
+                posted_at[chat_id] = start
+                response = await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET_TOKEN})
+                acked.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post(number) for number in range(args.updates)))
+        first_reply = await wait_for_replies(api, set(posted_at), timeout=60)
+        elapsed = time.perf_counter() - start
+
+        # A request without the right secret must be turned away and never handled
+        forged = make_update(fixtures[0], args.updates)
+        response = await client.post(url, json=forged, headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        await asyncio.sleep(0.5)
+        forged_chat = forged["message"]["chat"]["id"]
+        forged_rejected = response.status_code == 403 and not any(m[2] == forged_chat for m in api.messages)
+
+    shutdown_start = time.perf_counter()
+    stop.set()
+    await server
+    shutdown_seconds = time.perf_counter() - shutdown_start
+
+    dispatch = {chat_id: first_reply[chat_id] - posted_at[chat_id] for chat_id in posted_at if chat_id in first_reply}
+    by_command = defaultdict(list)
+    for chat_id, seconds in dispatch.items():
+        by_command[commands[chat_id]].append(seconds)
+
+    return {
+        "updates": args.updates,
+        "concurrency": args.concurrency,
+        "concurrent_updates": CONCURRENT_UPDATES,
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(args.updates / elapsed, 1),
+        "unanswered": args.updates - len(dispatch),
+        "ack": percentiles(acked),
+        "dispatch": percentiles(list(dispatch.values())),
+        "dispatch_by_command": {command: percentiles(values) for command, values in sorted(by_command.items())},
+        "forged_secret_rejected": forged_rejected,
+        "shutdown_seconds": round(shutdown_seconds, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20, help="POSTs in flight at once")
+    parser.add_argument("--fixtures", default=FIXTURES, help="JSON list of recorded updates")
+    parser.add_argument("--output", default="webhook-results.json")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    args.fixtures = os.path.abspath(args.fixtures)
+    api = FakeTelegramAPIServer().start()
+
+    # Everything the bot writes goes to a scratch directory, and config must see these before it is imported
+    os.chdir(tempfile.mkdtemp(prefix="journal-webhook-"))
+    os.environ["AUTHORIZED_USER_IDS"] = ""
+    os.environ["WHISPER_WARMUP"] = "false"
+
+    results = asyncio.run(run(args, api))
+    api.stop()
+
+    print(
+        f"{results['updates']} updates in {results['seconds']}s ({results['updates_per_second']}/s), "
+        f"{results['unanswered']} unanswered"
+    )
+    for name in ("ack", "dispatch"):
+        summary = results[name]
+        print(f"  {name:>8}: p50 {summary['p50']}s p95 {summary['p95']}s p99 {summary['p99']}s")
+    for command, summary in results["dispatch_by_command"].items():
+        print(f"  {command:>14}: p50 {summary['p50']}s p95 {summary['p95']}s ({summary['count']} updates)")
+    print(f"Wrong secret token rejected: {results['forged_secret_rejected']}")
+    print(f"Graceful shutdown took {results['shutdown_seconds']}s")
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+    return 0 if results["forged_secret_rejected"] and not results["unanswered"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
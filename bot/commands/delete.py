@@ -3,7 +3,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.auth import check_authorization
-from db.models import get_message_by_reference, delete_message
+from db.repository import get_message_by_reference, delete_message
 
 logger = logging.getLogger(__name__)
 
@@ -23,13 +23,13 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reference_id = context.args[0].upper()
     
     # First check if the entry exists
-    message = get_message_by_reference(user_id, reference_id)
+    message = await get_message_by_reference(user_id, reference_id)
     if not message:
         await update.message.reply_text(f"Entry {reference_id} not found.")
         return
     
     # Delete the entry
-    deleted = delete_message(user_id, reference_id)
+    deleted = await delete_message(user_id, reference_id)
     
     if deleted:
         await update.message.reply_text(f"Entry {reference_id} has been deleted.")
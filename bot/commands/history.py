@@ -2,41 +2,21 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
+from config import HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
 from utils.auth import check_authorization
-from db.models import get_recent_messages
+from bot.pagination import send_first_page
 
 logger = logging.getLogger(__name__)
 
 async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show recent message history."""
-    user_id = update.effective_user.id
-    
+    """Show message history, a page at a time."""
     # Check if user is authorized
     if not await check_authorization(update, context):
         return
     
-    # Get limit parameter if provided
-    limit = 5
+    # Get page size parameter if provided
+    page_size = HISTORY_PAGE_SIZE
     if context.args and context.args[0].isdigit():
-        limit = min(int(context.args[0]), 20)  # Cap at 20 to avoid huge messages
-    
-    messages = get_recent_messages(user_id, limit)
-    
-    if not messages:
-        await update.message.reply_text("You don't have any message history yet.")
-        return
-    
-    response = f"Your {len(messages)} most recent entries:\n\n"
-    
-    for ref_id, transcription, claude_response, created_at in messages:
-        # Format the date
-        date_str = created_at.split('.')[0] if '.' in created_at else created_at
-        
-        # Truncate transcription if too long
-        short_transcription = transcription[:50] + "..." if len(transcription) > 50 else transcription
-        
-        response += f"📝 {ref_id} ({date_str}): \"{short_transcription}\"\n\n"
-    
-    response += "Use /entry MSG123 to view a specific entry."
+        page_size = max(1, min(int(context.args[0]), HISTORY_MAX_PAGE_SIZE))  # Cap to avoid huge messages
     
-    await update.message.reply_text(response) 
\ No newline at end of file
+    await send_first_page(update, "history", page_size)
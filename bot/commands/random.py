@@ -1,13 +1,21 @@
 import logging
+from datetime import datetime, timedelta
 from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.auth import check_authorization
-from utils.text import split_text, TELEGRAM_MAX_MESSAGE_LENGTH
-from db.models import get_random_message
+from utils.telegram import send_long_message
+from db.repository import get_random_message
 
 logger = logging.getLogger(__name__)
 
+# Optional /random argument -> (days to look back, description)
+PERIODS = {
+    "week": (7, "the past week"),
+    "month": (30, "the past month"),
+    "year": (365, "the past year"),
+}
+
 async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show a random entry from the user's history."""
     user_id = update.effective_user.id
@@ -16,38 +24,40 @@ async def random_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await check_authorization(update, context):
         return
     
-    message = get_random_message(user_id)
+    # Optionally limit the pick to a recent period, e.g. /random month
+    since = None
+    period = None
+    if context.args:
+        period = context.args[0].lower()
+        if period not in PERIODS:
+            await update.message.reply_text("Usage: /random [week|month|year]")
+            return
+        since = datetime.now() - timedelta(days=PERIODS[period][0])
+    
+    message = await get_random_message(user_id, since=since)
     
     if not message:
-        await update.message.reply_text("You don't have any entries yet.")
+        if period:
+            await update.message.reply_text(f"You don't have any entries from {PERIODS[period][1]}.")
+        else:
+            await update.message.reply_text("You don't have any entries yet.")
         return
     
-    ref_id, transcription, claude_response, created_at = message
-    
-    # Format the date
-    date_str = created_at.split('.')[0] if '.' in created_at else created_at
-    
     # Send Claude's response first
-    header = f"📝 Random Entry {ref_id} ({date_str}):\n\n"
-    claude_message = f"{header}Claude's reflection:\n{claude_response}"
-    
-    if len(claude_message) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-        await update.message.reply_text(claude_message)
-    else:
-        # Split Claude's response if it's too long
-        await update.message.reply_text(f"{header}Claude's reflection (part 1):")
-        chunks = split_text(claude_response)
-        for i, chunk in enumerate(chunks):
-            await update.message.reply_text(f"Part {i+1}:\n{chunk}")
-    
-    # Send transcription as a separate message
-    transcription_message = f"Original transcription:\n\"{transcription}\""
-    
-    if len(transcription_message) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-        await update.message.reply_text(transcription_message)
-    else:
-        # Split transcription if it's too long
-        await update.message.reply_text("Original transcription (split due to length):")
-        chunks = split_text(transcription)
-        for i, chunk in enumerate(chunks):
-            await update.message.reply_text(f"Part {i+1}:\n\"{chunk}\"")
\ No newline at end of file
+    header = f"📝 Random Entry {message.reference_id} ({message.date_str}):\n\n"
+    await send_long_message(
+        update.message.reply_text,
+        message.claude_response,
+        single_format=header + "Claude's reflection:\n{text}",
+        split_header=f"{header}Claude's reflection (part 1):",
+        part_format="Part {number}:\n{chunk}"
+    )
+    
+    # Send transcription as a separate message, split if it's too long
+    await send_long_message(
+        update.message.reply_text,
+        message.transcription,
+        single_format="Original transcription:\n\"{text}\"",
+        split_header="Original transcription (split due to length):",
+        part_format="Part {number}:\n\"{chunk}\""
+    )
\ No newline at end of file
@@ -3,8 +3,9 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.auth import check_authorization
-from db.models import get_today_messages
-from services.claude_service import get_review_summary
+from db.repository import get_today_messages
+from services.review_service import get_review, TODAY
+from utils.telegram import ThrottledEditor, StatusEditor
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +18,21 @@ async def review_today_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Send initial status
-    status_message = await update.message.reply_text("Generating your daily review...")
+    status_message = StatusEditor(await update.message.reply_text("Generating your daily review..."), "Generating your daily review...")
     
     # Get messages from today
-    messages = get_today_messages(user_id)
+    messages = await get_today_messages(user_id)
     
     if not messages:
         await status_message.edit_text("You don't have any entries from today.")
         return
     
-    # Generate review using Claude
-    review = await get_review_summary(messages, "today")
+    # Generate review using Claude (or reuse a stored one), streaming it into the status message
+    editor = ThrottledEditor(status_message)
+    review = await get_review(user_id, messages, TODAY, on_text=editor.update)
     
     # Add reference IDs at the end
-    ref_ids = [ref_id for ref_id, _, _, _ in messages]
+    ref_ids = [message.reference_id for message in messages]
     ref_ids_text = ", ".join(ref_ids)
     review += f"\n\nEntries included: {ref_ids_text}"
     
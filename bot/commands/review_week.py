@@ -3,8 +3,9 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from utils.auth import check_authorization
-from db.models import get_weekly_messages
-from services.claude_service import get_review_summary
+from db.repository import get_weekly_messages
+from services.review_service import get_review, PAST_WEEK
+from utils.telegram import ThrottledEditor, StatusEditor
 
 logger = logging.getLogger(__name__)
 
@@ -17,20 +18,21 @@ async def review_week_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     # Send initial status
-    status_message = await update.message.reply_text("Generating your weekly review...")
+    status_message = StatusEditor(await update.message.reply_text("Generating your weekly review..."), "Generating your weekly review...")
     
     # Get messages from the past week
-    messages = get_weekly_messages(user_id)
+    messages = await get_weekly_messages(user_id)
     
     if not messages:
         await status_message.edit_text("You don't have any entries from the past week.")
         return
     
-    # Generate review using Claude
-    review = await get_review_summary(messages, "the past week")
+    # Generate review using Claude (or reuse a stored one), streaming it into the status message
+    editor = ThrottledEditor(status_message)
+    review = await get_review(user_id, messages, PAST_WEEK, on_text=editor.update)
     
     # Add reference IDs at the end
-    ref_ids = [ref_id for ref_id, _, _, _ in messages]
+    ref_ids = [message.reference_id for message in messages]
     ref_ids_text = ", ".join(ref_ids)
     review += f"\n\nEntries included: {ref_ids_text}"
     
@@ -0,0 +1,49 @@
+import html
+import logging
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from config import SEARCH_RESULT_LIMIT
+from utils.auth import check_authorization
+from db.models import SNIPPET_START, SNIPPET_END
+from db.repository import search_messages
+
+logger = logging.getLogger(__name__)
+
+def format_snippet(snippet):
+    """Escape a search snippet for HTML and bold its matched words."""
+    escaped = html.escape(snippet.replace("\n", " "))
+    return escaped.replace(SNIPPET_START, "<b>").replace(SNIPPET_END, "</b>")
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Search the user's entries for words or phrases."""
+    user_id = update.effective_user.id
+
+    # Check if user is authorized
+    if not await check_authorization(update, context):
+        return
+
+    # Use the raw text rather than context.args so "quoted phrases" survive intact
+    query = update.message.text.partition(" ")[2].strip()
+    if not query:
+        await update.message.reply_text(
+            "Please provide something to search for, e.g. /search running\n\n"
+            "Use \"quotes\" to search for a phrase and a trailing * to match word beginnings, e.g. /search stress*"
+        )
+        return
+
+    results = await search_messages(user_id, query, limit=SEARCH_RESULT_LIMIT)
+
+    if not results:
+        await update.message.reply_text(f"No entries found matching \"{query}\".")
+        return
+
+    response = f"🔎 {len(results)} best matches for \"{html.escape(query)}\":\n\n"
+
+    for result in results:
+        response += f"📝 {result.reference_id} ({result.date_str}): {format_snippet(result.snippet)}\n\n"
+
+    response += "Use /entry MSG123 to view a specific entry."
+
+    await update.message.reply_text(response, parse_mode=ParseMode.HTML)
@@ -15,10 +15,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         "Hi! I'm a voice note reflection bot. Send me a voice message and I'll transcribe it and provide reflective insights!\n\n"
         "Available commands:\n"
-        "/history [n] - Show your last n entries (default 5)\n"
+        "/history [n] - Browse your entries, n per page (default 5)\n"
         "/entry MSG123 - Show a specific entry by reference ID\n"
-        "/weekly - Show all entries from the past week\n"
-        "/random - Show a random entry from your history\n"
+        "/weekly - Browse your entries from the past week\n"
+        "/random [week|month|year] - Show a random entry from your history\n"
+        "/search words - Find entries mentioning words or \"a phrase\"\n"
         "/delete MSG123 - Delete a specific entry by reference ID\n"
         "/review_week - Get AI summary of your entries from the past week\n"
         "/review_today - Get AI summary of your entries from today"
@@ -0,0 +1,83 @@
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from config import PIPELINE_MODE
+from utils.auth import is_user_admin
+from utils.metrics import metrics, get_stage_summary
+from db.jobs import get_job_stats
+from db.repository import run_db
+
+logger = logging.getLogger(__name__)
+
+def format_seconds(value):
+    """Format a duration for the stats message, or "-" if there is none."""
+    return "-" if value is None else f"{value:.2f}s"
+
+def format_stats(job_stats):
+    """Build the text of the /stats message from the metrics and get_job_stats()."""
+    lines = ["📊 Bot stats (since the last restart, latencies over recent notes)", ""]
+
+    stages = get_stage_summary()
+    if stages:
+        lines.append("Stage: p50 / p95 / max (count, errors)")
+        for stage, summary in stages.items():
+            lines.append(
+                f"• {stage}: {format_seconds(summary['p50'])} / {format_seconds(summary['p95'])} / "
+                f"{format_seconds(summary['max'])} ({summary['count']}, {summary['errors']})"
+            )
+    else:
+        lines.append("No voice notes processed yet.")
+
+    real_time_factor = metrics.summary("transcription_real_time_factor")
+    if real_time_factor:
+        lines.append(
+            f"Real-time factor: p50 {real_time_factor['p50']:.2f}, p95 {real_time_factor['p95']:.2f} "
+            f"(transcription seconds per audio second)"
+        )
+
+    routes = metrics.counters("whisper_routes_total", "model")
+    if routes:
+        lines.append("Whisper models: " + ", ".join(f"{model} {count}" for model, count in sorted(routes.items())))
+
+    queue_delay = metrics.summary("telegram_queue_delay_seconds")
+    if queue_delay:
+        coalesced = sum(metrics.counters("telegram_edits_coalesced_total", "result").values())
+        retries = sum(metrics.counters("telegram_retry_after_total", "result").values())
+        lines.append(
+            f"Telegram send delay: p50 {format_seconds(queue_delay['p50'])}, p95 {format_seconds(queue_delay['p95'])} "
+            f"({coalesced} edits merged, {retries} flood waits)"
+        )
+
+    cache = metrics.counters("transcription_cache_total", "result")
+    if cache:
+        lines.append(f"Transcription cache: {cache.get('hit', 0)} hits, {cache.get('miss', 0)} misses")
+
+    # Job stats come from the database, so they also cover previous runs
+    lines.append("")
+    backlog = ", ".join(f"{stage} {count}" for stage, count in job_stats["backlog"].items()) or "empty"
+    lines.append(f"Jobs by stage: {backlog}")
+    if PIPELINE_MODE == "worker":
+        lines.append(f"Worker processes busy: {job_stats['busy_workers']}")
+    lines.append(
+        f"Delivered in the last day: {job_stats['delivered_last_day']} "
+        f"({job_stats['retries_last_day']} retries)"
+    )
+    averages = ", ".join(
+        f"{step} {format_seconds(seconds)}" for step, seconds in job_stats["average_seconds"].items()
+    )
+    lines.append(f"Average step times in the last day: {averages}")
+
+    return "\n".join(lines)
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show pipeline latency and error stats to admins."""
+    user_id = update.effective_user.id
+
+    # Only admins can see stats; everyone else gets no hint the command exists
+    if not is_user_admin(user_id):
+        logger.warning(f"Non-admin user {user_id} tried to use /stats")
+        return
+
+    job_stats = await run_db(get_job_stats)
+    await update.message.reply_text(format_stats(job_stats))
@@ -1,5 +1,5 @@
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
 from bot.commands.start import start_command
 from bot.commands.history import history_command
@@ -9,7 +9,10 @@ from bot.commands.random import random_command
 from bot.commands.delete import delete_command
 from bot.commands.review_week import review_week_command
 from bot.commands.review_today import review_today_command
+from bot.commands.search import search_command
+from bot.commands.stats import stats_command
 from bot.voice_processing import process_voice
+from bot.pagination import page_callback, CALLBACK_PATTERN
 
 logger = logging.getLogger(__name__)
 
@@ -24,10 +27,15 @@ def setup_handlers(application: Application):
     application.add_handler(CommandHandler("delete", delete_command))
     application.add_handler(CommandHandler("review_week", review_week_command))
     application.add_handler(CommandHandler("review_today", review_today_command))
+    application.add_handler(CommandHandler("search", search_command))
+    application.add_handler(CommandHandler("stats", stats_command))
     
     # Add message handlers
     application.add_handler(MessageHandler(filters.VOICE, process_voice))
     
+    # Add the /history and /weekly page buttons
+    application.add_handler(CallbackQueryHandler(page_callback, pattern=CALLBACK_PATTERN))
+    
     logger.info("Command and message handlers set up")
     
     return application 
\ No newline at end of file
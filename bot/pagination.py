@@ -0,0 +1,107 @@
+import logging
+from datetime import datetime, timedelta
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+
+from config import HISTORY_MAX_PAGE_SIZE
+from utils.auth import is_user_authorized
+from db.repository import get_message_page
+
+logger = logging.getLogger(__name__)
+
+# Callback data is "page|view|direction|page size|id|created_at", well within Telegram's 64 bytes
+CALLBACK_PREFIX = "page"
+CALLBACK_PATTERN = rf"^{CALLBACK_PREFIX}\|"
+
+OLDER = "older"
+NEWER = "newer"
+
+# Paginated list -> (days to look back or None for all entries, title, text when there are none)
+VIEWS = {
+    "history": (None, "Your entries, newest first", "You don't have any message history yet."),
+    "weekly": (7, "Your entries from the past week", "You don't have any entries from the past week."),
+}
+
+def make_callback_data(view, direction, page_size, entry):
+    """Encode the button that pages from entry in direction."""
+    return "|".join((CALLBACK_PREFIX, view, direction, str(page_size), str(entry.id), entry.created_at))
+
+def parse_callback_data(data):
+    """Decode a page button into (view, direction, page size, (created_at, id))."""
+    _, view, direction, page_size, entry_id, created_at = data.split("|", 5)
+    if view not in VIEWS or direction not in (OLDER, NEWER):
+        raise ValueError(f"Unknown page button: {data}")
+    return view, direction, max(1, min(int(page_size), HISTORY_MAX_PAGE_SIZE)), (created_at, int(entry_id))
+
+def format_page(view, page, page_size):
+    """Build the text and navigation buttons of a page."""
+    title = VIEWS[view][1]
+    response = f"{title}:\n\n"
+
+    for entry in page.entries:
+        response += f"📝 {entry.reference_id} ({entry.date_str}): \"{entry.short_transcription}\"\n\n"
+
+    response += "Use /entry MSG123 to view a specific entry."
+
+    buttons = []
+    if page.has_newer:
+        buttons.append(InlineKeyboardButton(
+            "« Newer", callback_data=make_callback_data(view, NEWER, page_size, page.entries[0])
+        ))
+    if page.has_older:
+        buttons.append(InlineKeyboardButton(
+            "Older »", callback_data=make_callback_data(view, OLDER, page_size, page.entries[-1])
+        ))
+    markup = InlineKeyboardMarkup([buttons]) if buttons else None
+
+    return response, markup
+
+async def fetch_page(user_id, view, page_size, direction=None, cursor=None):
+    """Get a page of a view, continuing from cursor in direction, or the first page."""
+    days = VIEWS[view][0]
+    since = datetime.now() - timedelta(days=days) if days else None
+    return await get_message_page(
+        user_id,
+        since=since,
+        before=cursor if direction == OLDER else None,
+        after=cursor if direction == NEWER else None,
+        limit=page_size
+    )
+
+async def send_first_page(update: Update, view, page_size):
+    """Reply with the newest page of a view."""
+    page = await fetch_page(update.effective_user.id, view, page_size)
+
+    if not page.entries:
+        await update.message.reply_text(VIEWS[view][2])
+        return
+
+    response, markup = format_page(view, page, page_size)
+    await update.message.reply_text(response, reply_markup=markup)
+
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show the next or previous page when a navigation button is pressed, editing the list in place."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+
+    if not is_user_authorized(user_id):
+        await query.answer("Sorry, you are not authorized to use this bot.")
+        return
+
+    try:
+        view, direction, page_size, cursor = parse_callback_data(query.data)
+    except ValueError:
+        logger.warning(f"Ignoring malformed page button from user {user_id}: {query.data}")
+        await query.answer()
+        return
+
+    page = await fetch_page(user_id, view, page_size, direction, cursor)
+
+    # The entries on either side may have been deleted since the list was sent
+    if not page.entries:
+        await query.answer("No more entries.")
+        return
+
+    await query.answer()
+    response, markup = format_page(view, page, page_size)
+    await query.edit_message_text(response, reply_markup=markup)
@@ -0,0 +1,34 @@
+import logging
+from datetime import datetime, time
+from telegram.ext import Application, ContextTypes
+
+from config import REVIEW_PRECOMPUTE_TIMES
+from services.review_service import precompute_reviews
+
+logger = logging.getLogger(__name__)
+
+async def precompute_reviews_job(context: ContextTypes.DEFAULT_TYPE):
+    """Precompute everyone's reviews, giving up on unfinished batches if the bot stops meanwhile."""
+    application = context.application
+    try:
+        await precompute_reviews(keep_waiting=lambda: application.running)
+    except Exception as e:
+        logger.error(f"Error precomputing reviews: {str(e)}")
+
+def schedule_review_precompute(application: Application):
+    """Run precompute_reviews_job every day at each of REVIEW_PRECOMPUTE_TIMES, in the local timezone."""
+    if application.job_queue is None:
+        logger.warning(
+            "Reviews won't be precomputed: install python-telegram-bot[job-queue] to schedule them"
+        )
+        return
+
+    timezone = datetime.now().astimezone().tzinfo
+    for value in REVIEW_PRECOMPUTE_TIMES:
+        try:
+            at = time.fromisoformat(value).replace(tzinfo=timezone)
+        except ValueError:
+            raise SystemExit(f"REVIEW_PRECOMPUTE_TIMES must be a list of HH:MM times, not \"{value}\"")
+        application.job_queue.run_daily(precompute_reviews_job, at, name=f"precompute_reviews_{value}")
+
+    logger.info(f"Reviews will be precomputed daily at {', '.join(REVIEW_PRECOMPUTE_TIMES)}")
@@ -1,23 +1,319 @@
 import os
 import time
+import uuid
+import socket
+import hashlib
+import asyncio
 import logging
+import tempfile
 from pathlib import Path
+from datetime import datetime
+from contextlib import asynccontextmanager
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
-from config import VOICE_NOTES_DIR
+from config import (
+    VOICE_NOTES_DIR, AUDIO_IN_MEMORY, AUDIO_MEMORY_LIMIT, TRANSCRIPTION_STATUS_POLL_INTERVAL,
+    JOB_MAX_ATTEMPTS, JOB_RETENTION_DAYS, TRANSCRIPTION_CACHE_MAX_ENTRIES, TRANSCRIPTION_CACHE_DAYS,
+    TRANSCRIPTION_CACHE_HASH_AUDIO, TRANSCRIPTION_CACHE_REUSE_REFLECTION, PIPELINE_MODE, JOB_LEASE_SECONDS,
+    DELIVERY_POLL_INTERVAL
+)
 from utils.auth import check_authorization
-from utils.text import split_text, TELEGRAM_MAX_MESSAGE_LENGTH
-from services.whisper_service import transcribe_audio
-from services.claude_service import get_reflection
-from db.models import store_message
+from utils.text import TELEGRAM_MAX_MESSAGE_LENGTH
+from utils.telegram import ThrottledEditor, StatusEditor, StatusMessage, send_long_message
+from utils.metrics import metrics, timed
+from services.whisper_service import transcribe_audio, is_ready
+from services.transcription_queue import get_transcription_executor, TranscriptionQueueFull
+from services.claude_service import get_reflection, REFLECTION_ERROR
+from db.repository import store_message, run_db
+from db.transcription_cache import (
+    get_cached_transcription, cache_transcription, cache_reflection, prune_transcription_cache
+)
+from db.jobs import (
+    STAGE_DOWNLOADED, STAGE_TRANSCRIBED, STAGE_REFLECTED, STAGE_STORED, STAGE_DELIVERED, STAGE_FAILED,
+    NEXT_STEP, create_job, get_job, get_unfinished_jobs, claim_job, claim_next_job, renew_lease, release_claim,
+    release_claims, start_attempt, advance_job, record_job_error, record_delivery, fail_job, get_failed_jobs,
+    get_job_stats, prune_jobs
+)
 
 logger = logging.getLogger(__name__)
 
 # Create directory for temporary voice note storage
 Path(VOICE_NOTES_DIR).mkdir(exist_ok=True)
 
+# Identifies this process when claiming jobs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Status shown while a job waits on worker processes, by stage
+WORKER_STATUS = {
+    STAGE_DOWNLOADED: "Queued for transcription...",
+    STAGE_TRANSCRIBED: "Generating reflective insights...",
+    STAGE_REFLECTED: "Saving your entry...",
+}
+
+# Resumed jobs, deliveries and the delivery loop, waited for by finish_voice_jobs at shutdown
+background_tasks = set()
+stopping = asyncio.Event()
+
+class JobFailed(Exception):
+    """Raised when a job has used up its attempts at a pipeline stage."""
+
+def remove_voice_file(file_path):
+    """Delete a downloaded voice note, if it is still on disk."""
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+
+def remove_orphaned_voice_files(jobs):
+    """Delete downloads that no unfinished job refers to, e.g. left by a crash before the job was recorded."""
+    in_use = {os.path.abspath(job["file_path"]) for job in jobs if job["file_path"]}
+    removed = 0
+    for path in Path(VOICE_NOTES_DIR).glob("voice_*.ogg"):
+        if os.path.abspath(path) not in in_use:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+async def download_to_memory(voice_file):
+    """Download a voice note into a buffer that spills to a temp file above AUDIO_MEMORY_LIMIT.
+    
+    The caller must close the returned buffer.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=AUDIO_MEMORY_LIMIT)
+    try:
+        await voice_file.download_to_memory(buffer)
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer
+
+def format_progress(partial_text, fraction):
+    """Build the status text for a transcription in progress, showing the end of the text so far."""
+    header = f"Transcribing... {fraction:.0%}\n\n"
+    room = TELEGRAM_MAX_MESSAGE_LENGTH - len(header) - 3
+    if len(partial_text) > room:
+        partial_text = "..." + partial_text[-room:]
+    return header + partial_text
+
+def hash_audio(source):
+    """Get the sha256 of a voice note from its file path or in-memory buffer."""
+    digest = hashlib.sha256()
+    if hasattr(source, "read"):
+        source.seek(0)
+        for block in iter(lambda: source.read(65536), b""):
+            digest.update(block)
+        source.seek(0)
+    else:
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+async def start_from_cache(job_id, cached):
+    """Skip a job past the stages whose results were found in the transcription cache."""
+    transcription, claude_response = cached
+    await run_db(advance_job, job_id, STAGE_TRANSCRIBED, transcription=transcription)
+    if claude_response and TRANSCRIPTION_CACHE_REUSE_REFLECTION:
+        await run_db(advance_job, job_id, STAGE_REFLECTED, claude_response=claude_response)
+
+async def wait_for_transcription(job, status_message, progress=None):
+    """Wait for a transcription job, keeping the status message's queue position current.
+    
+    progress is a dict the transcription fills with its latest
+    (partial_text, fraction) under "latest", shown once the job is running.
+    Status edits don't hold up the wait, and without a status message this
+    just waits for the result.
+    """
+    if status_message is None:
+        return await job
+    
+    while True:
+        position = job.position
+        latest = progress.get("latest") if progress is not None else None
+        if position:
+            text = f"Queued for transcription (#{position} of {job.depth})..."
+        elif latest and latest[0].strip():
+            text = format_progress(*latest)
+        elif is_ready():
+            text = "Transcribing..."
+        else:
+            text = "Loading the speech model, then transcribing..."
+        
+        status_message.show(text)
+        
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout=TRANSCRIPTION_STATUS_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            continue
+
+async def deliver_result(job, status_message, reply):
+    """Send the finished reflection and transcription back to the user.
+    
+    The status message is edited into the result, and a transcription too long
+    to fit follows in messages of its own. How many of these have gone out is
+    recorded after each one, so a retry after a partial delivery carries on
+    from there instead of repeating them.
+    """
+    job_id = job["id"]
+    transcription, claude_response, reference_id = job["transcription"], job["claude_response"], job["reference_id"]
+    delivered = job["delivered_messages"] or 0
+    
+    # Prepare the response message
+    full_response = (
+        f"{claude_response}\n\n"
+        f"---\n"
+        f"Original transcription: \"{transcription}\"\n\n"
+        f"Reference ID: {reference_id}"
+    )
+    fits = len(full_response) <= TELEGRAM_MAX_MESSAGE_LENGTH
+    
+    if not delivered:
+        if fits:
+            # Send the full response if it's within limits
+            result = full_response
+        else:
+            # Split the message if it's too long
+            result = (
+                f"{claude_response}\n\n"
+                f"---\n"
+                f"Reference ID: {reference_id}\n\n"
+                f"Note: The transcription is too long to display here. "
+                f"Use /entry {reference_id} to view the full entry."
+            )
+        try:
+            await status_message.edit_text(result)
+        except BadRequest as e:
+            # An earlier attempt got this edit through but failed before recording it
+            if "not modified" not in str(e):
+                raise
+        delivered = 1
+        await run_db(record_delivery, job_id, delivered)
+    
+    if not fits:
+        # Send the transcription separately, split into several messages if needed
+        async def on_sent(count):
+            await run_db(record_delivery, job_id, 1 + count)
+        
+        await send_long_message(
+            reply, f"Original transcription:\n\n\"{transcription}\"", skip=delivered - 1, on_sent=on_sent
+        )
+
+async def report_error(job_id, status_message, reply, error):
+    """Tell the user a voice note failed, without overwriting a result that was already delivered."""
+    text = f"Sorry, an error occurred: {error}"
+    job = await run_db(get_job, job_id) if job_id is not None else None
+    if job is not None and job["delivered_messages"]:
+        await reply(text)
+    else:
+        await status_message.edit_text(text)
+
+async def run_step(job, status_message, reply, audio=None):
+    """Run the pipeline step that moves a job out of its current stage.
+    
+    audio is the in-memory voice note for jobs without a file_path.
+    """
+    job_id = job["id"]
+    stage = job["stage"]
+    
+    if stage == STAGE_DOWNLOADED:
+        # Transcribe the audio on the worker pool so the event loop stays free
+        if audio is not None:
+            # A previous attempt may have read part of the buffer
+            audio.seek(0)
+        source = audio if audio is not None else job["file_path"]
+        
+        # Called from the transcription threads; the latest value is picked up by the status updates
+        progress = {}
+        def on_progress(partial_text, fraction):
+            progress["latest"] = (partial_text, fraction)
+        
+        transcription_job = get_transcription_executor().submit(
+            transcribe_audio, source, duration=job["audio_length"], on_progress=on_progress
+        )
+        transcription = await wait_for_transcription(transcription_job, status_message, progress)
+        await run_db(advance_job, job_id, STAGE_TRANSCRIBED, transcription=transcription)
+        if job["file_unique_id"]:
+            await run_db(
+                cache_transcription, job["file_unique_id"], job["audio_sha256"], job["audio_length"], transcription,
+                max_entries=TRANSCRIPTION_CACHE_MAX_ENTRIES
+            )
+    
+    elif stage == STAGE_TRANSCRIBED:
+        # Get reflective insights from Claude, streaming them into the status message if there is one
+        on_text = None
+        if status_message is not None:
+            status_message.show("Generating reflective insights...")
+            on_text = ThrottledEditor(status_message).update
+        with timed("claude"):
+            claude_response = await get_reflection(job["transcription"], on_text=on_text)
+        await run_db(advance_job, job_id, STAGE_REFLECTED, claude_response=claude_response)
+        # Don't let a Claude outage be replayed for every copy of this note
+        if job["file_unique_id"] and not claude_response.startswith(REFLECTION_ERROR):
+            await run_db(cache_reflection, job["file_unique_id"], claude_response)
+    
+    elif stage == STAGE_REFLECTED:
+        # Store message in database
+        with timed("db_write"):
+            reference_id = await store_message(
+                user_id=job["user_id"],
+                transcription=job["transcription"],
+                claude_response=job["claude_response"],
+                audio_length=job["audio_length"],
+                voice_file_id=job["voice_file_id"]
+            )
+        await run_db(advance_job, job_id, STAGE_STORED, reference_id=reference_id)
+    
+    elif stage == STAGE_STORED:
+        with timed("telegram_send"):
+            await deliver_result(job, status_message, reply)
+        await run_db(advance_job, job_id, STAGE_DELIVERED)
+        
+        # Clean up - delete the temporary file
+        remove_voice_file(job["file_path"])
+
+async def run_job(job_id, status_message, reply, bot, audio=None, stop_at=STAGE_DELIVERED):
+    """Advance a claimed job through its remaining pipeline stages, up to stop_at.
+    
+    Each step is retried up to JOB_MAX_ATTEMPTS times. Attempts are counted
+    before the step runs, so a crash mid-step also uses one up.
+    
+    Jobs kept in memory pass their audio buffer, which is closed once the job
+    stops. If it is missing (e.g. after a restart, or on a worker on another
+    machine) the voice note is downloaded again from Telegram.
+    
+    Worker processes pass no status_message or reply, since they never
+    deliver.
+    """
+    job = await run_db(get_job, job_id)
+    
+    try:
+        while job["stage"] not in (stop_at, STAGE_DELIVERED, STAGE_FAILED):
+            stage = job["stage"]
+            attempts = await run_db(start_attempt, job_id, stage)
+            if attempts > JOB_MAX_ATTEMPTS:
+                error = job["last_error"] or f"could not {NEXT_STEP[stage]} the voice note"
+                await run_db(fail_job, job_id, error)
+                remove_voice_file(job["file_path"])
+                raise JobFailed(error)
+            
+            try:
+                if stage == STAGE_DOWNLOADED and audio is None and not (
+                    job["file_path"] and os.path.exists(job["file_path"])
+                ):
+                    audio = await download_to_memory(await bot.get_file(job["voice_file_id"]))
+                await run_step(job, status_message, reply, audio)
+            except TranscriptionQueueFull:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed to {NEXT_STEP[stage]} (attempt {attempts}): {str(e)}")
+                await run_db(record_job_error, job_id, e)
+            
+            job = await run_db(get_job, job_id)
+    finally:
+        if audio is not None:
+            audio.close()
+
 async def process_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process received voice notes."""
     user_id = update.effective_user.id
@@ -27,85 +323,257 @@ async def process_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Send initial status
-    status_message = await update.message.reply_text("Receiving your voice note...")
-    start_time = time.time()
+    status_message = StatusEditor(await update.message.reply_text("Receiving your voice note..."), "Receiving your voice note...")
+    start_time = time.perf_counter()
+    file_path = None
+    audio = None
+    job_id = None
 
     try:
-        # Get voice note file
-        voice_note = await update.message.voice.get_file()
-        voice_file_id = update.message.voice.file_id
-        audio_length = update.message.voice.duration
-        file_info_time = time.time()
-        logger.info(f"Getting file info took: {file_info_time - start_time:.2f} seconds")
+        voice = update.message.voice
+        voice_file_id = voice.file_id
+        audio_length = voice.duration
+        audio_sha256 = None
         
-        # Generate unique filename
-        file_path = Path(VOICE_NOTES_DIR) / f"voice_{update.message.message_id}.ogg"
+        # Forwarded and re-sent notes keep their file_unique_id, so they can skip the download entirely
+        cached = await run_db(get_cached_transcription, file_unique_id=voice.file_unique_id)
         
-        # Download the voice note
-        await status_message.edit_text("Downloading voice note...")
-        await voice_note.download_to_drive(file_path)
-        download_time = time.time()
-        logger.info(f"Downloading took: {download_time - file_info_time:.2f} seconds")
-
-        # Transcribe the audio
-        await status_message.edit_text("Transcribing...")
-        transcribe_start = time.time()
-        transcription = transcribe_audio(file_path)
-        transcribe_end = time.time()
-        logger.info(f"Transcription took: {transcribe_end - transcribe_start:.2f} seconds")
-
-        # Get reflective insights from Claude
-        await status_message.edit_text("Generating reflective insights...")
-        claude_start = time.time()
-        claude_response = await get_reflection(transcription)
-        claude_end = time.time()
-        logger.info(f"Claude API took: {claude_end - claude_start:.2f} seconds")
+        if cached is None:
+            # Get voice note file
+            with timed("file_info"):
+                voice_note = await voice.get_file()
+            
+            # Download the voice note, straight into memory or to a uniquely named file
+            status_message.show("Downloading voice note...")
+            with timed("download"):
+                # Worker processes read the note from disk, so it can only be kept in memory inline
+                if AUDIO_IN_MEMORY and PIPELINE_MODE == "inline":
+                    audio = await download_to_memory(voice_note)
+                else:
+                    file_path = Path(VOICE_NOTES_DIR) / f"voice_{update.message.message_id}.ogg"
+                    await voice_note.download_to_drive(file_path)
+            
+            # The same audio uploaded again gets a new file_unique_id, but not new bytes
+            if TRANSCRIPTION_CACHE_HASH_AUDIO:
+                audio_sha256 = hash_audio(audio if audio is not None else file_path)
+                cached = await run_db(get_cached_transcription, audio_sha256=audio_sha256)
+        metrics.increment("transcription_cache_total", result="miss" if cached is None else "hit")
 
-        # Store message in database
-        reference_id = store_message(
+        # Record the job so it survives a restart, then run it
+        job_id = await run_db(
+            create_job,
             user_id=user_id,
-            transcription=transcription,
-            claude_response=claude_response,
+            chat_id=update.effective_chat.id,
+            voice_message_id=update.message.message_id,
+            status_message_id=status_message.message_id,
+            voice_file_id=voice_file_id,
             audio_length=audio_length,
-            voice_file_id=voice_file_id
+            file_path=str(file_path) if file_path else None,
+            file_unique_id=voice.file_unique_id,
+            audio_sha256=audio_sha256
         )
+        if cached is not None:
+            await start_from_cache(job_id, cached)
+            # The audio won't be transcribed, so let it go now
+            remove_voice_file(file_path)
+            if audio is not None:
+                audio.close()
+                audio = None
         
-        # Prepare the response message
-        full_response = (
-            f"{claude_response}\n\n"
-            f"---\n"
-            f"Original transcription: \"{transcription}\"\n\n"
-            f"Reference ID: {reference_id}"
-        )
+        # A worker process takes it from here, and watch_worker_jobs delivers the result
+        if PIPELINE_MODE == "worker":
+            job = await run_db(get_job, job_id)
+            await status_message.edit_text(WORKER_STATUS[job["stage"]])
+            return
         
-        # Check if the message is too long for Telegram
-        if len(full_response) <= TELEGRAM_MAX_MESSAGE_LENGTH:
-            # Send the full response if it's within limits
-            await status_message.edit_text(full_response)
-        else:
-            # Split the message if it's too long
-            await status_message.edit_text(
-                f"{claude_response}\n\n"
-                f"---\n"
-                f"Reference ID: {reference_id}\n\n"
-                f"Note: The transcription is too long to display here. "
-                f"Use /entry {reference_id} to view the full entry."
-            )
-            
-            # If the transcription alone is short enough, send it as a separate message
-            if len(transcription) <= TELEGRAM_MAX_MESSAGE_LENGTH - 50:  # Leave some room for formatting
-                await update.message.reply_text(f"Original transcription:\n\n\"{transcription}\"")
-            else:
-                # Split the transcription into multiple messages if needed
-                chunks = split_text(f"Original transcription:\n\n\"{transcription}\"")
-                for chunk in chunks:
-                    await update.message.reply_text(chunk)
+        await run_db(claim_job, job_id, WORKER_ID)
+        # run_job owns the audio buffer from here and closes it
+        job_audio, audio = audio, None
+        await run_job(job_id, status_message, update.message.reply_text, context.bot, job_audio)
         
-        logger.info(f"Total processing time: {claude_end - start_time:.2f} seconds")
+        elapsed = time.perf_counter() - start_time
+        metrics.observe("voice_note_seconds", elapsed)
+        logger.info(f"Total processing time: {elapsed:.2f} seconds")
 
-        # Clean up - delete the temporary file
-        os.remove(file_path)
+    except TranscriptionQueueFull:
+        logger.warning(f"Transcription queue full, rejecting voice note from user {user_id}")
+        await run_db(fail_job, job_id, "Transcription queue full")
+        remove_voice_file(file_path)
+        await status_message.edit_text("I'm busy with a lot of voice notes right now. Please try again in a few minutes.")
 
     except Exception as e:
         logger.error(f"Error processing voice note: {str(e)}")
-        await status_message.edit_text(f"Sorry, an error occurred: {str(e)}") 
\ No newline at end of file
+        # Without a job there is nothing to resume, so don't leave the download behind
+        if job_id is None:
+            remove_voice_file(file_path)
+        if audio is not None:
+            audio.close()
+        await report_error(job_id, status_message, update.message.reply_text, str(e))
+
+async def resume_job(bot, job):
+    """Pick up an interrupted job, replying in its original chat."""
+    if not await run_db(claim_job, job["id"], WORKER_ID):
+        return
+    
+    chat_id = job["chat_id"]
+    logger.info(f"Resuming job {job['id']} for user {job['user_id']} from stage '{job['stage']}'")
+    
+    status_message = StatusEditor(await bot.send_message(
+        chat_id,
+        "Picking up your voice note where I left off...",
+        reply_to_message_id=job["voice_message_id"],
+        allow_sending_without_reply=True
+    ))
+    
+    async def reply(text):
+        return await bot.send_message(chat_id, text)
+    
+    try:
+        await run_job(job["id"], status_message, reply, bot)
+    except TranscriptionQueueFull:
+        # Leave the job unclaimed for the next restart rather than dropping it
+        await run_db(release_claim, job["id"])
+        await status_message.edit_text("I'm busy with a lot of voice notes right now. I'll try yours again later.")
+    except Exception as e:
+        logger.error(f"Error resuming job {job['id']}: {str(e)}")
+        await report_error(job["id"], status_message, reply, str(e))
+
+def start_background_task(coroutine):
+    """Run coroutine as a task that finish_voice_jobs waits for at shutdown."""
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+@asynccontextmanager
+async def hold_lease(job_id, lease_seconds=JOB_LEASE_SECONDS):
+    """Keep renewing this process's lease on a claimed job while the block runs."""
+    async def renew():
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            if not await run_db(renew_lease, job_id, WORKER_ID, lease_seconds):
+                logger.warning(f"Lost the lease on job {job_id} to another process")
+                return
+    
+    renewer = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        renewer.cancel()
+
+def worker_status(job):
+    """The status message text for a job being worked on by a worker process."""
+    if job["stage"] == STAGE_DOWNLOADED and job["claimed_by"]:
+        return "Transcribing..."
+    return WORKER_STATUS.get(job["stage"])
+
+def job_status_editor(bot, job, text=None):
+    """A StatusEditor for a job's status message, which may belong to an update long gone."""
+    return StatusEditor(StatusMessage(bot, job["chat_id"], job["status_message_id"]), text)
+
+async def deliver_job(bot, job, status_message=None):
+    """Deliver a job that a worker process has stored, editing its status message into the result.
+    
+    status_message is the job's StatusEditor from update_worker_statuses, if it has one,
+    so no status still being sent can land on top of the result.
+    """
+    chat_id = job["chat_id"]
+    if status_message is None:
+        status_message = job_status_editor(bot, job)
+    
+    async def reply(text):
+        return await bot.send_message(chat_id, text)
+    
+    try:
+        async with hold_lease(job["id"]):
+            await run_job(job["id"], status_message, reply, bot)
+    except Exception as e:
+        logger.error(f"Error delivering job {job['id']}: {str(e)}")
+        await report_error(job["id"], status_message, reply, str(e))
+
+async def update_worker_statuses(bot, shown, failed, since):
+    """Show the new status of jobs whose stage changed since the last check.
+    
+    shown maps each job still being worked on to the StatusEditor of its
+    status message, and failed holds the jobs already told they failed.
+    Jobs that failed at or after since and aren't in failed yet are told so.
+    Edits are sent in the background, so a slow chat doesn't hold up the rest.
+    """
+    newly_failed = await run_db(get_failed_jobs, since)
+    for job in newly_failed:
+        status = shown.pop(job["id"], None)
+        if job["id"] not in failed:
+            (status or job_status_editor(bot, job)).show(f"Sorry, an error occurred: {job['last_error']}")
+    # Timestamps have whole seconds, so the next check can see the same jobs again
+    failed.clear()
+    failed.update(job["id"] for job in newly_failed)
+    
+    jobs = await run_db(get_unfinished_jobs)
+    unfinished = {job["id"] for job in jobs}
+    for job_id in list(shown):
+        if job_id not in unfinished:
+            del shown[job_id]
+    
+    for job in jobs:
+        text = worker_status(job)
+        if text is not None:
+            # New jobs start out showing what process_voice showed
+            if job["id"] not in shown:
+                shown[job["id"]] = job_status_editor(bot, job, WORKER_STATUS[STAGE_DOWNLOADED])
+            shown[job["id"]].show(text)
+
+async def watch_worker_jobs(bot):
+    """Keep status messages current and deliver the results of worker processes, until the bot stops."""
+    shown = {}
+    failed = set()
+    since = datetime.now()
+    while not stopping.is_set():
+        try:
+            checked_at = datetime.now()
+            await update_worker_statuses(bot, shown, failed, since)
+            since = checked_at
+            while (job := await run_db(claim_next_job, WORKER_ID, [STAGE_STORED], JOB_LEASE_SECONDS)) is not None:
+                start_background_task(deliver_job(bot, job, shown.pop(job["id"], None)))
+        except Exception as e:
+            logger.error(f"Error checking on worker jobs: {str(e)}")
+        
+        try:
+            await asyncio.wait_for(stopping.wait(), timeout=DELIVERY_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+async def resume_voice_jobs(application):
+    """Resume voice note jobs that were interrupted by a restart.
+    
+    In worker mode only delivery happens here: the other steps are left to
+    the worker processes, and a loop is started that delivers their results.
+    """
+    stopping.clear()
+    # Any unleased claims left over belong to the previous run of this process
+    await run_db(release_claims)
+    pruned = await run_db(prune_jobs, JOB_RETENTION_DAYS)
+    evicted = await run_db(prune_transcription_cache, TRANSCRIPTION_CACHE_DAYS)
+    jobs = await run_db(get_unfinished_jobs)
+    orphaned = remove_orphaned_voice_files(jobs)
+    
+    stats = await run_db(get_job_stats)
+    logger.info(
+        f"Job backlog by stage: {stats['backlog']}, "
+        f"delivered in the last day: {stats['delivered_last_day']}, "
+        f"pruned {pruned} old jobs, removed {orphaned} orphaned voice files, "
+        f"evicted {evicted} stale transcription cache entries"
+    )
+    
+    if PIPELINE_MODE == "worker":
+        start_background_task(watch_worker_jobs(application.bot))
+        return
+    
+    for job in jobs:
+        start_background_task(resume_job(application.bot, job))
+
+async def finish_voice_jobs(application):
+    """Let resumed jobs and deliveries still in progress finish when the bot stops."""
+    stopping.set()
+    while background_tasks:
+        logger.info(f"Waiting for {len(background_tasks)} voice note tasks to finish")
+        await asyncio.gather(*background_tasks, return_exceptions=True)
@@ -0,0 +1,66 @@
+import signal
+import asyncio
+import logging
+import secrets
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_DRAIN_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+async def drain_updates(application: Application, timeout=WEBHOOK_DRAIN_TIMEOUT):
+    """Wait for updates that were received but not yet picked up, up to timeout seconds.
+    
+    Telegram considers an update delivered once the webhook has answered, so
+    anything still queued when the application stops would be lost.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not application.update_queue.empty():
+        if asyncio.get_running_loop().time() >= deadline:
+            logger.warning(f"Stopping with {application.update_queue.qsize()} updates still queued")
+            return
+        await asyncio.sleep(0.1)
+
+async def serve_webhook(application: Application, webhook_url=WEBHOOK_URL, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+                        url_path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET_TOKEN, stop=None):
+    """Receive updates on a local webhook server until stop is set, or SIGINT/SIGTERM if it isn't given.
+    
+    Requests without the secret token are rejected. On shutdown the server
+    stops accepting updates first, queued updates are drained and handlers
+    that are still running are allowed to finish.
+    """
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+    
+    # A fresh secret each run still works, since it is registered with Telegram below
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    
+    async with application:
+        # run_polling calls post_init and post_stop itself; here it is up to us
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await application.updater.start_webhook(
+            listen=listen,
+            port=port,
+            url_path=url_path,
+            webhook_url=f"{webhook_url.rstrip('/')}/{url_path}",
+            secret_token=secret_token,
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+        logger.info(f"Listening for webhook updates on {listen}:{port}/{url_path}")
+        
+        await stop.wait()
+        
+        logger.info("Shutting down: no longer accepting updates, finishing the ones received")
+        await application.updater.stop()
+        await drain_updates(application)
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
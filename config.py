@@ -12,6 +12,10 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 authorized_ids_str = os.getenv("AUTHORIZED_USER_IDS", "")
 AUTHORIZED_USER_IDS = [int(id_str) for id_str in authorized_ids_str.split(",") if id_str.strip().isdigit()]
 
+# Admins can see /stats
+admin_ids_str = os.getenv("ADMIN_USER_IDS", "")
+ADMIN_USER_IDS = [int(id_str) for id_str in admin_ids_str.split(",") if id_str.strip().isdigit()]
+
 # API Keys
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 
@@ -20,17 +24,131 @@ WHISPER_MODEL = "medium"  # Options: tiny, base, small, medium, large
 WHISPER_DEVICE = "cpu"
 WHISPER_COMPUTE_TYPE = "int8"
 
+# Route voice notes to a Whisper model by duration: (longest duration in seconds, model).
+# The first route a note fits is used; None matches any duration. Every note goes to
+# WHISPER_MODEL unless routes are added, e.g. [(20, "small"), (None, WHISPER_MODEL)]
+# to send notes up to 20 seconds to a faster model.
+WHISPER_MODEL_ROUTES = [
+    (None, WHISPER_MODEL),
+]
+WHISPER_WARMUP = os.getenv("WHISPER_WARMUP", "true").lower() == "true"  # Load the models at startup
+
+# Transcription worker pool
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "1"))
+TRANSCRIPTION_QUEUE_SIZE = int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "20"))
+TRANSCRIPTION_STATUS_POLL_INTERVAL = 2  # Seconds between queue position updates
+
+# Long notes are split at silences and their chunks transcribed in parallel
+CHUNKED_TRANSCRIPTION_MIN_SECONDS = int(os.getenv("CHUNKED_TRANSCRIPTION_MIN_SECONDS", "300"))
+TRANSCRIPTION_CHUNK_SECONDS = 60  # Target chunk length; chunks only end in a silence
+TRANSCRIPTION_CHUNK_WORKERS = int(os.getenv("TRANSCRIPTION_CHUNK_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+# Micro-batching: notes arriving together are transcribed in one batched Whisper pass.
+# Only helps with TRANSCRIPTION_WORKERS > 1, since each waiting note holds a worker.
+TRANSCRIPTION_BATCHING = os.getenv("TRANSCRIPTION_BATCHING", "false").lower() == "true"
+TRANSCRIPTION_BATCH_SIZE = int(os.getenv("TRANSCRIPTION_BATCH_SIZE", "8"))  # Most notes (and 30s windows per pass) in a batch
+TRANSCRIPTION_BATCH_WAIT = float(os.getenv("TRANSCRIPTION_BATCH_WAIT", "0.5"))  # Seconds to wait for more notes to join a batch
+
 # Claude model configuration
 CLAUDE_MODEL = "claude-3-5-haiku-20241022"
 CLAUDE_MAX_TOKENS = 1000
 CLAUDE_TEMPERATURE = 0.7
 CLAUDE_REVIEW_MAX_TOKENS = 1500
+CLAUDE_DIGEST_MAX_TOKENS = 300
+
+# Prompt token budget. Content over the budget is split into chunks, each chunk is
+# summarized, and the summaries are combined, rather than cutting off the end.
+CLAUDE_INPUT_TOKEN_BUDGET = int(os.getenv("CLAUDE_INPUT_TOKEN_BUDGET", "24000"))
+CLAUDE_CHUNK_TOKENS = 8000  # Size of each chunk sent for summarizing
+CLAUDE_CHUNK_SUMMARY_MAX_TOKENS = 1000
+CLAUDE_CHUNK_CONCURRENCY = 4  # Chunks summarized at the same time
+
+# Reviews are built from a short digest of each entry, computed once and stored
+DIGEST_MIN_LENGTH = 800  # Entries shorter than this (characters) are used as their own digest
+DIGEST_CONCURRENCY = 4  # Digests requested from Claude at the same time
+REVIEW_RETENTION_DAYS = 30  # Memoized reviews are kept this long
+
+# Daily and weekly reviews of recently active users are precomputed on a schedule
+# through the Message Batches API, so /review_today and /review_week usually find
+# them already stored. Needs python-telegram-bot's job-queue extra.
+REVIEW_PRECOMPUTE = os.getenv("REVIEW_PRECOMPUTE", "true").lower() == "true"
+REVIEW_PRECOMPUTE_TIMES = [  # Local times of day to submit the batches, as HH:MM
+    value.strip() for value in os.getenv("REVIEW_PRECOMPUTE_TIMES", "20:00").split(",") if value.strip()
+]
+REVIEW_BATCH_POLL_INTERVAL = 30  # Seconds between checks on a submitted batch
+REVIEW_BATCH_TIMEOUT = 6 * 60 * 60  # Batches still running after this many seconds are cancelled
+REVIEW_BATCH_MAX_REQUESTS = 10000  # Requests per batch; more are split across several
+
+# Streaming replies are edited into the status message at most this often (seconds),
+# which keeps us under Telegram's edit rate limits
+STREAM_EDIT_INTERVAL = 1.5
+
+# How updates arrive: "polling" (the default) or "webhook", where Telegram
+# posts them to a local HTTP server, usually behind a reverse proxy for HTTPS
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # Public base URL Telegram posts updates to
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")  # A random one is used for each run if unset
+WEBHOOK_MAX_CONNECTIONS = 40  # Connections Telegram may open to deliver updates at once
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))  # Updates handled at once, in either mode
+WEBHOOK_DRAIN_TIMEOUT = 30  # Seconds to wait at shutdown for received updates to be picked up
+
+# Outbound Telegram rate limits. Telegram allows about 30 messages a second
+# overall and 1 a second per chat before answering with flood control errors.
+TELEGRAM_RATE_LIMIT = os.getenv("TELEGRAM_RATE_LIMIT", "true").lower() == "true"
+TELEGRAM_GLOBAL_RATE = 30  # Requests a second across all chats
+TELEGRAM_CHAT_RATE = 1.0  # Requests a second to each chat, on average
+TELEGRAM_CHAT_BURST = 4  # Requests a chat can get at once after being quiet
+TELEGRAM_MAX_RETRIES = 3  # Times a request is retried after flood control
 
 # Database configuration
 DB_PATH = 'messages.db'
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # Page cache per connection
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))  # Bytes of the file to memory-map
+DB_BUSY_TIMEOUT = 10  # Seconds to wait for another writer before giving up
+DB_STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+
+# /random
+RANDOM_RECENT_EXCLUDE = 10  # Don't repeat any of a user's last N random entries
+
+# /search
+SEARCH_RESULT_LIMIT = 10
+
+# /history and /weekly
+HISTORY_PAGE_SIZE = 5  # Entries per page, unless /history n asks for up to HISTORY_MAX_PAGE_SIZE
+HISTORY_MAX_PAGE_SIZE = 20
+PREVIEW_LENGTH = 50  # Characters of each transcription shown in the list
 
 # Voice notes storage
 VOICE_NOTES_DIR = "voice_notes"
+AUDIO_IN_MEMORY = os.getenv("AUDIO_IN_MEMORY", "false").lower() == "true"  # Keep voice notes in memory instead of VOICE_NOTES_DIR
+AUDIO_MEMORY_LIMIT = int(os.getenv("AUDIO_MEMORY_LIMIT", str(5 * 1024 * 1024)))  # Bytes per note before spilling to a temp file
+
+# Voice note job queue
+JOB_MAX_ATTEMPTS = 3  # Attempts per pipeline stage before a job is marked failed
+JOB_RETENTION_DAYS = 30  # Finished jobs are kept this long for throughput stats
+
+# Where voice notes are transcribed and reflected on: "inline" (the default) runs
+# every step in the bot, "worker" leaves them to separate worker.py processes that
+# share the database, and the bot only downloads, enqueues and delivers
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "inline").lower()
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))  # Jobs each worker process runs at once
+WORKER_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking the queue again
+JOB_LEASE_SECONDS = 60  # A claimed job is taken over by another process if its lease isn't renewed in time
+DELIVERY_POLL_INTERVAL = 1.0  # Seconds between the bot's checks for finished jobs and status changes
+
+# Transcription cache for forwarded and re-sent voice notes
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "5000"))
+TRANSCRIPTION_CACHE_DAYS = int(os.getenv("TRANSCRIPTION_CACHE_DAYS", "90"))  # Entries unused this long are evicted
+TRANSCRIPTION_CACHE_HASH_AUDIO = os.getenv("TRANSCRIPTION_CACHE_HASH_AUDIO", "true").lower() == "true"  # Also match identical audio
+TRANSCRIPTION_CACHE_REUSE_REFLECTION = os.getenv("TRANSCRIPTION_CACHE_REUSE_REFLECTION", "true").lower() == "true"  # Otherwise ask Claude again
+
+# Metrics
+METRICS_SAMPLE_SIZE = 1000  # Recent samples per histogram used for percentiles in /stats
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve Prometheus metrics on this port; 0 disables it
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
 
 # Logging
 def get_logger(name):
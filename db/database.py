@@ -1,29 +1,77 @@
 import sqlite3
 import logging
-from config import DB_PATH
+import threading
+from contextlib import contextmanager
+from config import DB_PATH, DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT, DB_STATEMENT_CACHE_SIZE
+from db.migrations import run_migrations
 
 logger = logging.getLogger(__name__)
 
-def init_db():
-    """Initialize the SQLite database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        reference_id TEXT UNIQUE,
-        user_id INTEGER,
-        transcription TEXT,
-        claude_response TEXT,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        audio_length FLOAT,
-        voice_file_id TEXT
+# One long-lived connection per thread, so handlers running in executors
+# never share a connection but also never pay for reconnecting
+local = threading.local()
+connections = []
+connections_lock = threading.Lock()
+
+# WAL lets any number of readers run alongside a single writer.
+# Writers in this process take this lock so they queue here instead of
+# spinning on SQLITE_BUSY.
+write_lock = threading.RLock()
+
+def connect():
+    """Open a new connection with the journaling and cache pragmas applied."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=DB_BUSY_TIMEOUT,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        check_same_thread=False
     )
-    ''')
-    conn.commit()
-    conn.close()
-    logger.info("Database initialized")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def init_db():
+    """Initialize the SQLite database, bringing its schema up to date."""
+    version = run_migrations(get_connection())
+    logger.info(f"Database initialized at schema version {version}")
 
 def get_connection():
-    """Get a database connection."""
-    return sqlite3.connect(DB_PATH) 
\ No newline at end of file
+    """Get this thread's database connection, opening it if necessary.
+    
+    The connection is reused for the life of the thread, so callers must
+    not close it.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = connect()
+        local.conn = conn
+        with connections_lock:
+            connections.append(conn)
+        logger.info(f"Opened database connection for thread {threading.current_thread().name}")
+    return conn
+
+@contextmanager
+def transaction():
+    """Run a block of writes as one transaction, serialized with other writers."""
+    conn = get_connection()
+    with write_lock:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+def close_connections():
+    """Close every connection opened by get_connection, e.g. at shutdown."""
+    with connections_lock:
+        for conn in connections:
+            conn.close()
+        connections.clear()
+    if hasattr(local, "conn"):
+        del local.conn 
\ No newline at end of file
@@ -0,0 +1,288 @@
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from db.database import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in order. A job's stage is the last one it completed.
+STAGE_DOWNLOADED = "downloaded"
+STAGE_TRANSCRIBED = "transcribed"
+STAGE_REFLECTED = "reflected"
+STAGE_STORED = "stored"
+STAGE_DELIVERED = "delivered"
+STAGE_FAILED = "failed"
+
+STAGES = [STAGE_DOWNLOADED, STAGE_TRANSCRIBED, STAGE_REFLECTED, STAGE_STORED, STAGE_DELIVERED]
+
+# The step that moves a job out of each stage, used to name its attempt counter
+NEXT_STEP = {
+    STAGE_DOWNLOADED: "transcribe",
+    STAGE_TRANSCRIBED: "reflect",
+    STAGE_REFLECTED: "store",
+    STAGE_STORED: "deliver",
+}
+
+# Stages a worker process picks jobs up from; stored jobs are delivered by the bot
+WORKER_STAGES = [STAGE_DOWNLOADED, STAGE_TRANSCRIBED, STAGE_REFLECTED]
+
+JOB_FIELDS = {"transcription", "claude_response", "reference_id", "file_path", "status_message_id"}
+
+def _now(offset_seconds=0):
+    return (datetime.now() + timedelta(seconds=offset_seconds)).strftime('%Y-%m-%d %H:%M:%S')
+
+def create_job(user_id, chat_id, voice_message_id, status_message_id, voice_file_id, audio_length, file_path,
+               file_unique_id=None, audio_sha256=None):
+    """Create a job for a freshly downloaded voice note."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        now = _now()
+        cursor.execute('''
+        INSERT INTO voice_jobs (user_id, chat_id, voice_message_id, status_message_id, voice_file_id,
+                                audio_length, file_path, file_unique_id, audio_sha256,
+                                stage, created_at, downloaded_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, chat_id, voice_message_id, status_message_id, voice_file_id,
+              audio_length, file_path, file_unique_id, audio_sha256, STAGE_DOWNLOADED, now, now, now))
+        job_id = cursor.lastrowid
+
+    return job_id
+
+def get_job(job_id):
+    """Get a job by its ID."""
+    cursor = get_connection().cursor()
+    cursor.row_factory = sqlite3.Row
+
+    cursor.execute("SELECT * FROM voice_jobs WHERE id = ?", (job_id,))
+
+    return cursor.fetchone()
+
+def get_unfinished_jobs():
+    """Get all jobs that have neither been delivered nor failed, oldest first."""
+    cursor = get_connection().cursor()
+    cursor.row_factory = sqlite3.Row
+
+    cursor.execute('''
+    SELECT * FROM voice_jobs
+    WHERE stage NOT IN (?, ?)
+    ORDER BY id
+    ''', (STAGE_DELIVERED, STAGE_FAILED))
+
+    return cursor.fetchall()
+
+def get_failed_jobs(since):
+    """Get the jobs that failed at or after since without being stored, i.e. in a worker's hands."""
+    cursor = get_connection().cursor()
+    cursor.row_factory = sqlite3.Row
+
+    cursor.execute('''
+    SELECT * FROM voice_jobs
+    WHERE stage = ? AND failed_at >= ? AND stored_at IS NULL
+    ORDER BY id
+    ''', (STAGE_FAILED, since.strftime('%Y-%m-%d %H:%M:%S')))
+
+    return cursor.fetchall()
+
+def claim_job(job_id, worker_id):
+    """Claim an unclaimed job for a worker. Returns True if the claim succeeded."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        UPDATE voice_jobs
+        SET claimed_by = ?, claimed_at = ?
+        WHERE id = ? AND claimed_by IS NULL
+        ''', (worker_id, _now(), job_id))
+
+        claimed = cursor.rowcount > 0
+
+    return claimed
+
+def claim_next_job(worker_id, stages, lease_seconds):
+    """Claim the oldest job waiting in one of stages, leasing it to a worker for lease_seconds.
+    
+    Jobs whose lease has run out, e.g. because their worker died, can be
+    claimed again. Claims made with claim_job have no lease and are never
+    taken over.
+    
+    Returns:
+        sqlite3.Row: The claimed job, or None if there was nothing to claim
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+
+        now = _now()
+        placeholders = ", ".join("?" * len(stages))
+        cursor.execute(f'''
+        SELECT id FROM voice_jobs
+        WHERE stage IN ({placeholders}) AND (claimed_by IS NULL OR lease_expires_at < ?)
+        ORDER BY id
+        LIMIT 1
+        ''', (*stages, now))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        cursor.execute('''
+        UPDATE voice_jobs
+        SET claimed_by = ?, claimed_at = ?, lease_expires_at = ?
+        WHERE id = ?
+        ''', (worker_id, now, _now(lease_seconds), row["id"]))
+        cursor.execute("SELECT * FROM voice_jobs WHERE id = ?", (row["id"],))
+        job = cursor.fetchone()
+
+    return job
+
+def renew_lease(job_id, worker_id, lease_seconds):
+    """Extend a worker's lease on a job. Returns False if the worker no longer holds it."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        UPDATE voice_jobs
+        SET lease_expires_at = ?
+        WHERE id = ? AND claimed_by = ?
+        ''', (_now(lease_seconds), job_id, worker_id))
+
+        renewed = cursor.rowcount > 0
+
+    return renewed
+
+def release_claim(job_id):
+    """Release the claim on a job so it can be picked up again."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE voice_jobs SET claimed_by = NULL, claimed_at = NULL, lease_expires_at = NULL WHERE id = ?",
+            (job_id,)
+        )
+
+def release_claims():
+    """Release the unleased claims on all unfinished jobs, e.g. after a restart.
+    
+    Only the bot makes claims without a lease, so these are all left over
+    from its previous run. Leased claims belong to worker processes and
+    are left to expire.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        UPDATE voice_jobs
+        SET claimed_by = NULL, claimed_at = NULL
+        WHERE claimed_by IS NOT NULL AND lease_expires_at IS NULL AND stage NOT IN (?, ?)
+        ''', (STAGE_DELIVERED, STAGE_FAILED))
+
+        released = cursor.rowcount
+
+    return released
+
+def start_attempt(job_id, stage):
+    """Count an attempt at the step that follows stage and return the attempt number."""
+    column = f"{NEXT_STEP[stage]}_attempts"
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(f'''
+        UPDATE voice_jobs
+        SET {column} = {column} + 1, updated_at = ?
+        WHERE id = ?
+        ''', (_now(), job_id))
+        cursor.execute(f"SELECT {column} FROM voice_jobs WHERE id = ?", (job_id,))
+        attempts = cursor.fetchone()[0]
+
+    return attempts
+
+def advance_job(job_id, stage, **fields):
+    """Move a job to stage, recording when it got there and any stage outputs."""
+    unknown = set(fields) - JOB_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+    now = _now()
+    assignments = ["stage = ?", f"{stage}_at = ?", "updated_at = ?"]
+    values = [stage, now, now]
+    for name, value in fields.items():
+        assignments.append(f"{name} = ?")
+        values.append(value)
+    if stage in (STAGE_DELIVERED, STAGE_FAILED):
+        assignments.append("claimed_by = NULL")
+        assignments.append("lease_expires_at = NULL")
+
+    with transaction() as conn:
+        conn.execute(f"UPDATE voice_jobs SET {', '.join(assignments)} WHERE id = ?", (*values, job_id))
+
+def record_job_error(job_id, error):
+    """Record the most recent error for a job."""
+    with transaction() as conn:
+        conn.execute('''
+        UPDATE voice_jobs SET last_error = ?, updated_at = ? WHERE id = ?
+        ''', (str(error), _now(), job_id))
+
+def record_delivery(job_id, messages_sent):
+    """Record how many of a job's result messages have been sent, so a retried delivery skips them."""
+    with transaction() as conn:
+        conn.execute('''
+        UPDATE voice_jobs SET delivered_messages = ?, updated_at = ? WHERE id = ?
+        ''', (messages_sent, _now(), job_id))
+
+def fail_job(job_id, error):
+    """Mark a job as permanently failed."""
+    record_job_error(job_id, error)
+    advance_job(job_id, STAGE_FAILED)
+
+def get_job_stats():
+    """Get the job backlog per stage and the average time each step took over the last day."""
+    cursor = get_connection().cursor()
+
+    cursor.execute("SELECT stage, COUNT(*) FROM voice_jobs GROUP BY stage")
+    backlog = dict(cursor.fetchall())
+
+    one_day_ago = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute('''
+    SELECT COUNT(*),
+           AVG(strftime('%s', transcribed_at) - strftime('%s', downloaded_at)),
+           AVG(strftime('%s', reflected_at) - strftime('%s', transcribed_at)),
+           AVG(strftime('%s', stored_at) - strftime('%s', reflected_at)),
+           AVG(strftime('%s', delivered_at) - strftime('%s', stored_at)),
+           SUM(MAX(transcribe_attempts - 1, 0) + MAX(reflect_attempts - 1, 0)
+               + MAX(store_attempts - 1, 0) + MAX(deliver_attempts - 1, 0))
+    FROM voice_jobs
+    WHERE stage = ? AND delivered_at >= ?
+    ''', (STAGE_DELIVERED, one_day_ago))
+    delivered, transcribe, reflect, store, deliver, retries = cursor.fetchone()
+
+    cursor.execute(
+        "SELECT COUNT(DISTINCT claimed_by) FROM voice_jobs WHERE lease_expires_at >= ? AND stage IN (?, ?, ?)",
+        (_now(), *WORKER_STAGES)
+    )
+    busy_workers = cursor.fetchone()[0]
+
+    return {
+        "backlog": backlog,
+        "busy_workers": busy_workers,
+        "delivered_last_day": delivered,
+        "retries_last_day": retries or 0,
+        "average_seconds": {
+            "transcribe": transcribe,
+            "reflect": reflect,
+            "store": store,
+            "deliver": deliver,
+        },
+    }
+
+def prune_jobs(days):
+    """Delete delivered and failed jobs older than the given number of days."""
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute('''
+        DELETE FROM voice_jobs
+        WHERE stage IN (?, ?) AND updated_at < ?
+        ''', (STAGE_DELIVERED, STAGE_FAILED, cutoff))
+
+        pruned = cursor.rowcount
+
+    return pruned
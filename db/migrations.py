@@ -0,0 +1,263 @@
+"""Versioned schema migrations.
+
+Each migration is applied once, in order, and recorded in the schema_version
+table. To change the schema, append a new migration to MIGRATIONS; never edit
+one that has already shipped.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (version, description, statements)
+MIGRATIONS = [
+    (1, "Create messages table", [
+        '''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reference_id TEXT UNIQUE,
+            user_id INTEGER,
+            transcription TEXT,
+            claude_response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            audio_length FLOAT,
+            voice_file_id TEXT
+        )
+        ''',
+    ]),
+    (2, "Create voice_jobs table", [
+        '''
+        CREATE TABLE IF NOT EXISTS voice_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            chat_id INTEGER,
+            voice_message_id INTEGER,
+            status_message_id INTEGER,
+            voice_file_id TEXT,
+            audio_length FLOAT,
+            file_path TEXT,
+            stage TEXT,
+            transcription TEXT,
+            claude_response TEXT,
+            reference_id TEXT,
+            claimed_by TEXT,
+            claimed_at TIMESTAMP,
+            transcribe_attempts INTEGER DEFAULT 0,
+            reflect_attempts INTEGER DEFAULT 0,
+            store_attempts INTEGER DEFAULT 0,
+            deliver_attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            downloaded_at TIMESTAMP,
+            transcribed_at TIMESTAMP,
+            reflected_at TIMESTAMP,
+            stored_at TIMESTAMP,
+            delivered_at TIMESTAMP,
+            failed_at TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+    ]),
+    (3, "Index messages by user for history, date range and reference lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_created ON messages (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_messages_user_reference ON messages (user_id, reference_id)",
+        "CREATE INDEX IF NOT EXISTS idx_voice_jobs_stage ON voice_jobs (stage)",
+    ]),
+    (4, "Allocate reference IDs from a sequence", [
+        '''
+        CREATE TABLE IF NOT EXISTS sequences (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        ''',
+        # Start after the highest existing MSGn so old IDs never collide with new ones
+        '''
+        INSERT OR IGNORE INTO sequences (name, value)
+        SELECT 'reference_id', COALESCE(MAX(CAST(SUBSTR(reference_id, 4) AS INTEGER)), 0)
+        FROM messages
+        WHERE reference_id LIKE 'MSG%'
+        ''',
+    ]),
+    (5, "Full-text search index over transcriptions and reflections", [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            transcription,
+            claude_response,
+            content='messages',
+            content_rowid='id',
+            tokenize='porter unicode61 remove_diacritics 2'
+        )
+        ''',
+        # Keep the index in step with messages
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, transcription, claude_response)
+            VALUES (new.id, new.transcription, new.claude_response);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, transcription, claude_response)
+            VALUES ('delete', old.id, old.transcription, old.claude_response);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF transcription, claude_response ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, transcription, claude_response)
+            VALUES ('delete', old.id, old.transcription, old.claude_response);
+            INSERT INTO messages_fts (rowid, transcription, claude_response)
+            VALUES (new.id, new.transcription, new.claude_response);
+        END
+        ''',
+        # Rank matches in transcriptions above matches in reflections
+        "INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.5)')",
+        # Index the entries recorded before search existed
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ]),
+    (6, "Per-entry digests and memoized reviews", [
+        "ALTER TABLE messages ADD COLUMN digest TEXT",
+        '''
+        CREATE TABLE IF NOT EXISTS reviews (
+            cache_key TEXT PRIMARY KEY,
+            user_id INTEGER,
+            time_period TEXT,
+            reference_ids TEXT,
+            review TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_reviews_created ON reviews (created_at)",
+    ]),
+    (7, "Transcription cache keyed by Telegram file_unique_id", [
+        '''
+        CREATE TABLE IF NOT EXISTS transcription_cache (
+            file_unique_id TEXT PRIMARY KEY,
+            audio_sha256 TEXT,
+            audio_length FLOAT,
+            transcription TEXT,
+            claude_response TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_transcription_cache_sha256 ON transcription_cache (audio_sha256)",
+        "CREATE INDEX IF NOT EXISTS idx_transcription_cache_used ON transcription_cache (last_used_at)",
+        "ALTER TABLE voice_jobs ADD COLUMN file_unique_id TEXT",
+        "ALTER TABLE voice_jobs ADD COLUMN audio_sha256 TEXT",
+    ]),
+    (8, "Leases on voice job claims, so worker processes can take over each other's jobs", [
+        "ALTER TABLE voice_jobs ADD COLUMN lease_expires_at TIMESTAMP",
+    ]),
+    (9, "Full-text search without stemming, so prefix searches match", [
+        # Porter indexes "running" as "run", so "runn*" found nothing. The triggers
+        # from migration 5 are on messages and carry over to the new table
+        "DROP TABLE IF EXISTS messages_fts",
+        '''
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            transcription,
+            claude_response,
+            content='messages',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        "INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.5)')",
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ]),
+    (10, "Track how many of a job's result messages were sent, so a retried delivery doesn't repeat them", [
+        "ALTER TABLE voice_jobs ADD COLUMN delivered_messages INTEGER DEFAULT 0",
+    ]),
+    (11, "Index voice jobs and reviews by user, so deleting an entry finds its copies", [
+        "CREATE INDEX IF NOT EXISTS idx_voice_jobs_user_reference ON voice_jobs (user_id, reference_id)",
+        "CREATE INDEX IF NOT EXISTS idx_reviews_user ON reviews (user_id)",
+    ]),
+    (12, "Index each entry's user in full-text search, so a search only matches and ranks that user's entries", [
+        # A token like "user42" that searches add to their MATCH expression
+        "ALTER TABLE messages ADD COLUMN user_token TEXT GENERATED ALWAYS AS ('user' || user_id) VIRTUAL",
+        "DROP TRIGGER IF EXISTS messages_fts_insert",
+        "DROP TRIGGER IF EXISTS messages_fts_delete",
+        "DROP TRIGGER IF EXISTS messages_fts_update",
+        "DROP TABLE IF EXISTS messages_fts",
+        # user_token goes last, so snippets prefer the text columns
+        '''
+        CREATE VIRTUAL TABLE messages_fts USING fts5(
+            transcription,
+            claude_response,
+            user_token,
+            content='messages',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, transcription, claude_response, user_token)
+            VALUES (new.id, new.transcription, new.claude_response, new.user_token);
+        END
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, transcription, claude_response, user_token)
+            VALUES ('delete', old.id, old.transcription, old.claude_response, old.user_token);
+        END
+        ''',
+        '''
+        CREATE TRIGGER messages_fts_update AFTER UPDATE OF transcription, claude_response, user_id ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, transcription, claude_response, user_token)
+            VALUES ('delete', old.id, old.transcription, old.claude_response, old.user_token);
+            INSERT INTO messages_fts (rowid, transcription, claude_response, user_token)
+            VALUES (new.id, new.transcription, new.claude_response, new.user_token);
+        END
+        ''',
+        # The user token takes no part in ranking
+        "INSERT INTO messages_fts (messages_fts, rank) VALUES ('rank', 'bm25(1.0, 0.5, 0.0)')",
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+    ]),
+]
+
+def get_schema_version(conn):
+    """Get the version of the last migration applied to the database."""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations(conn):
+    """Apply every migration newer than the database's schema version.
+
+    Each migration runs in its own transaction, so a failure leaves the
+    database at the last version that applied cleanly.
+    """
+    current = get_schema_version(conn)
+    conn.commit()
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        # Another process (e.g. a worker starting alongside the bot) may have got here first
+        if get_schema_version(conn) >= version:
+            conn.rollback()
+            current = version
+            continue
+
+        logger.info(f"Applying migration {version}: {description}")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        current = version
+
+    return current
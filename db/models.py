@@ -1,28 +1,153 @@
+import re
 import sqlite3
 import random
+from collections import defaultdict, deque
 from datetime import datetime, timedelta
 import logging
-from db.database import get_connection
+from config import RANDOM_RECENT_EXCLUDE, PREVIEW_LENGTH
+from db.database import get_connection, transaction
 
 logger = logging.getLogger(__name__)
 
+# IDs of the messages each user was shown most recently by /random
+recently_shown = defaultdict(lambda: deque(maxlen=RANDOM_RECENT_EXCLUDE))
+
+# Queries that run on every command. db/query_plans.py checks that each one
+# is served by an index, so keep them here rather than inline.
+RECENT_MESSAGES_QUERY = '''
+SELECT reference_id, transcription, claude_response, created_at
+FROM messages
+WHERE user_id = ?
+ORDER BY created_at DESC
+LIMIT ?
+'''
+
+MESSAGE_BY_REFERENCE_QUERY = '''
+SELECT reference_id, transcription, claude_response, created_at
+FROM messages
+WHERE user_id = ? AND reference_id = ?
+'''
+
+# Both of these only touch the (user_id, created_at) index, which also
+# holds each row's id, so no message text is read while sampling
+RANDOM_CANDIDATES_COUNT_QUERY = '''
+SELECT COUNT(*)
+FROM messages
+WHERE user_id = ? AND created_at >= ? {exclusions}
+'''
+
+RANDOM_CANDIDATE_ID_QUERY = '''
+SELECT id
+FROM messages
+WHERE user_id = ? AND created_at >= ? {exclusions}
+ORDER BY created_at, id
+LIMIT 1 OFFSET ?
+'''
+
+MESSAGE_BY_ID_QUERY = '''
+SELECT reference_id, transcription, claude_response, created_at
+FROM messages
+WHERE id = ?
+'''
+
+MESSAGES_SINCE_QUERY = '''
+SELECT reference_id, transcription, claude_response, created_at
+FROM messages
+WHERE user_id = ? AND created_at >= ?
+ORDER BY created_at DESC
+'''
+
+# One page of /history or /weekly. Pages are keyed by the (created_at, id)
+# of the entry they continue from rather than an offset, so every page is a
+# single range read of the (user_id, created_at) index however far back it is.
+# Only the start of each transcription is read, one character more than is
+# shown so callers can tell whether it was cut short.
+MESSAGE_PAGE_QUERY = '''
+SELECT id, reference_id, substr(transcription, 1, ?), created_at
+FROM messages
+WHERE user_id = ? AND created_at >= ? {keyset}
+ORDER BY created_at {order}, id {order}
+LIMIT ?
+'''
+
+# Continue a page from an entry's (created_at, id). The row value bounds an older page's
+# index range, but not a newer one's next to the created_at >= ? bound, so get_message_page
+# starts that range at the cursor instead of walking up from the user's first entry
+PAGE_OLDER_KEYSET = "AND (created_at, id) < (?, ?)"
+PAGE_NEWER_KEYSET = "AND (created_at, id) > (?, ?)"
+
+# Snippet highlight markers; control characters never appear in transcriptions,
+# so callers can safely swap them for formatting after escaping the text
+SNIPPET_START = "\x02"
+SNIPPET_END = "\x03"
+
+# Match the user's token along with the search, so FTS5 only returns and ranks their entries
+# instead of every user's matches
+USER_SEARCH_MATCH = 'user_token : "user{user_id}" AND {{transcription claude_response}} : ({query})'
+
+SEARCH_MESSAGES_QUERY = '''
+SELECT m.reference_id, m.created_at,
+       snippet(messages_fts, -1, ?, ?, '…', 16)
+FROM messages_fts
+JOIN messages m ON m.id = messages_fts.rowid
+WHERE messages_fts MATCH ? AND m.user_id = ?
+ORDER BY rank
+LIMIT ?
+'''
+
+NEXT_REFERENCE_NUMBER_QUERY = '''
+UPDATE sequences SET value = value + 1 WHERE name = 'reference_id'
+'''
+
+CURRENT_REFERENCE_NUMBER_QUERY = '''
+SELECT value FROM sequences WHERE name = 'reference_id'
+'''
+
+DELETE_MESSAGE_QUERY = '''
+DELETE FROM messages
+WHERE user_id = ? AND reference_id = ?
+'''
+
+MESSAGE_TRANSCRIPTION_QUERY = '''
+SELECT transcription FROM messages
+WHERE user_id = ? AND reference_id = ?
+'''
+
+# The cache is keyed by audio, so find an entry's rows through its voice job; the
+# text match catches rows whose job has already been pruned
+DELETE_CACHED_TRANSCRIPTION_QUERY = '''
+DELETE FROM transcription_cache
+WHERE file_unique_id IN (SELECT file_unique_id FROM voice_jobs WHERE user_id = ? AND reference_id = ?)
+   OR audio_sha256 IN (SELECT audio_sha256 FROM voice_jobs WHERE user_id = ? AND reference_id = ?)
+   OR transcription = ?
+'''
+
+DELETE_VOICE_JOBS_QUERY = '''
+DELETE FROM voice_jobs
+WHERE user_id = ? AND reference_id = ?
+'''
+
+# Stored reviews list their entries' reference IDs comma-separated
+DELETE_REVIEWS_OF_MESSAGE_QUERY = '''
+DELETE FROM reviews
+WHERE user_id = ? AND ',' || reference_ids || ',' LIKE '%,' || ? || ',%'
+'''
+
 def store_message(user_id, transcription, claude_response, audio_length=None, voice_file_id=None):
     """Store a message in the database."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Generate a reference ID (e.g., MSG123)
-    cursor.execute("SELECT COUNT(*) FROM messages")
-    count = cursor.fetchone()[0]
-    reference_id = f"MSG{count+1}"
+    with transaction() as conn:
+        cursor = conn.cursor()
     
-    cursor.execute('''
-    INSERT INTO messages (reference_id, user_id, transcription, claude_response, audio_length, voice_file_id)
-    VALUES (?, ?, ?, ?, ?, ?)
-    ''', (reference_id, user_id, transcription, claude_response, audio_length, voice_file_id))
+        # Allocate the next reference ID (e.g., MSG123) inside the insert's
+        # transaction, so concurrent inserts and deletes can't reuse a number
+        cursor.execute(NEXT_REFERENCE_NUMBER_QUERY)
+        cursor.execute(CURRENT_REFERENCE_NUMBER_QUERY)
+        reference_id = f"MSG{cursor.fetchone()[0]}"
     
-    conn.commit()
-    conn.close()
+        cursor.execute('''
+        INSERT INTO messages (reference_id, user_id, transcription, claude_response, audio_length, voice_file_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (reference_id, user_id, transcription, claude_response, audio_length, voice_file_id))
     
     return reference_id
 
@@ -31,69 +156,101 @@ def get_recent_messages(user_id, limit=5):
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT reference_id, transcription, claude_response, created_at
-    FROM messages
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    LIMIT ?
-    ''', (user_id, limit))
-    
-    messages = cursor.fetchall()
-    conn.close()
+    cursor.execute(RECENT_MESSAGES_QUERY, (user_id, limit))
     
-    return messages
+    return cursor.fetchall()
 
 def get_message_by_reference(user_id, reference_id):
     """Get a specific message by its reference ID."""
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT reference_id, transcription, claude_response, created_at
-    FROM messages
-    WHERE user_id = ? AND reference_id = ?
-    ''', (user_id, reference_id))
-    
-    message = cursor.fetchone()
-    conn.close()
+    cursor.execute(MESSAGE_BY_REFERENCE_QUERY, (user_id, reference_id))
     
-    return message
+    return cursor.fetchone()
 
-def get_random_message(user_id):
-    """Get a random message for a user."""
+def get_random_message(user_id, since=None, avoid_recent=True):
+    """Get a random message for a user.
+    
+    Every candidate entry is equally likely. They are counted and one is
+    picked by its position, both on the (user_id, created_at) index, so no
+    message text is read but the entry picked and nothing is cached that
+    another process could make stale.
+    
+    Args:
+        user_id (int): The user to pick an entry for
+        since (datetime): Only consider entries created at or after this time
+        avoid_recent (bool): Skip entries recently returned for this user,
+            unless they are the only ones left
+    
+    Returns:
+        tuple: (reference_id, transcription, claude_response, created_at), or None
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT reference_id, transcription, claude_response, created_at
-    FROM messages
-    WHERE user_id = ?
-    ''', (user_id,))
+    # An empty string sorts before every timestamp, so it means "no limit"
+    since_str = since.strftime('%Y-%m-%d %H:%M:%S') if since else ""
     
-    messages = cursor.fetchall()
-    conn.close()
+    excluded = list(recently_shown[user_id]) if avoid_recent else []
+    message_id = pick_message_id(cursor, user_id, since_str, excluded)
+    if message_id is None and excluded:
+        # Every entry was shown recently, so show the one shown longest ago
+        placeholders = ", ".join("?" * len(excluded))
+        cursor.execute(
+            f"SELECT id FROM messages WHERE id IN ({placeholders}) AND user_id = ? AND created_at >= ?",
+            (*excluded, user_id, since_str)
+        )
+        matching = {row[0] for row in cursor.fetchall()}
+        # Most recently shown first, each entry once
+        by_recency = list(dict.fromkeys(shown for shown in reversed(excluded) if shown in matching))
+        message_id = pick_message_id(cursor, user_id, since_str, by_recency[:-1])
+    if message_id is None:
+        # No entries, or deleted between counting and picking
+        return None
     
-    if not messages:
+    recently_shown[user_id].append(message_id)
+    
+    cursor.execute(MESSAGE_BY_ID_QUERY, (message_id,))
+    return cursor.fetchone()
+
+def pick_message_id(cursor, user_id, since_str, excluded):
+    """Get the ID of a uniformly random entry of a user's since since_str, skipping excluded IDs."""
+    exclusions = f"AND id NOT IN ({', '.join('?' * len(excluded))})" if excluded else ""
+    cursor.execute(RANDOM_CANDIDATES_COUNT_QUERY.format(exclusions=exclusions), (user_id, since_str, *excluded))
+    count = cursor.fetchone()[0]
+    if not count:
         return None
     
-    return random.choice(messages)
+    cursor.execute(
+        RANDOM_CANDIDATE_ID_QUERY.format(exclusions=exclusions),
+        (user_id, since_str, *excluded, random.randrange(count))
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
 
 def delete_message(user_id, reference_id):
-    """Delete a specific message by its reference ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-    DELETE FROM messages
-    WHERE user_id = ? AND reference_id = ?
-    ''', (user_id, reference_id))
+    """Delete a specific message by its reference ID, with every other copy of its text.
     
-    deleted = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
+    The transcription cache rows, voice jobs and stored reviews holding the
+    entry's text go in the same transaction, so nothing can bring it back.
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute(MESSAGE_TRANSCRIPTION_QUERY, (user_id, reference_id))
+        row = cursor.fetchone()
+        if row is None:
+            return False
+        
+        cursor.execute(
+            DELETE_CACHED_TRANSCRIPTION_QUERY, (user_id, reference_id, user_id, reference_id, row[0])
+        )
+        cursor.execute(DELETE_VOICE_JOBS_QUERY, (user_id, reference_id))
+        cursor.execute(DELETE_REVIEWS_OF_MESSAGE_QUERY, (user_id, reference_id))
+        cursor.execute(DELETE_MESSAGE_QUERY, (user_id, reference_id))
     
-    return deleted
+    return True
 
 def get_weekly_messages(user_id):
     """Get all messages from the past week for a user."""
@@ -104,17 +261,9 @@ def get_weekly_messages(user_id):
     one_week_ago = datetime.now() - timedelta(days=7)
     one_week_ago_str = one_week_ago.strftime('%Y-%m-%d %H:%M:%S')
     
-    cursor.execute('''
-    SELECT reference_id, transcription, claude_response, created_at
-    FROM messages
-    WHERE user_id = ? AND created_at >= ?
-    ORDER BY created_at DESC
-    ''', (user_id, one_week_ago_str))
+    cursor.execute(MESSAGES_SINCE_QUERY, (user_id, one_week_ago_str))
     
-    messages = cursor.fetchall()
-    conn.close()
-    
-    return messages
+    return cursor.fetchall()
 
 def get_today_messages(user_id):
     """Get all messages from today for a user."""
@@ -125,14 +274,136 @@ def get_today_messages(user_id):
     today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
     today_start_str = today_start.strftime('%Y-%m-%d %H:%M:%S')
     
-    cursor.execute('''
-    SELECT reference_id, transcription, claude_response, created_at
-    FROM messages
-    WHERE user_id = ? AND created_at >= ?
-    ORDER BY created_at DESC
-    ''', (user_id, today_start_str))
+    cursor.execute(MESSAGES_SINCE_QUERY, (user_id, today_start_str))
+    
+    return cursor.fetchall()
+
+def get_active_user_ids(since):
+    """Get the IDs of the users with at least one message created at or after since."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Only needs the (user_id, created_at) index, not the messages themselves
+    cursor.execute(
+        "SELECT DISTINCT user_id FROM messages WHERE created_at >= ?",
+        (since.strftime('%Y-%m-%d %H:%M:%S'),)
+    )
+    
+    return [row[0] for row in cursor.fetchall()]
+
+def build_page_query(user_id, since=None, before=None, after=None, limit=5):
+    """Build the query and parameters for get_message_page.
+    
+    Returns:
+        tuple: (query, parameters), fetching one extra row to tell whether there is
+        another page in the same direction
+    """
+    since_str = since.strftime('%Y-%m-%d %H:%M:%S') if since else ""
+    cursor_values = ()
+    if after:
+        keyset, order, cursor_values = PAGE_NEWER_KEYSET, "ASC", after
+        # Newer entries can't predate the cursor, so seek straight to it
+        since_str = max(since_str, after[0])
+    elif before:
+        keyset, order, cursor_values = PAGE_OLDER_KEYSET, "DESC", before
+    else:
+        keyset, order = "", "DESC"
+    
+    return (
+        MESSAGE_PAGE_QUERY.format(keyset=keyset, order=order),
+        (PREVIEW_LENGTH + 1, user_id, since_str, *cursor_values, limit + 1)
+    )
+
+def get_message_page(user_id, since=None, before=None, after=None, limit=5):
+    """Get one page of a user's entry previews, newest first.
+    
+    Args:
+        user_id (int): The user whose entries to list
+        since (datetime): Only list entries created at or after this time
+        before (tuple): (created_at, id) of an entry; get the page of older entries after it
+        after (tuple): (created_at, id) of an entry; get the page of newer entries before it
+        limit (int): Entries per page
+    
+    Returns:
+        tuple: (rows, has_older, has_newer), where rows are
+        (id, reference_id, preview, created_at) and preview is at most
+        PREVIEW_LENGTH + 1 characters
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(*build_page_query(user_id, since, before, after, limit))
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    if after:
+        # Read oldest first to stay next to the cursor; show newest first like every page
+        rows.reverse()
+        return rows, True, has_more
+    return rows, has_more, before is not None
+
+def build_search_query(text):
+    """Turn user search text into a safe FTS5 query.
+    
+    Words are matched individually (all must appear), "quoted phrases" are
+    matched as phrases and a trailing * makes a word a prefix search.
+    Everything is quoted, so FTS5 syntax in the input can't cause errors.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        if phrase:
+            terms.append('"' + phrase.replace('"', '') + '"')
+        elif word:
+            prefix = word.endswith("*")
+            word = word.rstrip("*").replace('"', '')
+            if word:
+                terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search_messages(user_id, text, limit=10):
+    """Search a user's entries, best matches first.
+    
+    Returns:
+        list: (reference_id, created_at, snippet) tuples, where the matched
+        words in the snippet are wrapped in SNIPPET_START and SNIPPET_END
+    """
+    query = build_search_query(text)
+    if not query:
+        return []
+    
+    conn = get_connection()
+    cursor = conn.cursor()
     
-    messages = cursor.fetchall()
-    conn.close()
+    match = USER_SEARCH_MATCH.format(user_id=int(user_id), query=query)
+    cursor.execute(SEARCH_MESSAGES_QUERY, (SNIPPET_START, SNIPPET_END, match, user_id, limit))
     
-    return messages 
\ No newline at end of file
+    return cursor.fetchall()
+
+def get_message_digests(user_id, reference_ids):
+    """Get the stored digests for a user's entries.
+    
+    Returns:
+        dict: reference_id -> digest, for the entries that have one
+    """
+    if not reference_ids:
+        return {}
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    placeholders = ", ".join("?" * len(reference_ids))
+    cursor.execute(f'''
+    SELECT reference_id, digest
+    FROM messages
+    WHERE user_id = ? AND reference_id IN ({placeholders}) AND digest IS NOT NULL
+    ''', (user_id, *reference_ids))
+    
+    return dict(cursor.fetchall())
+
+def store_message_digest(user_id, reference_id, digest):
+    """Store the digest of an entry, used to build reviews."""
+    with transaction() as conn:
+        conn.execute('''
+        UPDATE messages SET digest = ?
+        WHERE user_id = ? AND reference_id = ?
+        ''', (digest, user_id, reference_id))
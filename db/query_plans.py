@@ -0,0 +1,190 @@
+"""Check that the bot's hot queries are served by indexes.
+
+Builds a fresh in-memory database from the migrations, runs EXPLAIN QUERY PLAN
+on every query in HOT_QUERIES and fails if any of them scans a table or sorts
+its results in a temporary B-tree. Full-text MATCH lookups are allowed.
+
+An index can still be walked from the wrong end, so it also fills in a long
+history and checks that turning a page costs the same next to its oldest
+and newest entries. Finally it checks that searches find what they should,
+including prefixes longer than a word's stem, and nothing of another user's.
+
+Usage:
+    python -m db.query_plans
+"""
+import sys
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+
+from db.migrations import run_migrations
+from db import models, transcription_cache
+
+logger = logging.getLogger(__name__)
+
+# Entries in the history the page seek check turns pages through
+PAGE_SEEK_ENTRIES = 5000
+
+# An entry for the search check, and searches -> whether each should find it
+SEARCH_ENTRY = ("Went running before work and felt real happiness afterwards", "Exercise lifts your mood.")
+SEARCH_CHECKS = {
+    "running": True,
+    "runn*": True,
+    "happin*": True,
+    '"felt real happiness"': True,
+    "mood": True,
+    "run": False,
+}
+
+# name -> (query, example parameters)
+HOT_QUERIES = {
+    "get_recent_messages": (models.RECENT_MESSAGES_QUERY, (1, 5)),
+    "get_message_by_reference": (models.MESSAGE_BY_REFERENCE_QUERY, (1, "MSG1")),
+    "get_random_message (count)": (
+        models.RANDOM_CANDIDATES_COUNT_QUERY.format(exclusions="AND id NOT IN (?, ?)"), (1, "", 1, 2)
+    ),
+    "get_random_message (pick)": (
+        models.RANDOM_CANDIDATE_ID_QUERY.format(exclusions="AND id NOT IN (?, ?)"), (1, "", 1, 2, 10)
+    ),
+    "get_random_message (fetch)": (models.MESSAGE_BY_ID_QUERY, (1,)),
+    "get_weekly_messages / get_today_messages": (models.MESSAGES_SINCE_QUERY, (1, "2024-01-01 00:00:00")),
+    "get_message_page (first)": (models.MESSAGE_PAGE_QUERY.format(keyset="", order="DESC"), (51, 1, "", 6)),
+    "get_message_page (older)": (
+        models.MESSAGE_PAGE_QUERY.format(keyset=models.PAGE_OLDER_KEYSET, order="DESC"),
+        (51, 1, "", "2024-01-01 00:00:00", 10, 6)
+    ),
+    "get_message_page (newer)": (
+        models.MESSAGE_PAGE_QUERY.format(keyset=models.PAGE_NEWER_KEYSET, order="ASC"),
+        (51, 1, "2024-01-01 00:00:00", "2024-01-01 00:00:00", 10, 6)
+    ),
+    "delete_message": (models.DELETE_MESSAGE_QUERY, (1, "MSG1")),
+    "delete_message (voice jobs)": (models.DELETE_VOICE_JOBS_QUERY, (1, "MSG1")),
+    "delete_message (reviews)": (models.DELETE_REVIEWS_OF_MESSAGE_QUERY, (1, "MSG1")),
+    "search_messages": (
+        models.SEARCH_MESSAGES_QUERY, ("[", "]", models.USER_SEARCH_MATCH.format(user_id=1, query='"word"'), 1, 10)
+    ),
+    "store_message (allocate reference ID)": (models.NEXT_REFERENCE_NUMBER_QUERY, ()),
+    "store_message (read reference ID)": (models.CURRENT_REFERENCE_NUMBER_QUERY, ()),
+    "get_cached_transcription (file)": (transcription_cache.CACHE_BY_FILE_QUERY, ("AgAD",)),
+    "get_cached_transcription (audio hash)": (transcription_cache.CACHE_BY_HASH_QUERY, ("0" * 64,)),
+}
+
+def explain(conn, query, params):
+    """Get the EXPLAIN QUERY PLAN detail lines for a query."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [row[3] for row in rows]
+
+def is_full_text_lookup(line):
+    """Check whether a plan line is an FTS5 MATCH lookup, which EXPLAIN reports as a SCAN."""
+    return "VIRTUAL TABLE INDEX" in line and ":M" in line
+
+def find_plan_problems(detail_lines):
+    """Return the plan lines that show a full scan or a sort."""
+    return [
+        line for line in detail_lines
+        if (line.startswith("SCAN") and not is_full_text_lookup(line)) or "USE TEMP B-TREE" in line
+    ]
+
+def count_steps(conn, query, params):
+    """Count the virtual machine instructions SQLite runs for a query."""
+    steps = 0
+
+    def step():
+        nonlocal steps
+        steps += 1
+
+    conn.set_progress_handler(step, 1)
+    try:
+        conn.execute(query, params).fetchall()
+    finally:
+        conn.set_progress_handler(None, 0)
+    return steps
+
+def check_page_seeks(entries=PAGE_SEEK_ENTRIES):
+    """Check that page queries seek to their cursor, on a scratch database, and return a dict of name -> problem."""
+    conn = sqlite3.connect(":memory:")
+    run_migrations(conn)
+    user_id = 1
+    start = datetime(2024, 1, 1)
+    with conn:
+        conn.executemany(
+            "INSERT INTO messages (reference_id, user_id, transcription, claude_response, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (f"MSG{i + 1}", user_id, "", "", (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S'))
+                for i in range(entries)
+            ]
+        )
+    cursors = conn.execute(
+        "SELECT created_at, id FROM messages WHERE user_id = ? ORDER BY created_at, id", (user_id,)
+    ).fetchall()
+    oldest, newest = cursors[10], cursors[-10]
+
+    pages = {
+        "get_message_page (older)": lambda cursor: models.build_page_query(user_id, before=cursor),
+        "get_message_page (newer)": lambda cursor: models.build_page_query(user_id, after=cursor),
+    }
+    problems = {}
+    for name, build_query in pages.items():
+        near_oldest = count_steps(conn, *build_query(oldest))
+        near_newest = count_steps(conn, *build_query(newest))
+        logger.info(f"{name}: {near_oldest} steps next to the oldest entry, {near_newest} next to the newest")
+        if max(near_oldest, near_newest) > 2 * min(near_oldest, near_newest):
+            problems[name] = [f"{near_oldest} steps next to the oldest of {entries} entries, {near_newest} next to the newest"]
+    return problems
+
+def check_search(checks=SEARCH_CHECKS):
+    """Run each search in checks against SEARCH_ENTRY on a scratch database, and return a dict of name -> problem.
+
+    Another user holds the same entry, and each search should only ever find the searching user's copy.
+    """
+    conn = sqlite3.connect(":memory:")
+    run_migrations(conn)
+    user_id, other_user_id = 1, 2
+    with conn:
+        conn.executemany(
+            "INSERT INTO messages (reference_id, user_id, transcription, claude_response) VALUES (?, ?, ?, ?)",
+            [("MSG1", user_id, *SEARCH_ENTRY), ("MSG2", other_user_id, *SEARCH_ENTRY)]
+        )
+
+    problems = {}
+    for text, should_match in checks.items():
+        match = models.USER_SEARCH_MATCH.format(user_id=user_id, query=models.build_search_query(text))
+        found = [row[0] for row in conn.execute(models.SEARCH_MESSAGES_QUERY, ("[", "]", match, user_id, 10))]
+        logger.info(f"search {text}: {'found' if found else 'not found'}")
+        if bool(found) != should_match:
+            problems[f"search_messages ({text})"] = [f"{'found' if found else 'did not find'} {SEARCH_ENTRY[0]!r}"]
+        elif found != ["MSG1"] * bool(found):
+            problems[f"search_messages ({text})"] = [f"found {found}, including another user's entries"]
+    return problems
+
+def check_query_plans(conn=None):
+    """Check every hot query and return a dict of name -> problem plan lines."""
+    if conn is None:
+        conn = sqlite3.connect(":memory:")
+        run_migrations(conn)
+
+    problems = {}
+    for name, (query, params) in HOT_QUERIES.items():
+        plan = explain(conn, query, params)
+        bad_lines = find_plan_problems(plan)
+        if bad_lines:
+            problems[name] = bad_lines
+        logger.info(f"{name}: {'; '.join(plan)}")
+    problems.update(check_page_seeks())
+    problems.update(check_search())
+    return problems
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    problems = check_query_plans()
+    if problems:
+        for name, lines in problems.items():
+            print(f"FAIL {name}: {'; '.join(lines)}")
+        return 1
+
+    print(f"OK: all {len(HOT_QUERIES)} hot queries use an index, pages seek to their cursor and searches match")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
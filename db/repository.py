@@ -0,0 +1,151 @@
+"""Async access to the database for the bot's handlers.
+
+Every call runs on a single dedicated database thread, so a slow query or a
+writer waiting on the lock never blocks the event loop. The functions mirror
+db/models but return Message and SearchResult objects instead of tuples.
+"""
+import asyncio
+import logging
+import functools
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PREVIEW_LENGTH
+from db import models
+
+logger = logging.getLogger(__name__)
+
+# Initialize the database thread
+executor = None
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    """A journal entry."""
+    reference_id: str
+    transcription: str
+    claude_response: str
+    created_at: str
+
+    @property
+    def date_str(self):
+        """The creation time without fractional seconds, for display."""
+        return self.created_at.split('.')[0]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row) if row else None
+
+@dataclass(frozen=True, slots=True)
+class SearchResult:
+    """A search match, with the matched words in snippet wrapped in SNIPPET_START and SNIPPET_END."""
+    reference_id: str
+    created_at: str
+    snippet: str
+
+    @property
+    def date_str(self):
+        return self.created_at.split('.')[0]
+
+@dataclass(frozen=True, slots=True)
+class MessagePreview:
+    """The start of an entry, for listing."""
+    id: int
+    reference_id: str
+    preview: str
+    created_at: str
+
+    @property
+    def date_str(self):
+        return self.created_at.split('.')[0]
+
+    @property
+    def short_transcription(self):
+        """The preview, with "..." if the transcription goes on."""
+        if len(self.preview) > PREVIEW_LENGTH:
+            return self.preview[:PREVIEW_LENGTH] + "..."
+        return self.preview
+
+    @property
+    def cursor(self):
+        """The (created_at, id) key that pages continue from."""
+        return (self.created_at, self.id)
+
+@dataclass(frozen=True, slots=True)
+class MessagePage:
+    """One page of a user's entries, newest first."""
+    entries: list
+    has_older: bool
+    has_newer: bool
+
+def get_executor():
+    """Get the database thread, starting it if necessary."""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        logger.info("Database thread started")
+    return executor
+
+async def run_db(fn, *args, **kwargs):
+    """Run a synchronous database function on the database thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+def shutdown():
+    """Finish queued database calls and stop the database thread."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=True)
+        executor = None
+
+async def store_message(user_id, transcription, claude_response, audio_length=None, voice_file_id=None):
+    """Store a message and return its reference ID."""
+    return await run_db(models.store_message, user_id, transcription, claude_response, audio_length, voice_file_id)
+
+async def get_recent_messages(user_id, limit=5):
+    """Get a user's most recent messages, newest first."""
+    rows = await run_db(models.get_recent_messages, user_id, limit)
+    return [Message.from_row(row) for row in rows]
+
+async def get_message_by_reference(user_id, reference_id):
+    """Get a specific message by its reference ID, or None."""
+    return Message.from_row(await run_db(models.get_message_by_reference, user_id, reference_id))
+
+async def get_random_message(user_id, since=None, avoid_recent=True):
+    """Get a random message for a user, or None."""
+    return Message.from_row(await run_db(models.get_random_message, user_id, since, avoid_recent))
+
+async def delete_message(user_id, reference_id):
+    """Delete a specific message by its reference ID. Returns True if it existed."""
+    return await run_db(models.delete_message, user_id, reference_id)
+
+async def get_weekly_messages(user_id):
+    """Get all messages from the past week for a user, newest first."""
+    rows = await run_db(models.get_weekly_messages, user_id)
+    return [Message.from_row(row) for row in rows]
+
+async def get_today_messages(user_id):
+    """Get all messages from today for a user, newest first."""
+    rows = await run_db(models.get_today_messages, user_id)
+    return [Message.from_row(row) for row in rows]
+
+async def get_active_user_ids(since):
+    """Get the IDs of the users with entries created at or after since."""
+    return await run_db(models.get_active_user_ids, since)
+
+async def get_message_page(user_id, since=None, before=None, after=None, limit=5):
+    """Get the page of entries older than the before cursor, newer than the after cursor, or the newest page."""
+    rows, has_older, has_newer = await run_db(models.get_message_page, user_id, since, before, after, limit)
+    return MessagePage([MessagePreview(*row) for row in rows], has_older, has_newer)
+
+async def search_messages(user_id, text, limit=10):
+    """Search a user's entries, best matches first."""
+    rows = await run_db(models.search_messages, user_id, text, limit)
+    return [SearchResult(*row) for row in rows]
+
+async def get_message_digests(user_id, reference_ids):
+    """Get the stored digests for a user's entries, as a dict of reference_id -> digest."""
+    return await run_db(models.get_message_digests, user_id, reference_ids)
+
+async def store_message_digest(user_id, reference_id, digest):
+    """Store the digest of an entry."""
+    await run_db(models.store_message_digest, user_id, reference_id, digest)
@@ -0,0 +1,40 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from db.database import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+def make_review_key(user_id, time_period, reference_ids):
+    """Build the key a review is memoized under: the user, the period and the exact set of entries."""
+    entries = ",".join(sorted(reference_ids))
+    return hashlib.sha256(f"{user_id}|{time_period}|{entries}".encode()).hexdigest()
+
+def get_stored_review(cache_key):
+    """Get a previously generated review, or None."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT review FROM reviews WHERE cache_key = ?", (cache_key,))
+
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def store_review(cache_key, user_id, time_period, reference_ids, review):
+    """Store a generated review under its key."""
+    with transaction() as conn:
+        conn.execute('''
+        INSERT OR REPLACE INTO reviews (cache_key, user_id, time_period, reference_ids, review, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (cache_key, user_id, time_period, ",".join(reference_ids), review,
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+def prune_reviews(days):
+    """Delete stored reviews older than the given number of days."""
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM reviews WHERE created_at < ?", (cutoff,))
+        pruned = cursor.rowcount
+
+    return pruned
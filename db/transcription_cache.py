@@ -0,0 +1,87 @@
+import logging
+from datetime import datetime, timedelta
+from db.database import get_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_BY_FILE_QUERY = '''
+SELECT file_unique_id, transcription, claude_response
+FROM transcription_cache
+WHERE file_unique_id = ?
+'''
+
+CACHE_BY_HASH_QUERY = '''
+SELECT file_unique_id, transcription, claude_response
+FROM transcription_cache
+WHERE audio_sha256 = ?
+LIMIT 1
+'''
+
+# Least recently used entries beyond the size limit
+EVICT_OVERFLOW_QUERY = '''
+DELETE FROM transcription_cache WHERE file_unique_id IN (
+    SELECT file_unique_id FROM transcription_cache
+    ORDER BY last_used_at DESC
+    LIMIT -1 OFFSET ?
+)
+'''
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def get_cached_transcription(file_unique_id=None, audio_sha256=None):
+    """Look up a cached transcription by Telegram file_unique_id or by audio hash.
+
+    Returns:
+        tuple: (transcription, claude_response), claude_response possibly None,
+        or None if nothing is cached
+    """
+    if file_unique_id:
+        row = get_connection().execute(CACHE_BY_FILE_QUERY, (file_unique_id,)).fetchone()
+    elif audio_sha256:
+        row = get_connection().execute(CACHE_BY_HASH_QUERY, (audio_sha256,)).fetchone()
+    else:
+        return None
+
+    if row is None:
+        return None
+
+    key, transcription, claude_response = row
+    with transaction() as conn:
+        conn.execute("UPDATE transcription_cache SET last_used_at = ? WHERE file_unique_id = ?", (_now(), key))
+
+    logger.info(f"Transcription cache hit for {'file' if file_unique_id else 'audio hash'} {file_unique_id or audio_sha256[:12]}")
+    return transcription, claude_response
+
+def cache_transcription(file_unique_id, audio_sha256, audio_length, transcription, max_entries):
+    """Cache a note's transcription, evicting the least recently used entries beyond max_entries."""
+    now = _now()
+    with transaction() as conn:
+        conn.execute('''
+        INSERT INTO transcription_cache (file_unique_id, audio_sha256, audio_length, transcription, created_at, last_used_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (file_unique_id) DO UPDATE SET
+            audio_sha256 = COALESCE(excluded.audio_sha256, audio_sha256),
+            transcription = excluded.transcription,
+            claude_response = NULL,
+            last_used_at = excluded.last_used_at
+        ''', (file_unique_id, audio_sha256, audio_length, transcription, now, now))
+        conn.execute(EVICT_OVERFLOW_QUERY, (max_entries,))
+
+def cache_reflection(file_unique_id, claude_response):
+    """Add the reflection to a cached transcription."""
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE transcription_cache SET claude_response = ? WHERE file_unique_id = ?",
+            (claude_response, file_unique_id)
+        )
+
+def prune_transcription_cache(days):
+    """Delete cache entries that haven't been used for the given number of days."""
+    cutoff = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+    with transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM transcription_cache WHERE last_used_at < ?", (cutoff,))
+        pruned = cursor.rowcount
+
+    return pruned
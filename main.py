@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
+import asyncio
 import logging
 from telegram.ext import Application
 
-from config import TELEGRAM_BOT_TOKEN
-from db.database import init_db
+from config import (
+    TELEGRAM_BOT_TOKEN, TELEGRAM_RATE_LIMIT, WHISPER_WARMUP, METRICS_HOST, METRICS_PORT, BOT_MODE, WEBHOOK_URL,
+    CONCURRENT_UPDATES, PIPELINE_MODE, REVIEW_PRECOMPUTE
+)
+from db.database import init_db, close_connections
+from db import repository
 from bot.handlers import setup_handlers
+from bot.voice_processing import resume_voice_jobs, finish_voice_jobs
+from bot.webhook import serve_webhook
+from bot.review_schedule import schedule_review_precompute
+from services.whisper_service import start_warm_up
+from utils.metrics import start_metrics_server
+from utils.send_scheduler import SendScheduler
 from utils.logging import setup_logging
 from pathlib import Path
 
@@ -15,6 +26,13 @@ def main():
     logger = logging.getLogger(__name__)
     logger.info("Starting Telegram Voice Journaling Bot")
     
+    if BOT_MODE not in ("polling", "webhook"):
+        raise SystemExit(f"BOT_MODE must be \"polling\" or \"webhook\", not \"{BOT_MODE}\"")
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise SystemExit("WEBHOOK_URL must be set when BOT_MODE=webhook")
+    if PIPELINE_MODE not in ("inline", "worker"):
+        raise SystemExit(f"PIPELINE_MODE must be \"inline\" or \"worker\", not \"{PIPELINE_MODE}\"")
+    
     # Create necessary directories
     Path("voice_notes").mkdir(exist_ok=True)
     
@@ -22,16 +40,52 @@ def main():
     init_db()
     logger.info("Database initialized")
     
-    # Create the Application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # Load the Whisper models in the background so the first voice note doesn't wait for them.
+    # In worker mode the workers load them instead.
+    if WHISPER_WARMUP and PIPELINE_MODE == "inline":
+        start_warm_up()
+    
+    # Optionally expose metrics for Prometheus to scrape
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+    
+    # Create the Application, resuming any voice notes interrupted by the last shutdown
+    # and letting the ones in progress finish at the next
+    builder = (
+        Application.builder().token(TELEGRAM_BOT_TOKEN)
+        .post_init(resume_voice_jobs)
+        .post_stop(finish_voice_jobs)
+    )
+    
+    # Pace outgoing messages and edits to stay under Telegram's flood limits
+    if TELEGRAM_RATE_LIMIT:
+        builder = builder.rate_limiter(SendScheduler())
+    
+    # Handle several updates at once, so a voice note waiting on Whisper or Claude
+    # doesn't hold up other chats' commands (or other voice notes joining the queue)
+    builder = builder.concurrent_updates(CONCURRENT_UPDATES)
+    
+    application = builder.build()
     
     # Setup command and message handlers
     setup_handlers(application)
     logger.info("Handlers registered")
     
+    # Have reviews ready before people ask for them
+    if REVIEW_PRECOMPUTE:
+        schedule_review_precompute(application)
+    
     # Start the Bot
-    logger.info("Bot started, polling for updates...")
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        logger.info("Bot started, receiving updates by webhook...")
+        asyncio.run(serve_webhook(application))
+    else:
+        logger.info("Bot started, polling for updates...")
+        application.run_polling()
+    
+    # Finish pending database calls, then checkpoint the WAL and release the database
+    repository.shutdown()
+    close_connections()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
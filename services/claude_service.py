@@ -1,43 +1,209 @@
+import time
+import asyncio
 import logging
 import anthropic
-from config import ANTHROPIC_API_KEY, CLAUDE_MODEL, CLAUDE_MAX_TOKENS, CLAUDE_TEMPERATURE, CLAUDE_REVIEW_MAX_TOKENS
+from config import (
+    ANTHROPIC_API_KEY, CLAUDE_MODEL, CLAUDE_MAX_TOKENS, CLAUDE_TEMPERATURE,
+    CLAUDE_REVIEW_MAX_TOKENS, CLAUDE_DIGEST_MAX_TOKENS, CLAUDE_INPUT_TOKEN_BUDGET,
+    CLAUDE_CHUNK_TOKENS, CLAUDE_CHUNK_SUMMARY_MAX_TOKENS, CLAUDE_CHUNK_CONCURRENCY, REVIEW_BATCH_POLL_INTERVAL,
+    REVIEW_BATCH_TIMEOUT, REVIEW_BATCH_MAX_REQUESTS
+)
+from utils.text import split_text
+from utils.metrics import metrics, record_error
 
 logger = logging.getLogger(__name__)
 
 # Initialize Claude client
 client = None
 
-# Claude has a context window limit, so we need to limit the transcription length
-# Claude 3 Haiku has a 200K context window, but we'll be conservative
-MAX_TRANSCRIPTION_LENGTH = 32000  # Characters, not tokens
+# Used to estimate token counts without an API call. No tokenizer produces
+# more than one token per character, so text no longer than the budget in
+# characters always fits.
+MIN_CHARS_PER_TOKEN = 1
+ESTIMATED_CHARS_PER_TOKEN = 3
+
+# Rounds of chunk summarization before falling back to cutting text off
+MAX_SUMMARY_ROUNDS = 3
+
+# Start of the reply sent instead of a reflection when Claude fails
+REFLECTION_ERROR = "I transcribed your message, but couldn't generate reflections (Claude API error)."
 
 def get_client():
     """Get the Claude client, initializing it if necessary."""
     global client
     if client is None:
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+        client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
         logger.info("Claude client initialized")
     return client
 
-def truncate_transcription(transcription):
-    """Truncate transcription if it's too long for Claude."""
-    if len(transcription) <= MAX_TRANSCRIPTION_LENGTH:
-        return transcription
+def log_usage(prompt_type, message, elapsed):
+    """Log and record the token usage and latency of a Claude call."""
+    usage = message.usage
+    metrics.observe("claude_request_seconds", elapsed, prompt_type=prompt_type)
+    metrics.increment("claude_input_tokens_total", usage.input_tokens, prompt_type=prompt_type)
+    metrics.increment("claude_output_tokens_total", usage.output_tokens, prompt_type=prompt_type)
+    logger.info(
+        f"Claude {prompt_type}: {usage.input_tokens} input tokens, "
+        f"{usage.output_tokens} output tokens, {elapsed:.2f} seconds"
+    )
+
+async def create_message(prompt_type, **params):
+    """Create a Claude message, log its usage and return its text."""
+    start = time.time()
+    message = await get_client().messages.create(**params)
+    log_usage(prompt_type, message, time.time() - start)
+    return message.content[0].text
+
+async def stream_message(prompt_type, on_text=None, **params):
+    """Stream a Claude message, log its usage and return its text.
+    
+    If on_text is given, it is awaited with the text generated so far each
+    time new tokens arrive.
+    """
+    client = get_client()
+    parts = []
+    start = time.time()
+    
+    async with client.messages.stream(**params) as stream:
+        async for text in stream.text_stream:
+            parts.append(text)
+            if on_text is not None:
+                await on_text("".join(parts))
+        message = await stream.get_final_message()
+    
+    log_usage(prompt_type, message, time.time() - start)
+    return message.content[0].text
+
+async def run_batch(prompt_type, requests, keep_waiting=None):
+    """Send requests through the Message Batches API and wait for their results.
+    
+    Batches cost half as much as the same requests made one by one, but may
+    take minutes or hours to finish, so this is for work nobody is waiting
+    on. Batches still running after REVIEW_BATCH_TIMEOUT seconds, or once
+    keep_waiting() returns False, are cancelled.
+    
+    Args:
+        prompt_type (str): What the requests are for, used in logs and metrics
+        requests (dict): Messages API parameters by custom ID
+        keep_waiting (callable): Checked between polls; return False to give up
+    
+    Returns:
+        dict: The text of each request that succeeded, by custom ID
+    """
+    client = get_client()
+    custom_ids = list(requests)
+    results = {}
+    
+    for first in range(0, len(custom_ids), REVIEW_BATCH_MAX_REQUESTS):
+        batch_ids = custom_ids[first:first + REVIEW_BATCH_MAX_REQUESTS]
+        start = time.time()
+        batch = await client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": requests[custom_id]} for custom_id in batch_ids]
+        )
+        logger.info(f"Submitted {prompt_type} batch {batch.id} with {len(batch_ids)} requests")
+        
+        while batch.processing_status != "ended":
+            if time.time() - start > REVIEW_BATCH_TIMEOUT or (keep_waiting is not None and not keep_waiting()):
+                logger.warning(f"Cancelling {prompt_type} batch {batch.id} before it finished")
+                await client.messages.batches.cancel(batch.id)
+                return results
+            await asyncio.sleep(REVIEW_BATCH_POLL_INTERVAL)
+            batch = await client.messages.batches.retrieve(batch.id)
+        
+        elapsed = time.time() - start
+        async for entry in await client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                log_usage(f"{prompt_type} batch", entry.result.message, elapsed)
+                results[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                record_error("claude")
+                logger.warning(f"{prompt_type} batch request {entry.custom_id} {entry.result.type}")
+        
+        counts = batch.request_counts
+        logger.info(
+            f"{prompt_type} batch {batch.id} finished in {elapsed:.0f} seconds: {counts.succeeded} succeeded, "
+            f"{counts.errored} errored, {counts.expired} expired"
+        )
+    
+    return results
+
+async def count_tokens(text):
+    """Count the tokens Claude sees in text.
+    
+    Short text is assumed to fit without asking the API. If the token
+    counting endpoint fails, a rough estimate is used instead.
+    """
+    if len(text) // MIN_CHARS_PER_TOKEN <= CLAUDE_INPUT_TOKEN_BUDGET:
+        return len(text) // MIN_CHARS_PER_TOKEN
+    
+    try:
+        result = await get_client().messages.count_tokens(
+            model=CLAUDE_MODEL,
+            messages=[{"role": "user", "content": text}]
+        )
+        return result.input_tokens
+    except Exception as e:
+        logger.warning(f"Token counting failed, estimating instead: {str(e)}")
+        return len(text) // ESTIMATED_CHARS_PER_TOKEN
+
+async def summarize_chunk(chunk, index, total, prompt_type):
+    """Summarize one part of an over-long text."""
+    prompt = f"""This is part {index} of {total} of a long journal text that is too long to process in one go.
+Summarize this part faithfully and in detail, in the same voice as the original.
+Keep topics, feelings, events, names, decisions and open questions. Don't add commentary.
+
+Part {index} of {total}:
+{chunk}"""
+
+    return await create_message(
+        f"{prompt_type} chunk",
+        model=CLAUDE_MODEL,
+        max_tokens=CLAUDE_CHUNK_SUMMARY_MAX_TOKENS,
+        temperature=0,
+        system="You are a precise assistant that writes faithful summaries of journal entries.",
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+
+async def fit_to_budget(text, prompt_type, budget=CLAUDE_INPUT_TOKEN_BUDGET, summary_round=1):
+    """Return text as-is if it fits in the token budget, otherwise a condensed version.
+    
+    Over-long text is split into chunks of about CLAUDE_CHUNK_TOKENS tokens at
+    paragraph and sentence boundaries. Each chunk is summarized, and the
+    summaries are combined in order. This repeats if the result is still too
+    long, so nothing is silently cut off the end.
+    """
+    tokens = await count_tokens(text)
+    if tokens <= budget:
+        return text
     
-    # If it's too long, truncate and add a note
-    truncated = transcription[:MAX_TRANSCRIPTION_LENGTH]
-    truncated += f"\n\n[Note: Transcription was truncated from {len(transcription)} characters due to length limits]"
+    chars_per_token = len(text) / tokens
+    if summary_round > MAX_SUMMARY_ROUNDS:
+        logger.warning(f"{prompt_type}: still {tokens} tokens after {MAX_SUMMARY_ROUNDS} rounds of summaries, cutting off the end")
+        return text[:int(budget * chars_per_token)] + "\n\n[Truncated due to length limits]"
     
-    logger.warning(f"Transcription truncated from {len(transcription)} to {len(truncated)} characters")
-    return truncated
+    chunks = split_text(text, max_length=int(CLAUDE_CHUNK_TOKENS * chars_per_token))
+    logger.info(f"{prompt_type}: {tokens} tokens is over the {budget} token budget, summarizing {len(chunks)} chunks")
+    
+    semaphore = asyncio.Semaphore(CLAUDE_CHUNK_CONCURRENCY)
+    
+    async def summarize(index, chunk):
+        async with semaphore:
+            return await summarize_chunk(chunk, index, len(chunks), prompt_type)
+    
+    summaries = await asyncio.gather(*(summarize(i + 1, chunk) for i, chunk in enumerate(chunks)))
+    combined = "\n\n".join(
+        f"[Summary of part {i + 1} of {len(summaries)}]\n{summary}" for i, summary in enumerate(summaries)
+    )
+    
+    return await fit_to_budget(combined, prompt_type, budget, summary_round + 1)
 
-async def get_reflection(transcription):
+async def get_reflection(transcription, on_text=None):
     """Get reflective insights from Claude based on the transcription."""
     try:
-        client = get_client()
-        
-        # Truncate transcription if necessary
-        safe_transcription = truncate_transcription(transcription)
+        # Condense the transcription if it doesn't fit in the token budget
+        safe_transcription = await fit_to_budget(transcription, "reflection")
         
         prompt = f"""You are a reflective journaling assistant. I'll share a transcribed voice note.
 Please:
@@ -52,7 +218,9 @@ You should be with the user in their world, but also help them see new perspecti
 Here's the transcribed voice note:
 {safe_transcription}"""
 
-        message = client.messages.create(
+        return await stream_message(
+            "reflection",
+            on_text=on_text,
             model=CLAUDE_MODEL,
             max_tokens=CLAUDE_MAX_TOKENS,
             temperature=CLAUDE_TEMPERATURE,
@@ -61,55 +229,96 @@ Here's the transcribed voice note:
                 {"role": "user", "content": prompt}
             ]
         )
-        
-        return message.content[0].text
     except Exception as e:
         logger.error(f"Error getting Claude response: {str(e)}")
-        return f"I transcribed your message, but couldn't generate reflections (Claude API error).\n\nTranscription:\n{transcription[:500]}... [truncated]"
+        record_error("claude")
+        return f"{REFLECTION_ERROR}\n\nTranscription:\n{transcription[:500]}... [truncated]"
 
-async def get_review_summary(messages, time_period):
-    """Generate a summary of multiple entries using Claude."""
-    if not messages:
-        return f"You don't have any entries from {time_period}."
+async def make_digest_request(transcription):
+    """Build the Messages API parameters for the digest of one entry."""
+    safe_transcription = await fit_to_budget(transcription, "digest")
     
-    # Extract transcriptions from messages
-    transcriptions = []
-    for _, transcription, _, _ in messages:
-        # Limit each transcription to a reasonable length
-        if len(transcription) > 5000:  # Arbitrary limit per transcription
-            transcription = transcription[:5000] + "... [truncated]"
-        transcriptions.append(transcription)
+    prompt = f"""Summarize this transcribed journal voice note in 3-5 sentences for later review alongside other entries.
+Keep the main topics, the feelings expressed, any decisions or open questions, and notable names or events.
+Write in the second person ("you"), and don't add advice or interpretation.
+
+Here's the transcribed voice note:
+{safe_transcription}"""
+
+    return dict(
+        model=CLAUDE_MODEL,
+        max_tokens=CLAUDE_DIGEST_MAX_TOKENS,
+        temperature=0,
+        system="You are a precise assistant that writes faithful summaries of journal entries.",
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+
+async def get_entry_digest(transcription):
+    """Get a short digest of one entry, used as its stand-in when building reviews.
     
-    all_transcriptions = "\n\n".join([f"Entry {i+1}: {text}" for i, text in enumerate(transcriptions)])
+    Raises on API errors, so that a failed digest is never stored.
+    """
+    return await create_message("digest", **await make_digest_request(transcription))
+
+def review_header(time_period):
+    """The line every review starts with."""
+    return f"📝 Review of your entries from {time_period}:\n\n"
+
+async def make_review_request(digests, time_period):
+    """Build the Messages API parameters for a review of several entries.
     
-    # Ensure the combined transcriptions aren't too long
-    if len(all_transcriptions) > MAX_TRANSCRIPTION_LENGTH:
-        logger.warning(f"Combined transcriptions too long ({len(all_transcriptions)} chars). Truncating.")
-        all_transcriptions = all_transcriptions[:MAX_TRANSCRIPTION_LENGTH] + "\n\n[Some entries truncated due to length limits]"
+    Args:
+        digests (list): (reference_id, created_at, digest) for each entry
+        time_period (str): Description of the period, e.g. "the past week"
+    """
+    all_digests = "\n\n".join(
+        f"Entry {ref_id} ({created_at.split('.')[0]}): {digest}"
+        for ref_id, created_at, digest in digests
+    )
     
-    try:
-        client = get_client()
-        
-        prompt = f"""You are a reflective journaling assistant. I'll share multiple voice note transcriptions from {time_period}.
+    # Condense the digests if a busy period doesn't fit in the token budget
+    all_digests = await fit_to_budget(all_digests, "review")
+    
+    prompt = f"""You are a reflective journaling assistant. I'll share summaries of multiple voice notes from {time_period}.
 Please provide:
 1. A concise summary of the main themes and topics (3-4 sentences)
 2. Identify 2-3 patterns, insights, or connections between entries. This can be as simple as noticing a pattern, or identifying a blindspot or key assumption the user is making.
 3. Offer one or two thoughtful questions for further reflection based on these entries
 
-Here are the transcribed voice notes from {time_period}:
-{all_transcriptions}"""
+Here are the voice notes from {time_period}:
+{all_digests}"""
 
-        message = client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=CLAUDE_REVIEW_MAX_TOKENS,
-            temperature=CLAUDE_TEMPERATURE,
-            system="You are a helpful, empathetic journaling assistant that provides thoughtful reflections on multiple journal entries.",
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return f"📝 Review of your entries from {time_period}:\n\n{message.content[0].text}"
-    except Exception as e:
-        logger.error(f"Error getting Claude review response: {str(e)}")
-        return f"I found {len(messages)} entries from {time_period}, but couldn't generate a review (Claude API error)." 
\ No newline at end of file
+    return dict(
+        model=CLAUDE_MODEL,
+        max_tokens=CLAUDE_REVIEW_MAX_TOKENS,
+        temperature=CLAUDE_TEMPERATURE,
+        system="You are a helpful, empathetic journaling assistant that provides thoughtful reflections on multiple journal entries.",
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+
+async def get_review_summary(digests, time_period, on_text=None):
+    """Generate a summary of multiple entries using Claude.
+    
+    Args:
+        digests (list): (reference_id, created_at, digest) for each entry
+        time_period (str): Description of the period, e.g. "the past week"
+        on_text (callable): Awaited with the review so far as it streams in
+    
+    Raises on API errors, so that a failed review is never stored.
+    """
+    header = review_header(time_period)
+    
+    async def on_review_text(text):
+        await on_text(header + text)
+    
+    review = await stream_message(
+        "review",
+        on_text=on_review_text if on_text is not None else None,
+        **await make_review_request(digests, time_period)
+    )
+    
+    return header + review
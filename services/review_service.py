@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from config import DIGEST_MIN_LENGTH, DIGEST_CONCURRENCY, REVIEW_RETENTION_DAYS
+from db.repository import (
+    get_message_digests, store_message_digest, get_active_user_ids, get_today_messages, get_weekly_messages, run_db
+)
+from db.reviews import make_review_key, get_stored_review, store_review, prune_reviews
+from services.claude_service import (
+    get_entry_digest, get_review_summary, make_digest_request, make_review_request, review_header, run_batch
+)
+
+logger = logging.getLogger(__name__)
+
+# The periods /review_today and /review_week cover, as they are described to Claude
+TODAY = "today"
+PAST_WEEK = "the past week"
+
+# Period -> how to get a user's entries from it
+REVIEW_PERIODS = {
+    TODAY: get_today_messages,
+    PAST_WEEK: get_weekly_messages,
+}
+
+def needs_digest(message, digests):
+    """Whether a message is long enough to need a digest and doesn't have one yet."""
+    return message.reference_id not in digests and len(message.transcription) >= DIGEST_MIN_LENGTH
+
+def with_digests(messages, digests):
+    """Pair each message with its digest, or its own text if it is short enough to stand in for one."""
+    return [
+        (message.reference_id, message.created_at, digests.get(message.reference_id, message.transcription))
+        for message in messages
+    ]
+
+async def get_digests(user_id, messages):
+    """Get the digest of every message, asking Claude only for the ones not stored yet.
+
+    Short entries serve as their own digest. New digests are stored as soon
+    as each one arrives, so a failure part-way through doesn't lose the rest.
+
+    Returns:
+        list: (reference_id, created_at, digest) in the same order as messages
+    """
+    reference_ids = [message.reference_id for message in messages]
+    digests = await get_message_digests(user_id, reference_ids)
+
+    missing = [
+        (message.reference_id, message.transcription) for message in messages if needs_digest(message, digests)
+    ]
+    if missing:
+        logger.info(f"Generating {len(missing)} new digests for user {user_id}")
+
+    semaphore = asyncio.Semaphore(DIGEST_CONCURRENCY)
+
+    async def generate(ref_id, transcription):
+        async with semaphore:
+            digest = await get_entry_digest(transcription)
+        await store_message_digest(user_id, ref_id, digest)
+        digests[ref_id] = digest
+
+    await asyncio.gather(*(generate(ref_id, transcription) for ref_id, transcription in missing))
+
+    return with_digests(messages, digests)
+
+async def get_review(user_id, messages, time_period, on_text=None):
+    """Get a review of a user's messages from a period.
+
+    Reviews are memoized by the exact set of entries they cover, so asking
+    again without new entries returns instantly. Otherwise the review is
+    reduced from per-entry digests, so a new entry only costs one new digest
+    plus the final review.
+    """
+    reference_ids = [message.reference_id for message in messages]
+    cache_key = make_review_key(user_id, time_period, reference_ids)
+
+    review = await run_db(get_stored_review, cache_key)
+    if review is not None:
+        logger.info(f"Reusing stored review of {len(messages)} entries for user {user_id}")
+        return review
+
+    try:
+        digests = await get_digests(user_id, messages)
+        review = await get_review_summary(digests, time_period, on_text=on_text)
+    except Exception as e:
+        logger.error(f"Error getting Claude review response: {str(e)}")
+        return f"I found {len(messages)} entries from {time_period}, but couldn't generate a review (Claude API error)."
+
+    await run_db(store_review, cache_key, user_id, time_period, reference_ids, review)
+    await run_db(prune_reviews, REVIEW_RETENTION_DAYS)
+
+    return review
+
+async def precompute_reviews(keep_waiting=None):
+    """Generate and store the daily and weekly reviews of everyone who journaled in the past week.
+
+    Work goes through the Message Batches API in two rounds: first the
+    digests that are missing, then the reviews built from them. Reviews are
+    stored under the same keys get_review looks up, so a review whose
+    entries haven't changed by the time it is asked for is returned
+    instantly. Reviews that are already stored are skipped, as are reviews
+    whose digests failed; those are generated live if asked for.
+
+    Args:
+        keep_waiting (callable): Passed to run_batch; return False to give up on the batches
+
+    Returns:
+        int: The number of reviews stored
+    """
+    user_ids = await get_active_user_ids(datetime.now() - timedelta(days=7))
+
+    # (user_id, time_period, messages, cache_key) of each review that isn't stored yet
+    pending = []
+    for user_id in user_ids:
+        for time_period, get_messages in REVIEW_PERIODS.items():
+            messages = await get_messages(user_id)
+            if not messages:
+                continue
+            cache_key = make_review_key(user_id, time_period, [message.reference_id for message in messages])
+            if await run_db(get_stored_review, cache_key) is None:
+                pending.append((user_id, time_period, messages, cache_key))
+
+    if not pending:
+        logger.info(f"All reviews of {len(user_ids)} active users are up to date")
+        return 0
+
+    # A user's daily entries are also in their weekly review, so each digest is requested once
+    digests = {}
+    digest_requests = {}
+    digest_owners = {}
+    for user_id, _, messages, _ in pending:
+        stored = digests.setdefault(user_id, {})
+        stored.update(await get_message_digests(user_id, [message.reference_id for message in messages]))
+        for message in messages:
+            custom_id = f"digest-{user_id}-{message.reference_id}"
+            if needs_digest(message, stored) and custom_id not in digest_requests:
+                digest_requests[custom_id] = await make_digest_request(message.transcription)
+                digest_owners[custom_id] = (user_id, message.reference_id)
+
+    if digest_requests:
+        results = await run_batch("digest", digest_requests, keep_waiting)
+        for custom_id, digest in results.items():
+            user_id, reference_id = digest_owners[custom_id]
+            await store_message_digest(user_id, reference_id, digest)
+            digests[user_id][reference_id] = digest
+
+    review_requests = {}
+    for index, (user_id, time_period, messages, _) in enumerate(pending):
+        if any(needs_digest(message, digests[user_id]) for message in messages):
+            continue
+        review_requests[f"review-{index}"] = await make_review_request(
+            with_digests(messages, digests[user_id]), time_period
+        )
+
+    results = await run_batch("review", review_requests, keep_waiting) if review_requests else {}
+    for custom_id, review in results.items():
+        user_id, time_period, messages, cache_key = pending[int(custom_id.split("-")[1])]
+        reference_ids = [message.reference_id for message in messages]
+        await run_db(store_review, cache_key, user_id, time_period, reference_ids, review_header(time_period) + review)
+    await run_db(prune_reviews, REVIEW_RETENTION_DAYS)
+
+    logger.info(
+        f"Precomputed {len(results)} of {len(pending)} out-of-date reviews for {len(user_ids)} active users "
+        f"({len(digest_requests)} new digests)"
+    )
+    return len(results)
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import TRANSCRIPTION_WORKERS, TRANSCRIPTION_QUEUE_SIZE
+from utils.metrics import observe_stage, record_error
+
+logger = logging.getLogger(__name__)
+
+# Initialize transcription executor
+executor = None
+
+class TranscriptionQueueFull(Exception):
+    """Raised when there is no room left in the transcription queue."""
+
+class TranscriptionJob:
+    """A transcription that is waiting for, or running on, a worker."""
+
+    def __init__(self, executor):
+        self._executor = executor
+        self.future = None
+        self.submitted_at = time.perf_counter()
+
+    @property
+    def position(self):
+        """1-based position in the queue, or 0 once a worker has the job."""
+        return self._executor.position(self)
+
+    @property
+    def depth(self):
+        """Number of jobs currently waiting for a worker."""
+        return self._executor.depth
+
+    def done(self):
+        return self.future.done()
+
+    def __await__(self):
+        return self.future.__await__()
+
+class TranscriptionExecutor:
+    """Run blocking transcriptions on a bounded pool of worker threads."""
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+        self._waiting = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    @property
+    def depth(self):
+        """Number of jobs waiting for a free worker."""
+        with self._lock:
+            return self._queued()
+
+    def _queued(self):
+        return max(0, len(self._waiting) - (self.workers - self._running))
+
+    def position(self, job):
+        """Return the job's 1-based queue position, or 0 if it has (or is about to get) a worker."""
+        with self._lock:
+            try:
+                index = self._waiting.index(job)
+            except ValueError:
+                return 0
+            free_workers = self.workers - self._running
+            return max(0, index - free_workers + 1)
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) and return an awaitable TranscriptionJob."""
+        job = TranscriptionJob(self)
+        with self._lock:
+            if self._queued() >= self.max_queue:
+                record_error("queue_wait")
+                raise TranscriptionQueueFull(f"Transcription queue is full ({self.max_queue} jobs waiting)")
+            self._waiting.append(job)
+            future = self._pool.submit(self._run, job, fn, args, kwargs)
+
+        job.future = asyncio.wrap_future(future)
+        logger.info(f"Transcription job queued at position {self.position(job)} (depth {self.depth})")
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._waiting.remove(job)
+            self._running += 1
+        observe_stage("queue_wait", time.perf_counter() - job.submitted_at)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running ones to finish."""
+        self._pool.shutdown(wait=True)
+
+def get_transcription_executor():
+    """Get the transcription executor, initializing it if necessary."""
+    global executor
+    if executor is None:
+        executor = TranscriptionExecutor(TRANSCRIPTION_WORKERS, TRANSCRIPTION_QUEUE_SIZE)
+        logger.info(f"Transcription executor initialized with {TRANSCRIPTION_WORKERS} workers")
+    return executor
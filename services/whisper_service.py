@@ -1,35 +1,365 @@
+import time
+import queue
 import logging
-from faster_whisper import WhisperModel
-from config import WHISPER_MODEL, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE
+import threading
+from itertools import takewhile
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import numpy as np
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from utils.metrics import metrics, timed, observe_real_time_factor
+from config import (
+    WHISPER_MODEL, WHISPER_DEVICE, WHISPER_COMPUTE_TYPE, WHISPER_MODEL_ROUTES,
+    TRANSCRIPTION_WORKERS, TRANSCRIPTION_BATCHING, TRANSCRIPTION_BATCH_SIZE, TRANSCRIPTION_BATCH_WAIT,
+    CHUNKED_TRANSCRIPTION_MIN_SECONDS, TRANSCRIPTION_CHUNK_SECONDS, TRANSCRIPTION_CHUNK_WORKERS
+)
 
 logger = logging.getLogger(__name__)
 
-# Initialize Whisper model
-model = None
+# Initialize Whisper models, keyed by model name
+models = {}
+model_locks = defaultdict(threading.Lock)
+model_locks_lock = threading.Lock()
 
-def init_whisper():
-    """Initialize the Whisper model."""
-    global model
-    model = WhisperModel(WHISPER_MODEL, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
-    logger.info(f"Whisper model '{WHISPER_MODEL}' initialized")
-    return model
+# Set once every routed model has been loaded
+models_ready = threading.Event()
+
+# Batched pipelines, keyed by model name, and the scheduler feeding them
+pipelines = {}
+scheduler = None
+scheduler_lock = threading.Lock()
+
+# Initialize the pool that transcribes chunks of long notes
+chunk_pool = None
+chunk_pool_lock = threading.Lock()
+
+SAMPLE_RATE = 16000
+MAX_WINDOW_SECONDS = 30  # Whisper's context window
 
-def get_model():
-    """Get the Whisper model, initializing it if necessary."""
-    global model
-    if model is None:
-        model = init_whisper()
+def init_whisper(model_name=WHISPER_MODEL):
+    """Initialize a Whisper model."""
+    # One model worker per transcription or chunk thread so they can run concurrently
+    model = WhisperModel(
+        model_name,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        num_workers=max(TRANSCRIPTION_WORKERS, TRANSCRIPTION_CHUNK_WORKERS)
+    )
+    logger.info(f"Whisper model '{model_name}' initialized")
     return model
 
-def transcribe_audio(file_path):
-    """Transcribe an audio file using Whisper."""
-    model = get_model()
-    
-    logger.info(f"Transcribing audio file: {file_path}")
-    segments, info = model.transcribe(str(file_path))
-    
-    # Combine all segments into a single transcription
-    transcription = " ".join([segment.text for segment in segments])
-    
+def get_model(model_name=WHISPER_MODEL):
+    """Get a Whisper model, initializing it if necessary."""
+    with model_locks_lock:
+        lock = model_locks[model_name]
+
+    # Several transcription workers may ask for the same model at once,
+    # but loading one model shouldn't hold up notes routed to another
+    with lock:
+        if model_name not in models:
+            models[model_name] = init_whisper(model_name)
+    return models[model_name]
+
+def get_routed_models():
+    """Get the distinct model names used by WHISPER_MODEL_ROUTES, in route order."""
+    return list(dict.fromkeys(model_name for _, model_name in WHISPER_MODEL_ROUTES))
+
+def select_model(duration):
+    """Pick the model for a voice note from its duration in seconds."""
+    model_name = WHISPER_MODEL
+    for max_duration, route_model in WHISPER_MODEL_ROUTES:
+        if max_duration is None or (duration is not None and duration <= max_duration):
+            model_name = route_model
+            break
+
+    metrics.increment("whisper_routes_total", model=model_name)
+    logger.info(f"Routing {duration}s voice note to Whisper model '{model_name}'")
+    return model_name
+
+def warm_up():
+    """Load every routed model and run a tiny inference so the first note doesn't pay for it."""
+    start = time.time()
+    try:
+        for model_name in get_routed_models():
+            model = get_model(model_name)
+            # The first inference initializes more lazily-loaded state
+            segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32))
+            list(segments)
+    except Exception as e:
+        # Notes will still load their model on first use
+        logger.error(f"Error warming up Whisper models: {str(e)}")
+        return
+
+    models_ready.set()
+    logger.info(f"Whisper models {get_routed_models()} warmed up in {time.time() - start:.2f} seconds")
+
+def start_warm_up():
+    """Warm up the models in a background thread."""
+    threading.Thread(target=warm_up, name="whisper-warmup", daemon=True).start()
+
+def is_ready():
+    """Check whether all routed models have been loaded, by the warm-up or by earlier notes."""
+    return models_ready.is_set() or all(model_name in models for model_name in get_routed_models())
+
+def get_pipeline(model_name):
+    """Get the batched inference pipeline for a model, creating it if necessary."""
+    if model_name not in pipelines:
+        pipelines[model_name] = BatchedInferencePipeline(model=get_model(model_name))
+    return pipelines[model_name]
+
+def speech_windows(audio):
+    """Find the speech in a clip as (start, end) sample offsets, none longer than Whisper's window."""
+    windows = get_speech_timestamps(audio, VadOptions(max_speech_duration_s=MAX_WINDOW_SECONDS))
+    return [(window["start"], window["end"]) for window in windows]
+
+def pack_windows(audio, windows):
+    """Join a clip's speech windows end to end into chunks of one Whisper window each.
+
+    Windows are added to a chunk until the next would overflow it, and each
+    chunk is padded with silence to the full window, so the batched pipeline
+    (which packs clip timestamps up to a window) never puts two clips in
+    the same chunk.
+    """
+    window_samples = MAX_WINDOW_SECONDS * SAMPLE_RATE
+    chunks = [[]]
+    length = 0
+    for start, end in windows:
+        if chunks[-1] and length + end - start > window_samples:
+            chunks.append([])
+            length = 0
+        chunks[-1].append(audio[start:end])
+        length += end - start
+
+    padded = []
+    for parts in chunks:
+        chunk = np.concatenate(parts)[:window_samples]
+        padded.append(np.pad(chunk, (0, window_samples - len(chunk))))
+    return padded
+
+def detect_language(model, audio):
+    """Detect the language of a clip from its first window, as model.transcribe does."""
+    if not model.model.is_multilingual:
+        return "en"
+    language, probability, _ = model.detect_language(audio)
+    return language
+
+def transcribe_batch(model_name, clips, batch_size=TRANSCRIPTION_BATCH_SIZE):
+    """Transcribe several clips in as few batched passes as their languages allow.
+
+    The pipeline decodes a whole pass in one language, so each clip's
+    language is detected first and clips are batched with others in the
+    same language. Within a pass, each clip's speech is packed into whole
+    Whisper windows, the windows are laid end to end and passed as clip
+    timestamps (in seconds, as faster-whisper 1.2 expects), so the pipeline
+    can batch windows from different clips. Segments are mapped back to
+    their clip by window.
+
+    Returns:
+        list: one transcription per clip, in order
+    """
+    model = get_model(model_name)
+    audios = [
+        decode_audio(clip if hasattr(clip, "read") else str(clip), sampling_rate=SAMPLE_RATE)
+        for clip in clips
+    ]
+
+    # Per language, the clip each window came from and the windows themselves
+    owners = defaultdict(list)
+    windows = defaultdict(list)
+    for index, audio in enumerate(audios):
+        speech = speech_windows(audio)
+        if not speech:
+            # Nothing but silence
+            continue
+        language = detect_language(model, audio)
+        chunks = pack_windows(audio, speech)
+        owners[language].extend([index] * len(chunks))
+        windows[language].extend(chunks)
+
+    texts = [[] for _ in clips]
+    for language, language_windows in windows.items():
+        clip_timestamps = [
+            {"start": number * MAX_WINDOW_SECONDS, "end": (number + 1) * MAX_WINDOW_SECONDS}
+            for number in range(len(language_windows))
+        ]
+        segments, info = get_pipeline(model_name).transcribe(
+            np.concatenate(language_windows),
+            language=language,
+            clip_timestamps=clip_timestamps,
+            vad_filter=False,
+            batch_size=batch_size
+        )
+        for segment in segments:
+            window = min(int(segment.start // MAX_WINDOW_SECONDS), len(language_windows) - 1)
+            texts[owners[language][window]].append(segment.text)
+
+    return [" ".join(text) for text in texts]
+
+class BatchScheduler:
+    """Collect clips from transcription workers and transcribe them in batches.
+
+    The first clip to arrive opens a window of max_wait seconds; everything
+    queued by then (up to batch_size clips) is transcribed together, one
+    batch per model.
+    """
+
+    def __init__(self, batch_size, max_wait):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="transcribe-batcher", daemon=True)
+        self._thread.start()
+
+    def transcribe(self, audio, model_name):
+        """Queue a clip and block until its batch has been transcribed."""
+        future = Future()
+        self._pending.put((model_name, audio, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            by_model = defaultdict(list)
+            for request in self._collect():
+                by_model[request[0]].append(request)
+            for model_name, requests in by_model.items():
+                self._run(model_name, requests)
+
+    def _run(self, model_name, requests):
+        start = time.time()
+        try:
+            texts = transcribe_batch(model_name, [audio for _, audio, _ in requests])
+        except Exception as e:
+            logger.error(f"Error transcribing batch of {len(requests)} notes: {str(e)}")
+            for _, _, future in requests:
+                future.set_exception(e)
+            return
+
+        for (_, _, future), text in zip(requests, texts):
+            future.set_result(text)
+        logger.info(f"Transcribed batch of {len(requests)} notes with '{model_name}' in {time.time() - start:.2f} seconds")
+
+def get_batch_scheduler():
+    """Get the batch scheduler, initializing it if necessary."""
+    global scheduler
+    with scheduler_lock:
+        if scheduler is None:
+            scheduler = BatchScheduler(TRANSCRIPTION_BATCH_SIZE, TRANSCRIPTION_BATCH_WAIT)
+            logger.info(f"Batch scheduler initialized (up to {TRANSCRIPTION_BATCH_SIZE} notes, {TRANSCRIPTION_BATCH_WAIT}s window)")
+    return scheduler
+
+def get_chunk_pool():
+    """Get the chunk transcription pool, initializing it if necessary."""
+    global chunk_pool
+    with chunk_pool_lock:
+        if chunk_pool is None:
+            chunk_pool = ThreadPoolExecutor(max_workers=TRANSCRIPTION_CHUNK_WORKERS, thread_name_prefix="transcribe-chunk")
+    return chunk_pool
+
+def split_at_silences(audio, chunk_seconds=TRANSCRIPTION_CHUNK_SECONDS):
+    """Split audio into chunks of roughly chunk_seconds, cutting only in silences found by VAD.
+
+    Returns:
+        list: (start, end) sample offsets covering the whole clip, in order
+    """
+    chunks = []
+    chunk_start = 0
+    speech_end = None
+    for window in get_speech_timestamps(audio, VadOptions()):
+        if speech_end is not None and window["end"] - chunk_start > chunk_seconds * SAMPLE_RATE:
+            # Cut in the middle of the silence before this stretch of speech
+            cut = (speech_end + window["start"]) // 2
+            chunks.append((chunk_start, cut))
+            chunk_start = cut
+        speech_end = window["end"]
+
+    chunks.append((chunk_start, len(audio)))
+    return chunks
+
+def transcribe_chunked(model, audio, on_progress=None):
+    """Transcribe a long clip by transcribing its chunks in parallel and joining them in order."""
+    audio = decode_audio(audio, sampling_rate=SAMPLE_RATE)
+    chunks = split_at_silences(audio)
+    logger.info(f"Transcribing {len(audio) / SAMPLE_RATE:.0f}s of audio as {len(chunks)} chunks")
+
+    def transcribe_chunk(start, end):
+        segments, info = model.transcribe(audio[start:end])
+        return " ".join(segment.text for segment in segments)
+
+    futures = {
+        get_chunk_pool().submit(transcribe_chunk, start, end): (index, end - start)
+        for index, (start, end) in enumerate(chunks)
+    }
+    texts = [None] * len(chunks)
+    transcribed = 0
+    try:
+        for future in as_completed(futures):
+            index, length = futures[future]
+            texts[index] = future.result()
+            transcribed += length
+            if on_progress:
+                # Only chunks with nothing missing before them can be shown yet
+                partial = " ".join(takewhile(lambda text: text is not None, texts))
+                on_progress(partial, transcribed / len(audio))
+    except Exception:
+        for future in futures:
+            future.cancel()
+        raise
+
+    return " ".join(texts)
+
+def transcribe_with_model(model, audio, duration, on_progress=None):
+    """Transcribe audio with one model, in parallel chunks if it is long enough."""
+    if hasattr(audio, "read"):
+        logger.info("Transcribing in-memory audio")
+    else:
+        logger.info(f"Transcribing audio file: {audio}")
+        audio = str(audio)
+
+    if duration and duration >= CHUNKED_TRANSCRIPTION_MIN_SECONDS and TRANSCRIPTION_CHUNK_WORKERS > 1:
+        return transcribe_chunked(model, audio, on_progress=on_progress)
+
+    segments, info = model.transcribe(audio)
+
+    # Combine all segments into a single transcription, reporting progress as it grows
+    texts = []
+    for segment in segments:
+        texts.append(segment.text)
+        if on_progress and info.duration:
+            on_progress(" ".join(texts), min(1.0, segment.end / info.duration))
+    return " ".join(texts)
+
+def transcribe_audio(audio, duration=None, on_progress=None):
+    """Transcribe audio using Whisper.
+
+    audio is a file path or a binary file-like object positioned at the start
+    of the audio. duration is the note's length in seconds as reported by
+    Telegram, used to pick the model and to decide whether to split it.
+    on_progress(partial_text, fraction_done) is called from worker threads
+    as the transcription grows.
+    """
+    model_name = select_model(duration)
+    start = time.perf_counter()
+
+    with timed("transcription"):
+        if TRANSCRIPTION_BATCHING:
+            transcription = get_batch_scheduler().transcribe(audio, model_name)
+        else:
+            transcription = transcribe_with_model(get_model(model_name), audio, duration, on_progress)
+
+    observe_real_time_factor(time.perf_counter() - start, duration)
     logger.info(f"Transcription completed, length: {len(transcription)} characters")
-    return transcription 
\ No newline at end of file
+    return transcription
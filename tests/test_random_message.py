@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest import mock
+
+from db import database, models
+
+USER_ID = 1
+
+class RandomMessageTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patch = mock.patch.object(database, "DB_PATH", os.path.join(directory.name, "journal.db"))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(database.close_connections)
+        self.addCleanup(models.recently_shown.clear)
+        database.init_db()
+
+        # Three notes a day a minute apart, and a run of notes sharing one timestamp
+        start = datetime(2024, 1, 1, 8)
+        times = [start + timedelta(days=day, minutes=note) for day in range(30) for note in range(3)]
+        times += [start + timedelta(days=30)] * 10
+        with database.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO messages (reference_id, user_id, transcription, claude_response, created_at) VALUES (?, ?, '', '', ?)",
+                [(f"MSG{number}", USER_ID, time.strftime('%Y-%m-%d %H:%M:%S')) for number, time in enumerate(times, start=1)]
+            )
+        self.reference_ids = {f"MSG{number}" for number in range(1, len(times) + 1)}
+
+    def test_every_entry_can_be_returned(self):
+        returned = set()
+        for rank in range(len(self.reference_ids)):
+            with mock.patch.object(models.random, "randrange", return_value=rank):
+                returned.add(models.get_random_message(USER_ID, avoid_recent=False)[0])
+
+        self.assertEqual(returned, self.reference_ids)
+
+    def test_entries_are_picked_uniformly(self):
+        random.seed(0)
+        picks = Counter(models.get_random_message(USER_ID, avoid_recent=False)[0] for _ in range(10000))
+
+        self.assertEqual(set(picks), self.reference_ids)
+        expected = 10000 / len(self.reference_ids)
+        self.assertLess(max(picks.values()), 1.5 * expected)
+        self.assertGreater(min(picks.values()), 0.5 * expected)
+
+    def test_recent_entries_are_skipped_until_none_are_left(self):
+        # The ten entries sharing a timestamp
+        since = datetime(2024, 1, 31, 8)
+        shown = [models.get_random_message(USER_ID, since=since)[0] for _ in range(10)]
+        self.assertEqual(len(set(shown)), 10)
+
+        # Every one was shown recently, so the one shown longest ago comes back
+        self.assertEqual(models.get_random_message(USER_ID, since=since)[0], shown[0])
+
+if __name__ == "__main__":
+    unittest.main()
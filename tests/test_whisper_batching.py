@@ -0,0 +1,82 @@
+import io
+import wave
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from benchmarks.fakes import make_clip, SAMPLE_RATE
+from services import whisper_service
+
+# The language each synthetic clip is "spoken" in, by its length in seconds
+LANGUAGES = {5: "en", 7: "de", 12: "de", 45: "en"}
+
+class FakeModel:
+    """Detects a clip's language from its length."""
+
+    model = SimpleNamespace(is_multilingual=True)
+
+    def detect_language(self, audio):
+        return LANGUAGES[round(len(audio) / SAMPLE_RATE)], 1.0, []
+
+class FakePipeline:
+    """Returns one segment per window, saying which language the pass was decoded in."""
+
+    def __init__(self):
+        self.passes = []
+
+    def transcribe(self, audio, language=None, clip_timestamps=None, **kwargs):
+        self.passes.append(language)
+        segments = [
+            SimpleNamespace(start=float(window["start"]), text=f"{language}")
+            for window in clip_timestamps
+        ]
+        return iter(segments), SimpleNamespace(language=language)
+
+def silence(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(b"\0\0" * seconds * SAMPLE_RATE)
+    buffer.seek(0)
+    return buffer
+
+class TranscribeBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = FakePipeline()
+        patches = [
+            mock.patch.object(whisper_service, "get_model", lambda model_name=None: FakeModel()),
+            mock.patch.object(whisper_service, "get_pipeline", lambda model_name: self.pipeline),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_mixed_languages_are_transcribed_in_their_own_language(self):
+        lengths = [5, 12, 45, 7]
+        clips = [io.BytesIO(make_clip(seconds, seed=seconds)) for seconds in lengths]
+
+        texts = whisper_service.transcribe_batch("fake", clips)
+
+        self.assertEqual(sorted(self.pipeline.passes), ["de", "en"])
+        for seconds, text in zip(lengths, texts):
+            self.assertTrue(text)
+            self.assertEqual(set(text.split()), {LANGUAGES[seconds]}, f"{seconds}s clip: {text!r}")
+
+    def test_windows_map_back_to_their_clip(self):
+        clips = [io.BytesIO(make_clip(seconds, seed=seconds)) for seconds in (5, 45)]
+
+        texts = whisper_service.transcribe_batch("fake", clips)
+
+        # 45 seconds of speech take two windows
+        self.assertEqual([len(text.split()) for text in texts], [1, 2])
+
+    def test_silent_clips_are_not_transcribed(self):
+        texts = whisper_service.transcribe_batch("fake", [silence(3), io.BytesIO(make_clip(5, seed=5))])
+
+        self.assertEqual(texts[0], "")
+        self.assertEqual(self.pipeline.passes, ["en"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import logging
-from config import AUTHORIZED_USER_IDS
+from config import AUTHORIZED_USER_IDS, ADMIN_USER_IDS
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +18,10 @@ def is_user_authorized(user_id):
     
     return is_authorized
 
+def is_user_admin(user_id):
+    """Check if a user is an admin. Nobody is unless ADMIN_USER_IDS is set."""
+    return user_id in ADMIN_USER_IDS
+
 async def check_authorization(update, context):
     """Check if the user is authorized and send a message if not."""
     user_id = update.effective_user.id
@@ -0,0 +1,197 @@
+"""In-process metrics: latency histograms and counters for each pipeline stage."""
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import METRICS_SAMPLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages, in the order a voice note goes through them
+STAGES = ["file_info", "download", "queue_wait", "transcription", "claude", "db_write", "telegram_send"]
+
+# Histogram bucket upper bounds
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RATIO_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus, plus recent samples for percentiles."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=METRICS_SAMPLE_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def summary(self):
+        """Get the total count and the p50, p95, p99 and max of the recent samples."""
+        ordered = sorted(self.samples)
+
+        def percentile(fraction):
+            return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+        return {
+            "count": self.count,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": ordered[-1] if ordered else None,
+        }
+
+class Metrics:
+    """A registry of labelled histograms and counters, safe to use from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        """Record a value in the histogram name{labels}."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        """Add to the counter name{labels}."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self, name, **labels):
+        """Summarize a histogram (see Histogram.summary), or None if nothing has been recorded in it."""
+        with self._lock:
+            histogram = self._histograms.get((name, tuple(sorted(labels.items()))))
+            return histogram.summary() if histogram else None
+
+    def counters(self, name, label):
+        """Get a counter's values keyed by one of its labels."""
+        with self._lock:
+            return {
+                dict(labels).get(label): value
+                for (counter, labels), value in self._counters.items() if counter == name
+            }
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (counter, labels), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (histogram_name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    """Format label pairs as {a="1",b="2"}, or nothing if there are none."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+# The process-wide registry
+metrics = Metrics()
+
+def observe_stage(stage, seconds):
+    """Record how long a pipeline stage took."""
+    metrics.observe("stage_seconds", seconds, stage=stage)
+
+def record_error(stage):
+    """Count a failure in a pipeline stage."""
+    metrics.increment("stage_errors_total", stage=stage)
+
+@contextmanager
+def timed(stage):
+    """Time the body as a pipeline stage, counting an error if it raises.
+
+    Works around awaits too, since it only reads the clock on entry and exit.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_error(stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_stage(stage, elapsed)
+        logger.info(f"{stage} took {elapsed:.2f} seconds")
+
+def observe_real_time_factor(transcription_seconds, audio_seconds):
+    """Record transcription seconds per second of audio."""
+    if audio_seconds:
+        metrics.observe("transcription_real_time_factor", transcription_seconds / audio_seconds, buckets=RATIO_BUCKETS)
+
+def get_stage_summary():
+    """Summarize each stage's recent latencies and errors.
+
+    Returns:
+        dict: stage -> {"count", "p50", "p95", "p99", "max", "errors"}, for stages with any data
+    """
+    errors = metrics.counters("stage_errors_total", "stage")
+    summary = {}
+    for stage in STAGES:
+        latency = metrics.summary("stage_seconds", stage=stage)
+        if latency is None and stage not in errors:
+            continue
+        summary[stage] = latency or {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+        summary[stage]["errors"] = errors.get(stage, 0)
+    return summary
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the metrics at /metrics."""
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown out the bot's own logs
+        pass
+
+def start_metrics_server(host, port):
+    """Serve Prometheus metrics from a background thread."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving Prometheus metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,177 @@
+"""Rate-limit outbound Telegram requests, per chat and overall."""
+import time
+import asyncio
+import logging
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, TELEGRAM_MAX_RETRIES
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Edits of the same message that are still waiting are merged into the latest one
+COALESCED_ENDPOINTS = {"editMessageText"}
+
+# Idle chats are forgotten once this many are tracked
+MAX_TRACKED_CHATS = 1000
+
+class TokenBucket:
+    """Allow rate requests a second on average, in bursts of up to capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a request is allowed."""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def is_full(self):
+        self._refill()
+        return self.tokens >= self.capacity
+
+class ChatQueue:
+    """The requests waiting for one chat, sent in order at the chat's rate."""
+
+    def __init__(self):
+        self.bucket = TokenBucket(TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST)
+        self.lock = asyncio.Lock()
+
+    def is_idle(self):
+        return not self.lock.locked() and self.bucket.is_full()
+
+class PendingEdit:
+    """An edit waiting its turn; later edits of the same message replace its request."""
+
+    def __init__(self, request):
+        self.request = request
+        self.future = asyncio.get_running_loop().create_future()
+        self.superseded = 0
+
+class SendScheduler(BaseRateLimiter):
+    """Send every Bot API request under per-chat and global token buckets.
+
+    Requests to a chat go out in the order they were made. A status edit
+    that is still waiting when a newer edit of the same message arrives is
+    dropped, and everyone waiting on either gets the newer one's result.
+    When Telegram answers with RetryAfter, all requests pause for as long as
+    it asks and the request is tried again.
+    """
+
+    def __init__(self, global_rate=TELEGRAM_GLOBAL_RATE, max_retries=TELEGRAM_MAX_RETRIES):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.max_retries = max_retries
+        self.chats = {}
+        self.pending_edits = {}
+        self.paused_until = 0.0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        self.chats.clear()
+        self.pending_edits.clear()
+
+    def get_chat(self, chat_id):
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            if len(self.chats) >= MAX_TRACKED_CHATS:
+                self.chats = {key: value for key, value in self.chats.items() if not value.is_idle()}
+            chat = self.chats[chat_id] = ChatQueue()
+        return chat
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+
+        # Requests not aimed at a chat, like getFile, only wait out flood control
+        if chat_id is None:
+            return await self.call(callback, args, kwargs, endpoint)
+
+        key = None
+        if endpoint in COALESCED_ENDPOINTS and data.get("message_id") is not None:
+            key = (chat_id, data["message_id"])
+            pending = self.pending_edits.get(key)
+            if pending is not None:
+                pending.request = (callback, args, kwargs)
+                pending.superseded += 1
+                metrics.increment("telegram_edits_coalesced_total")
+                return await asyncio.shield(pending.future)
+
+        pending = None
+        if key is not None:
+            pending = self.pending_edits[key] = PendingEdit((callback, args, kwargs))
+
+        enqueued_at = time.monotonic()
+        try:
+            chat = self.get_chat(chat_id)
+            async with chat.lock:
+                await self.wait_for_turn(chat.bucket)
+                metrics.observe("telegram_queue_delay_seconds", time.monotonic() - enqueued_at)
+
+                if pending is not None:
+                    # Later edits now need a turn of their own
+                    del self.pending_edits[key]
+                    callback, args, kwargs = pending.request
+                try:
+                    result = await self.call(callback, args, kwargs, endpoint)
+                except BadRequest as e:
+                    # A merged edit can land on the text the message already has
+                    if not (pending is not None and pending.superseded and "not modified" in str(e)):
+                        raise
+                    result = True
+        except BaseException as e:
+            if pending is not None:
+                if self.pending_edits.get(key) is pending:
+                    del self.pending_edits[key]
+                if isinstance(e, asyncio.CancelledError):
+                    pending.future.cancel()
+                elif not pending.future.done():
+                    pending.future.set_exception(e)
+                    # Mark it retrieved in case nobody else was waiting
+                    pending.future.exception()
+            raise
+
+        if pending is not None:
+            pending.future.set_result(result)
+        return result
+
+    async def wait_for_turn(self, chat_bucket):
+        """Wait until flood control is over and both the chat's and the global bucket allow a request."""
+        while True:
+            wait = max(self.paused_until - time.monotonic(), chat_bucket.wait_time(), self.global_bucket.wait_time())
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        chat_bucket.take()
+        self.global_bucket.take()
+
+    async def call(self, callback, args, kwargs, endpoint):
+        """Make the request, retrying after flood control up to max_retries times."""
+        attempt = 0
+        while True:
+            wait = self.paused_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                attempt += 1
+                metrics.increment("telegram_retry_after_total")
+                if attempt > self.max_retries:
+                    raise
+                delay = float(e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after)
+                logger.warning(f"Flood control on {endpoint}, pausing outbound requests for {delay:.1f}s (attempt {attempt})")
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
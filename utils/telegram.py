@@ -0,0 +1,162 @@
+"""Utility functions for talking to Telegram."""
+import time
+import asyncio
+import logging
+from telegram.error import BadRequest
+
+from config import STREAM_EDIT_INTERVAL
+from utils.text import iter_chunks, TELEGRAM_MAX_MESSAGE_LENGTH
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Part numbers up to this many digits always fit in the room left for them
+MAX_PART_DIGITS = 6
+
+async def send_long_message(send, text, single_format="{text}", split_header=None, part_format="{chunk}",
+                            max_length=TELEGRAM_MAX_MESSAGE_LENGTH, skip=0, on_sent=None):
+    """Send text in one message if it fits, or in as many parts as it takes.
+
+    Parts are split lazily, so the first one is on its way before the rest
+    of a long text has been looked at.
+
+    Args:
+        send: Coroutine function that sends one message, e.g. message.reply_text
+        text (str): The text to send
+        single_format (str): Format of the message when text fits in one, with a {text} field
+        split_header (str): Sent on its own before the parts, if text has to be split
+        part_format (str): Format of each part, with {number} and {chunk} fields
+        max_length (int): Maximum length of each message
+        skip (int): Messages already sent by an earlier attempt, not to send again
+        on_sent: Coroutine function called with the number of messages sent so far after each one
+
+    Returns:
+        int: How many messages the text took, including skipped ones
+    """
+    def messages():
+        single_message = single_format.format(text=text)
+        if len(single_message) <= max_length:
+            yield single_message
+            return
+
+        if split_header:
+            yield split_header
+
+        # Leave room for the part's own formatting
+        overhead = len(part_format.format(number=10 ** MAX_PART_DIGITS - 1, chunk=""))
+        for number, chunk in enumerate(iter_chunks(text, max_length - overhead), start=1):
+            yield part_format.format(number=number, chunk=chunk)
+
+    sent = 0
+    for message in messages():
+        sent += 1
+        if sent <= skip:
+            continue
+        await send(message)
+        if on_sent is not None:
+            await on_sent(sent)
+    return sent
+
+class StatusEditor:
+    """Show progress in a message without waiting for Telegram.
+
+    show() returns at once, and a background task edits the message. Texts
+    shown while an edit is in flight replace each other, so only the latest
+    is sent next and a slow chat never builds up a backlog of stale
+    statuses. Progress edits are best effort: failures are logged and
+    skipped. edit_text() is for results: it waits for the edit in flight,
+    drops the one waiting, then edits and raises like Message.edit_text, so
+    an older status never lands on top of it.
+    """
+
+    def __init__(self, message, text=None):
+        self.message = message
+        # The latest text shown, whether or not it has been sent yet
+        self.text = text
+        self._pending = None
+        self._task = None
+
+    @property
+    def message_id(self):
+        return self.message.message_id
+
+    def show(self, text):
+        """Have the message show text as soon as it can, replacing any status still waiting."""
+        if text == self.text:
+            return
+        self.text = text
+        if self._pending is not None:
+            metrics.increment("telegram_edits_coalesced_total")
+        self._pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._send_pending())
+
+    async def _send_pending(self):
+        while self._pending is not None:
+            text, self._pending = self._pending, None
+            try:
+                await self.message.edit_text(text)
+            except BadRequest as e:
+                logger.debug(f"Skipping status edit: {str(e)}")
+            except Exception as e:
+                logger.warning(f"Status edit failed: {str(e)}")
+
+    async def wait(self):
+        """Wait until the latest status shown has been sent."""
+        if self._task is not None:
+            await asyncio.wait([self._task])
+
+    async def edit_text(self, text, **kwargs):
+        """Edit the message now, after the status in flight and instead of any waiting."""
+        self._pending = None
+        await self.wait()
+        self.text = text
+        return await self.message.edit_text(text, **kwargs)
+
+class ThrottledEditor:
+    """Progressively show text in a StatusEditor without exceeding Telegram's edit limits.
+
+    Intermediate texts that arrive faster than min_interval are skipped;
+    only the latest one is shown. Call flush() to show whatever is pending.
+    Neither waits for Telegram, so the text can keep streaming in.
+    """
+
+    def __init__(self, status, min_interval=STREAM_EDIT_INTERVAL):
+        self.status = status
+        self.min_interval = min_interval
+        self._pending_text = None
+        self._last_edit = 0.0
+
+    async def update(self, text):
+        """Record the latest text and show it if enough time has passed."""
+        self._pending_text = text
+        if time.monotonic() - self._last_edit >= self.min_interval:
+            await self.flush()
+
+    async def flush(self):
+        """Show the latest text, if there is one."""
+        text = self._pending_text
+        if not text:
+            return
+
+        # Trim over-long previews rather than failing the edit
+        if len(text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+            text = text[:TELEGRAM_MAX_MESSAGE_LENGTH - 3] + "..."
+
+        self.status.show(text)
+        self._last_edit = time.monotonic()
+
+class StatusMessage:
+    """A message known only by its chat and message ID, with the edit_text of a telegram.Message.
+
+    Lets a job's status message be edited after the update that created it
+    is gone, e.g. when its result is delivered by a later poll.
+    """
+
+    def __init__(self, bot, chat_id, message_id):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    async def edit_text(self, text, **kwargs):
+        return await self.bot.edit_message_text(text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
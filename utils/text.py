@@ -3,72 +3,63 @@
 # Telegram message length limit
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096
 
-def split_text(text, max_length=TELEGRAM_MAX_MESSAGE_LENGTH):
-    """Split text into chunks of max_length characters.
-    
-    This function tries to split text intelligently at paragraph, sentence,
-    or word boundaries to avoid cutting in the middle of words or sentences.
-    
+# Places to break a chunk, best first, with how many separator characters to drop there
+SEPARATORS = [("\n\n", 2), ("\n", 1), (". ", 1), (" ", 1)]
+
+def find_break(text, start, end):
+    """Find where to end a chunk that starts at start and can't reach past end.
+
+    Returns:
+        tuple: (end of the chunk, start of the next one)
+    """
+    # Take the best kind of break that leaves the chunk at least half full
+    for separator, dropped in SEPARATORS:
+        index = text.rfind(separator, start + (end - start) // 2, end + dropped)
+        if index > start:
+            # Sentence ends keep their full stop
+            cut = index + len(separator) - dropped
+            return cut, cut + dropped
+
+    # Otherwise the latest break of any kind
+    breaks = [
+        (index + len(separator) - dropped, dropped)
+        for separator, dropped in SEPARATORS
+        for index in [text.rfind(separator, start + 1, end + dropped)]
+        if index > start
+    ]
+    if breaks:
+        cut, dropped = max(breaks)
+        return cut, cut + dropped
+
+    # A single word longer than a chunk has to be cut mid-word
+    return end, end
+
+def iter_chunks(text, max_length=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Split text into chunks of at most max_length characters, yielding each as soon as it is found.
+
+    Chunks end at a paragraph break if there is one, otherwise at a line or
+    sentence end, otherwise between words. Each character is looked at a
+    bounded number of times, so long texts split in linear time, and no
+    chunk is ever empty or over the limit.
+
     Args:
         text (str): The text to split
         max_length (int): Maximum length of each chunk
-        
-    Returns:
-        list: List of text chunks, each under max_length
+
+    Yields:
+        str: The next chunk
     """
-    if len(text) <= max_length:
-        return [text]
-    
-    chunks = []
-    current_chunk = ""
-    
-    # Split by paragraphs first
-    paragraphs = text.split("\n\n")
-    
-    for paragraph in paragraphs:
-        # If adding this paragraph would exceed the limit
-        if len(current_chunk) + len(paragraph) + 2 > max_length:
-            # If the current chunk is not empty, add it to chunks
-            if current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = ""
-            
-            # If the paragraph itself is too long, split it further
-            if len(paragraph) > max_length:
-                # Split by sentences
-                sentences = paragraph.replace(". ", ".\n").split("\n")
-                
-                for sentence in sentences:
-                    if len(current_chunk) + len(sentence) + 2 > max_length:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                            current_chunk = ""
-                        
-                        # If the sentence is still too long, split it by words
-                        if len(sentence) > max_length:
-                            words = sentence.split(" ")
-                            for word in words:
-                                if len(current_chunk) + len(word) + 1 > max_length:
-                                    chunks.append(current_chunk)
-                                    current_chunk = word + " "
-                                else:
-                                    current_chunk += word + " "
-                        else:
-                            current_chunk = sentence + " "
-                    else:
-                        if current_chunk and not current_chunk.endswith(" "):
-                            current_chunk += " "
-                        current_chunk += sentence + " "
-            else:
-                current_chunk = paragraph
-        else:
-            # Add paragraph separator if needed
-            if current_chunk and not current_chunk.endswith("\n\n"):
-                current_chunk += "\n\n"
-            current_chunk += paragraph
-    
-    # Add the last chunk if not empty
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    return chunks 
\ No newline at end of file
+    start = 0
+    while len(text) - start > max_length:
+        cut, start_next = find_break(text, start, start + max_length)
+        chunk = text[start:cut]
+        if chunk.strip():
+            yield chunk
+        start = start_next
+
+    if text[start:].strip():
+        yield text[start:]
+
+def split_text(text, max_length=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Split text into a list of chunks of at most max_length characters. See iter_chunks."""
+    return list(iter_chunks(text, max_length))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Run the transcribe, reflect and store steps of queued voice notes, for a bot started with PIPELINE_MODE=worker.
+
+Workers take jobs from the voice_jobs table in the bot's database, so any
+number of them can run alongside the bot, each on its own cores. A worker
+holds a lease on each job it claims and keeps renewing it; if the worker
+dies, another one takes the job over once the lease runs out.
+"""
+import signal
+import asyncio
+import logging
+from pathlib import Path
+from telegram import Bot
+
+from config import (
+    TELEGRAM_BOT_TOKEN, WHISPER_WARMUP, METRICS_HOST, METRICS_PORT, VOICE_NOTES_DIR, WORKER_CONCURRENCY,
+    WORKER_POLL_INTERVAL, JOB_LEASE_SECONDS
+)
+from db.database import init_db, close_connections
+from db import repository
+from db.repository import run_db
+from db.jobs import STAGE_STORED, WORKER_STAGES, claim_next_job, release_claim
+from bot.voice_processing import WORKER_ID, JobFailed, run_job, hold_lease
+from services.whisper_service import start_warm_up
+from utils.metrics import start_metrics_server
+from utils.logging import setup_logging
+
+logger = logging.getLogger(__name__)
+
+async def work_on(bot, job):
+    """Take a claimed job as far as being stored, then hand it back for the bot to deliver."""
+    job_id = job["id"]
+    logger.info(f"Working on job {job_id} for user {job['user_id']} from stage '{job['stage']}'")
+
+    try:
+        async with hold_lease(job_id):
+            await run_job(job_id, None, None, bot, stop_at=STAGE_STORED)
+    except JobFailed as e:
+        # Failing the job already released it, and the bot tells the user
+        logger.warning(f"Job {job_id} failed: {str(e)}")
+        return
+    except Exception as e:
+        logger.error(f"Error working on job {job_id}: {str(e)}")
+
+    await run_db(release_claim, job_id)
+
+async def run_worker(stop):
+    """Claim and work on jobs, up to WORKER_CONCURRENCY at once, until stop is set."""
+    # Only used to download voice notes that aren't on this machine's disk
+    bot = Bot(TELEGRAM_BOT_TOKEN)
+    slots = asyncio.Semaphore(WORKER_CONCURRENCY)
+    running = set()
+
+    async with bot:
+        logger.info(f"Worker {WORKER_ID} waiting for voice notes")
+        while not stop.is_set():
+            await slots.acquire()
+            job = await run_db(claim_next_job, WORKER_ID, WORKER_STAGES, JOB_LEASE_SECONDS)
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=WORKER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            task = asyncio.create_task(work_on(bot, job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+        # Jobs in progress are finished rather than left for their leases to run out
+        if running:
+            logger.info(f"Finishing {len(running)} jobs before stopping")
+            await asyncio.gather(*running, return_exceptions=True)
+
+async def serve(stop=None):
+    """Run the worker until SIGINT or SIGTERM, or until stop is set if it is given."""
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+    await run_worker(stop)
+
+def main():
+    """Initialize and start a transcription worker."""
+    setup_logging()
+    logger.info("Starting transcription worker")
+
+    Path(VOICE_NOTES_DIR).mkdir(exist_ok=True)
+    init_db()
+
+    if WHISPER_WARMUP:
+        start_warm_up()
+
+    # Give each worker its own METRICS_PORT to scrape them all
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    asyncio.run(serve())
+
+    # Finish pending database calls, then checkpoint the WAL and release the database
+    repository.shutdown()
+    close_connections()
+
+if __name__ == "__main__":
+    main()